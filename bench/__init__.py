@@ -0,0 +1,15 @@
+"""
+bench
+Бенчмарки бота вне Core-ноды.
+
+  generator.py  — детерминированный синтетический реестр (users/, devices/,
+                  appeals/, routes/, nodes/) с настоящими Fernet/HMAC-полями
+  registry.py   — задержка и память функций чтения реестра на 1k/10k/100k
+  report.py     — JSON-отчёт и сравнение двух отчётов
+  telegram.py   — локальный поддельный Bot API (задержки, 429, ошибки)
+  replay.py     — прогон потока апдейтов через связку bot/__main__.py
+  scripts.py    — поддельное дерево SIGIL_SCRIPTS_PATH поверх реестра
+  cascade.py    — каскадная приостановка пользователей на поддельных скриптах
+
+Запуск: python -m bench.registry --help, python -m bench.replay --help
+"""
@@ -0,0 +1,128 @@
+"""
+bench/cascade.py
+Бенчмарк каскадной приостановки пользователей на поддельных скриптах.
+
+Повторяет путь кнопки «Приостановить» (handlers/admin.py): транзакция,
+run_cascade(..., "inactive", tx=tx) в фоновой полосе и users/modify.sh.
+Скрипты — bench/scripts.py поверх копии синтетического реестра, поэтому
+время определяется задержками --script-latency / --entry-latency, а не SSH.
+
+  suspend.sequential  — пользователи по одному: длительность одного каскада
+  suspend.concurrent  — все пользователи разом (полосы планировщика):
+                        одна строка, время всего прогона
+
+    python -m bench.cascade --users 1000 --targets 20 --entry-latency 0.5
+"""
+
+import argparse
+import asyncio
+import logging
+import shutil
+import tempfile
+import time
+from pathlib import Path
+
+from bench.generator import TRIAL_USER_ID, ensure_registry, use_keys
+from bench.report import percentile, write_report
+from bench.scripts import install, parse_latency
+from bot import registry
+from bot.cascade import run_cascade
+from bot.scheduler import background
+from bot.transaction import transaction
+
+
+def pick_targets(store: str, count: int, skip: int = 0) -> list[str]:
+    """Активные пользователи с двумя и более активными устройствами."""
+    devices = registry.get_device_index(store)
+    targets = []
+    for user in registry.get_user_index(store).records():
+        if user["id"] == TRIAL_USER_ID or user.get("status") != "active" or not user.get("core_nodes"):
+            continue
+        if sum(d.get("status") == "active" for d in devices.by_user(user["id"])) >= 2:
+            targets.append(str(user["id"]))
+    return targets[skip:skip + count]
+
+
+async def suspend(user_id: str, store: str, scripts: str) -> bool:
+    async with transaction(scripts, f"Suspend user {user_id}") as tx:
+        with background():
+            cascade = await run_cascade(user_id, "inactive", store, scripts, tx=tx)
+        if cascade.ok:
+            rc, _, _ = await tx.run([f"{scripts}/users/modify.sh", "--id", user_id, "--status", "inactive"])
+            return rc == 0
+    return False
+
+
+async def bench(store: str, scripts: str, users: int, targets: int) -> list[dict]:
+    results = []
+
+    sequential = pick_targets(store, targets)
+    samples, failures = [], 0
+    for user_id in sequential:
+        t0 = time.perf_counter()
+        failures += not await suspend(user_id, store, scripts)
+        samples.append((time.perf_counter() - t0) * 1000)
+    results.append(_row(users, "suspend.sequential", samples, failures=failures))
+
+    concurrent = pick_targets(store, targets, skip=len(sequential))
+    t0 = time.perf_counter()
+    outcomes = await asyncio.gather(*(suspend(user_id, store, scripts) for user_id in concurrent))
+    elapsed = (time.perf_counter() - t0) * 1000
+    results.append(_row(users, "suspend.concurrent", [elapsed], failures=outcomes.count(False),
+                        targets=len(concurrent)))
+    return results
+
+
+def _row(scale: int, name: str, samples: list[float], **extra) -> dict:
+    return {
+        "scale": scale,
+        "name": name,
+        "runs": len(samples),
+        "mean_ms": round(sum(samples) / len(samples), 3) if samples else 0.0,
+        "p50_ms": round(percentile(samples, 0.50), 3),
+        "p95_ms": round(percentile(samples, 0.95), 3),
+        "max_ms": round(max(samples), 3) if samples else 0.0,
+        **extra,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Cascade suspend benchmark on the fake script tree")
+    parser.add_argument("--users", type=int, default=1000, help="synthetic registry size")
+    parser.add_argument("--targets", type=int, default=10, help="users suspended per phase")
+    parser.add_argument("--script-latency", action="append", default=[], metavar="[SCRIPT=]SECONDS")
+    parser.add_argument("--entry-latency", action="append", default=[], metavar="[IP=]SECONDS")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--workdir", default=str(Path(tempfile.gettempdir()) / "sigilgate-bench"))
+    parser.add_argument("--out", help="report path (default: <workdir>/bench-cascade.json)")
+    args = parser.parse_args()
+    if args.out is None:
+        args.out = str(Path(args.workdir) / "bench-cascade.json")
+
+    logging.basicConfig(level=logging.WARNING)
+    use_keys()
+    source = Path(args.workdir) / f"users-{args.users}-seed{args.seed}"
+    ensure_registry(source, args.users, args.seed)
+
+    scratch = Path(tempfile.mkdtemp(prefix="sigilgate-cascade-"))
+    try:
+        store = scratch / "registry"
+        shutil.copytree(source, store)
+        scripts = install(scratch / "scripts", store,
+                          parse_latency(args.script_latency), parse_latency(args.entry_latency))
+        registry._indexes.clear()
+        results = asyncio.run(bench(str(store), str(scripts), args.users, args.targets))
+    finally:
+        registry._indexes.clear()
+        shutil.rmtree(scratch, ignore_errors=True)
+
+    for row in results:
+        print(f"{row['name']:<20} n={row['runs']:<4} p50 {row['p50_ms']:>10} ms  "
+              f"max {row['max_ms']:>10} ms  fail {row['failures']}")
+    params = {k: v for k, v in vars(args).items() if k not in ("out", "workdir")}
+    write_report(args.out, "cascade", params, results)
+    print(f"report: {args.out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,303 @@
+"""
+bench/generator.py
+Детерминированный генератор синтетического реестра.
+
+Одинаковые (users, seed) дают побайтно одинаковое дерево: UUID, даты,
+статусы и даже Fernet-токены (IV и время берутся из генератора, а не из
+os.urandom / time). Формат записей — как у скриптов (docs/scripts.md):
+
+  users/<id>.json        — id, username, status, telegram, core_nodes,
+                           hash_telegram_id (HMAC), encrypted_telegram_id (Fernet)
+  devices/<uuid>.json    — uuid, user_id, device, status, created
+  appeals/<uuid>.json    — id, user_id, username, status, subject, messages, ...
+  routes/<id>.json       — core_ip → entry_ip / domain / service_name
+  nodes/<ip>.json        — Core- и Entry-ноды
+
+Пользователь с ID 3 — сервисный trial (docs/trial.md): его устройства
+названы <telegram_id><digit>.
+
+Ключи фиксированы (BENCH_ENCRYPTION_KEY / BENCH_HASH_KEY); use_keys()
+выставляет их в окружение, чтобы bot.crypto считал те же хеши.
+"""
+
+import base64
+import hashlib
+import hmac
+import json
+import os
+import random
+import struct
+import uuid
+from datetime import date, datetime, timedelta, timezone
+from pathlib import Path
+
+from cryptography.hazmat.primitives import padding
+from cryptography.hazmat.primitives.ciphers import Cipher, algorithms, modes
+
+BENCH_ENCRYPTION_KEY = base64.urlsafe_b64encode(hashlib.sha256(b"sigilgate-bench-fernet").digest()).decode()
+BENCH_HASH_KEY = "sigilgate-bench-hmac-" + "0" * 32
+
+TRIAL_USER_ID = 3
+MANIFEST = "bench-manifest.json"
+GENERATOR_VERSION = 1
+
+BASE_DATE = date(2025, 1, 1)
+BASE_TIMESTAMP = 1735689600  # 2025-01-01T00:00:00Z
+
+CORE_NODES = 3
+ENTRY_NODES = 6
+
+# Доли статусов пользователей (без trial)
+USER_STATUSES = (("active", 0.70), ("blocked", 0.12), ("pending", 0.05), ("archived", 0.13))
+APPEAL_STATUSES = (("active", 0.25), ("inactive", 0.45), ("archived", 0.30))
+
+
+def use_keys() -> None:
+    """Выставить ключи генератора в окружение (для bot.crypto)."""
+    os.environ["SIGIL_TELEGRAM_ENCRYPTION_KEY"] = BENCH_ENCRYPTION_KEY
+    os.environ["SIGIL_TELEGRAM_HASH_KEY"] = BENCH_HASH_KEY
+
+
+def telegram_hash(telegram_id: int) -> str:
+    """То же, что bot.crypto.hash_telegram_id с BENCH_HASH_KEY."""
+    return hmac.new(BENCH_HASH_KEY.encode(), str(telegram_id).encode(), hashlib.sha256).hexdigest()
+
+
+def fernet_token(plaintext: bytes, iv: bytes, timestamp: int) -> str:
+    """Fernet-токен с заданными IV и временем (расшифровывается обычным Fernet)."""
+    raw = base64.urlsafe_b64decode(BENCH_ENCRYPTION_KEY)
+    signing_key, encryption_key = raw[:16], raw[16:]
+    padder = padding.PKCS7(algorithms.AES.block_size).padder()
+    padded = padder.update(plaintext) + padder.finalize()
+    encryptor = Cipher(algorithms.AES(encryption_key), modes.CBC(iv)).encryptor()
+    ciphertext = encryptor.update(padded) + encryptor.finalize()
+    basic = b"\x80" + struct.pack(">Q", timestamp) + iv + ciphertext
+    signature = hmac.new(signing_key, basic, hashlib.sha256).digest()
+    return base64.urlsafe_b64encode(basic + signature).decode()
+
+
+def telegram_id_for(user_id: int) -> int:
+    """Telegram ID синтетического пользователя (детерминирован, без генератора)."""
+    return 100_000_000 + user_id * 7919
+
+
+def _choice(rng: random.Random, weighted: tuple[tuple[str, float], ...]) -> str:
+    x = rng.random()
+    for value, weight in weighted:
+        x -= weight
+        if x < 0:
+            return value
+    return weighted[-1][0]
+
+
+def _uuid(rng: random.Random) -> str:
+    return str(uuid.UUID(int=rng.getrandbits(128), version=4))
+
+
+def _day(rng: random.Random, span: int = 600) -> date:
+    return BASE_DATE + timedelta(days=rng.randrange(span))
+
+
+def _write(path: Path, data: dict) -> None:
+    path.write_text(json.dumps(data, ensure_ascii=False, indent=2) + "\n", encoding="utf-8")
+
+
+class RegistryGenerator:
+    def __init__(self, users: int, seed: int = 1, devices_per_user: float = 1.6, appeal_rate: float = 0.2) -> None:
+        self.users = users
+        self.seed = seed
+        self.devices_per_user = devices_per_user
+        self.appeal_rate = appeal_rate
+        self.rng = random.Random(seed)
+
+    def params(self) -> dict:
+        return {
+            "version": GENERATOR_VERSION,
+            "users": self.users,
+            "seed": self.seed,
+            "devices_per_user": self.devices_per_user,
+            "appeal_rate": self.appeal_rate,
+        }
+
+    # ------------------------------------------------------------------
+
+    def _nodes(self, root: Path) -> tuple[list[str], list[dict]]:
+        core_ips = [f"10.0.0.{i + 1}" for i in range(CORE_NODES)]
+        entry_ips = [f"10.1.0.{i + 1}" for i in range(ENTRY_NODES)]
+        for i, ip in enumerate(core_ips):
+            _write(root / "nodes" / f"{ip}.json", {
+                "ip": ip, "hostname": f"core-node-{i + 1}", "location": "Japan",
+                "role": "core", "status": "active",
+            })
+        for i, ip in enumerate(entry_ips):
+            _write(root / "nodes" / f"{ip}.json", {
+                "ip": ip, "hostname": f"entry-node-{i + 1}", "location": "Russia, Moscow",
+                "role": "entry", "status": "active",
+            })
+
+        routes = []
+        for c, core_ip in enumerate(core_ips):
+            # Каждая Core-нода обслуживается двумя Entry-нодами
+            for entry_ip in (entry_ips[(2 * c) % ENTRY_NODES], entry_ips[(2 * c + 1) % ENTRY_NODES]):
+                route = {
+                    "id": len(routes) + 1,
+                    "core_ip": core_ip,
+                    "entry_ip": entry_ip,
+                    "domain": f"e{entry_ip.rsplit('.', 1)[-1]}.bench.example",
+                    "service_name": f"api.v2.rpc.{self.rng.getrandbits(64):016x}",
+                    "status": "active",
+                }
+                routes.append(route)
+                _write(root / "routes" / f"{route['id']}.json", route)
+        return core_ips, routes
+
+    def _user(self, user_id: int, core_ips: list[str]) -> dict:
+        rng = self.rng
+        if user_id == TRIAL_USER_ID:
+            return {
+                "id": user_id, "username": "trial", "status": "active", "hash": None,
+                "email": None, "telegram": None, "telegram_id": None,
+                "hash_telegram_id": None, "encrypted_telegram_id": None,
+                "core_nodes": core_ips[:1], "created": BASE_DATE.isoformat(),
+            }
+        kind = _choice(rng, USER_STATUSES)
+        status = {"blocked": "inactive", "pending": "inactive"}.get(kind, kind)
+        core_nodes = [] if kind == "pending" else [rng.choice(core_ips)]
+        tg_id = telegram_id_for(user_id)
+        return {
+            "id": user_id,
+            "username": f"user{user_id:06d}",
+            "status": status,
+            "hash": None,
+            "email": f"user{user_id}@bench.example" if rng.random() < 0.3 else None,
+            "telegram": f"@user{user_id}",
+            "telegram_id": None,
+            "hash_telegram_id": telegram_hash(tg_id),
+            "encrypted_telegram_id": fernet_token(
+                str(tg_id).encode(), rng.randbytes(16), BASE_TIMESTAMP + user_id
+            ),
+            "core_nodes": core_nodes,
+            "created": _day(rng).isoformat(),
+        }
+
+    def _devices(self, root: Path, user: dict) -> int:
+        rng = self.rng
+        if user["id"] == TRIAL_USER_ID:
+            return 0
+        count = min(int(rng.expovariate(1 / self.devices_per_user)), 8)
+        for n in range(count):
+            device_uuid = _uuid(rng)
+            if user["status"] == "active":
+                status = "active" if rng.random() < 0.85 else "inactive"
+            else:
+                status = "archived" if user["status"] == "archived" else "inactive"
+            _write(root / "devices" / f"{device_uuid}.json", {
+                "uuid": device_uuid,
+                "user_id": user["id"],
+                "device": f"device_{n + 1:03d}",
+                "status": status,
+                "created": _day(rng).isoformat(),
+            })
+        return count
+
+    def _trial_devices(self, root: Path) -> int:
+        """Триал-устройства: около 5% от числа пользователей, до 10 на Telegram ID."""
+        rng = self.rng
+        count = 0
+        for k in range(max(1, self.users // 20)):
+            tg_id = 500_000_000 + k
+            for digit in range(rng.randrange(1, 4)):
+                device_uuid = _uuid(rng)
+                created = datetime(2025, 1, 1, tzinfo=timezone.utc) + timedelta(minutes=rng.randrange(10**6))
+                _write(root / "devices" / f"{device_uuid}.json", {
+                    "uuid": device_uuid,
+                    "user_id": TRIAL_USER_ID,
+                    "device": f"{tg_id}{digit}",
+                    "status": "active" if digit == 0 and rng.random() < 0.2 else "archived",
+                    "created": created.isoformat(),
+                })
+                count += 1
+        return count
+
+    def _appeals(self, root: Path, user: dict, admin_token: str) -> int:
+        rng = self.rng
+        if user["id"] == TRIAL_USER_ID or user["status"] == "archived" or rng.random() >= self.appeal_rate:
+            return 0
+        count = rng.randrange(1, 4)
+        for _ in range(count):
+            appeal_id = _uuid(rng)
+            opened = datetime(2025, 1, 1, tzinfo=timezone.utc) + timedelta(seconds=rng.randrange(50_000_000))
+            messages = []
+            for m in range(rng.randrange(1, 6)):
+                ts = opened + timedelta(minutes=30 * m)
+                messages.append({
+                    "from": "user" if m % 2 == 0 else "admin",
+                    "text": f"Сообщение {m + 1} по обращению",
+                    "ts": ts.isoformat(),
+                })
+            status = _choice(rng, APPEAL_STATUSES)
+            _write(root / "appeals" / f"{appeal_id}.json", {
+                "id": appeal_id,
+                "user_id": user["id"],
+                "username": user["username"],
+                "encrypted_telegram_id": user["encrypted_telegram_id"],
+                "admin_encrypted_telegram_id": admin_token if status != "active" else None,
+                "device_uuid": None,
+                "subject": f"Не работает подключение ({user['username']})",
+                "status": status,
+                "messages": messages,
+                "created": opened.isoformat(),
+            })
+        return count
+
+    # ------------------------------------------------------------------
+
+    def generate(self, root: str | Path) -> dict:
+        """Записать реестр в root (пустая или несуществующая директория); вернуть манифест."""
+        root = Path(root)
+        for subdir in ("users", "devices", "appeals", "routes", "nodes"):
+            (root / subdir).mkdir(parents=True, exist_ok=True)
+
+        core_ips, routes = self._nodes(root)
+        admin_token = fernet_token(b"1", self.rng.randbytes(16), BASE_TIMESTAMP)
+        counts = {"users": 0, "devices": 0, "appeals": 0, "routes": len(routes)}
+        for user_id in range(1, self.users + 1):
+            user = self._user(user_id, core_ips)
+            _write(root / "users" / f"{user_id}.json", user)
+            counts["users"] += 1
+            counts["devices"] += self._devices(root, user)
+            counts["appeals"] += self._appeals(root, user, admin_token)
+        counts["devices"] += self._trial_devices(root)
+
+        manifest = {"params": self.params(), "counts": counts}
+        _write(root / MANIFEST, manifest)
+        return manifest
+
+
+def ensure_registry(root: str | Path, users: int, seed: int = 1) -> dict:
+    """Сгенерировать реестр, если в root нет реестра с теми же параметрами."""
+    root = Path(root)
+    generator = RegistryGenerator(users, seed)
+    manifest_path = root / MANIFEST
+    if manifest_path.exists():
+        manifest = json.loads(manifest_path.read_text(encoding="utf-8"))
+        if manifest.get("params") == generator.params():
+            return manifest
+        raise FileExistsError(f"{root} holds a registry generated with other parameters")
+    return generator.generate(root)
+
+
+def main() -> None:
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Generate a synthetic SigilGate registry")
+    parser.add_argument("root", help="target directory (created if missing)")
+    parser.add_argument("--users", type=int, default=1000)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+    manifest = ensure_registry(args.root, args.users, args.seed)
+    print(json.dumps(manifest["counts"]))
+
+
+if __name__ == "__main__":
+    main()
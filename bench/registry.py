@@ -0,0 +1,136 @@
+"""
+bench/registry.py
+Бенчмарк чтения реестра на синтетических данных (bench/generator.py).
+
+Для каждого масштаба (по умолчанию 1k / 10k / 100k пользователей):
+  index.*                     — построение индекса с нуля: время и память индекса
+  find_user_by_telegram_id    — поиск по HMAC (попадание / промах / полный скан)
+  list_appeals                — листинги обращений (/appeals, /my_appeals)
+  list_users_for_broadcast    — выборка получателей рассылки
+  admin.users_list            — /users: query.list_users + клавиатура списка
+
+    python -m bench.registry --scales 1000,10000 --out registry.json
+    python -m bench.report old.json registry.json
+
+Реестры кэшируются в --workdir и переиспользуются при тех же параметрах.
+"""
+
+import argparse
+import asyncio
+import logging
+import tempfile
+from pathlib import Path
+
+from bench.generator import TRIAL_USER_ID, ensure_registry, telegram_id_for, use_keys
+from bench.report import measure, print_results, retained, write_report
+from bot import registry
+from bot.appeals import AppealIndex, list_appeals, list_users_for_broadcast
+from bot.crypto import hash_telegram_id
+from bot.handlers.admin import _kb_users_list
+from bot.models import set_decoder
+from bot.query import list_users
+from bot.roles import _scan_users_by_hash, find_user_by_telegram_id
+from bot.vless import RouteIndex
+
+DEFAULT_SCALES = (1000, 10_000, 100_000)
+
+
+def bench_scale(root: Path, users: int, budget: float) -> list[dict]:
+    store = str(root)
+    registry._indexes.clear()
+    results = []
+
+    def add(name: str, stats: dict, **extra) -> None:
+        results.append({"scale": users, "name": name, **stats, **extra})
+
+    for cls in (registry.UserIndex, registry.DeviceIndex, AppealIndex, RouteIndex):
+        index, memory = retained(lambda: _built(cls, store))
+        stats = measure(lambda: _built(cls, store), min_runs=1, max_runs=5, budget=budget)
+        add(f"index.{cls.subdir}", stats, records=len(index), index_kib=memory)
+
+    # Прогрев общих индексов, как при старте бота
+    for index in (registry.get_user_index(store), registry.get_device_index(store),
+                  registry.get_index(AppealIndex, store), registry.get_index(RouteIndex, store)):
+        index.build()
+
+    # У триального пользователя нет hash_telegram_id — не попадание
+    ids = [telegram_id_for(i) for i in range(1, users + 1, max(1, users // 97)) if i != TRIAL_USER_ID]
+    cursor = iter(range(10**9))
+
+    def lookup_hit() -> None:
+        assert find_user_by_telegram_id(ids[next(cursor) % len(ids)], store) is not None
+
+    add("find_user_by_telegram_id.hit", measure(lookup_hit, budget=budget))
+    add("find_user_by_telegram_id.miss", measure(
+        lambda: find_user_by_telegram_id(1, store), budget=budget,
+    ))
+    miss_hash = hash_telegram_id(1)
+    add("find_user_by_telegram_id.scan", measure(
+        lambda: _scan_users_by_hash(root / "users", miss_hash), max_runs=20, budget=budget,
+    ))
+
+    add("list_appeals.active_page", measure(
+        lambda: list_appeals(store, status="active", limit=10), budget=budget,
+    ))
+    add("list_appeals.active_all", measure(
+        lambda: list_appeals(store, status="active"), budget=budget,
+    ))
+    add("list_appeals.by_user", measure(
+        lambda: list_appeals(store, user_id=str(users // 2)), budget=budget,
+    ))
+    add("list_users_for_broadcast", measure(
+        lambda: list_users_for_broadcast(store), max_runs=20, budget=budget,
+    ))
+
+    loop = asyncio.new_event_loop()
+    try:
+        def users_list() -> None:
+            rows = loop.run_until_complete(list_users("all", store, ""))
+            _kb_users_list(rows, "all")
+
+        add("admin.users_list", measure(users_list, max_runs=50, budget=budget))
+    finally:
+        loop.close()
+
+    registry._indexes.clear()
+    return results
+
+
+def _built(cls: type, store: str):
+    index = cls(store)
+    index.build()
+    return index
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Registry read benchmarks on a synthetic registry")
+    parser.add_argument("--scales", default=",".join(map(str, DEFAULT_SCALES)),
+                        help="comma-separated user counts")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--budget", type=float, default=1.0, help="seconds per measurement")
+    parser.add_argument("--workdir", default=str(Path(tempfile.gettempdir()) / "sigilgate-bench"),
+                        help="where generated registries are kept")
+    parser.add_argument("--decoder", default="auto", help="SIGILGATE_JSON_DECODER value")
+    parser.add_argument("--out", default="bench-registry.json")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING)
+    use_keys()
+    decoder = set_decoder(args.decoder)
+    scales = [int(s) for s in args.scales.split(",") if s.strip()]
+
+    results = []
+    for users in scales:
+        root = Path(args.workdir) / f"users-{users}-seed{args.seed}"
+        manifest = ensure_registry(root, users, args.seed)
+        print(f"# {users} users: {manifest['counts']}")
+        scale_results = bench_scale(root, users, args.budget)
+        print_results(scale_results)
+        results += scale_results
+
+    write_report(args.out, "registry", {"scales": scales, "seed": args.seed, "decoder": decoder}, results)
+    print(f"report: {args.out}")
+
+
+if __name__ == "__main__":
+    main()
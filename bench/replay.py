@@ -0,0 +1,356 @@
+"""
+bench/replay.py
+Нагрузочный прогон всего стека роутеров на поддельном Bot API.
+
+Собирается та же связка, что в bot/__main__.py (create_bot,
+create_dispatcher, configure_runtime, build_indexes), Bot смотрит на
+bench/telegram.py, реестр — синтетический (bench/generator.py).
+
+Режимы:
+  feed     — апдейты подаются в dp.feed_update с ограничением параллелизма;
+             задержка — от подачи до завершения обработки
+  polling  — апдейты ставятся в очередь fake-сервера и забираются
+             dp.start_polling; задержка — от выдачи в getUpdates до
+             завершения обработки
+
+Поток апдейтов — сгенерированный (--updates N, смесь ниже) или записанный
+(--replay file.jsonl: по объекту Update на строку).
+
+Скрипты: --scripts <путь> или --fake-scripts — дерево bench/scripts.py
+поверх копии реестра (исходный кэш в --workdir не меняется).
+
+    python -m bench.replay --users 10000 --updates 5000 --concurrency 64
+    python -m bench.replay --mode polling --latency 0.03 --rate-limit 0.01
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+import random
+import shutil
+import tempfile
+import time
+from collections import defaultdict
+from pathlib import Path
+from typing import Any, Awaitable, Callable
+
+from aiogram import BaseMiddleware
+from aiogram.types import TelegramObject, Update
+
+from bench.generator import ensure_registry, telegram_id_for, use_keys
+from bench.report import percentile, write_report
+from bench.scripts import install, parse_latency
+from bench.telegram import BOT_USER, FakeBotAPI
+
+ADMIN_TELEGRAM_ID = 42
+BENCH_TOKEN = "123456:BENCH-TOKEN"
+
+# (вес, действие) — смесь сгенерированного потока
+DEFAULT_MIX = (
+    (15, "user:/start"),
+    (30, "user:/devices"),
+    (20, "user:device_card"),
+    (10, "user:devices_back"),
+    (5, "user:my_appeals"),
+    (6, "guest:/start"),
+    (5, "admin:/users"),
+    (5, "admin:user_card"),
+    (4, "admin:/appeals"),
+)
+
+
+# ---------------------------------------------------------------------------
+# Поток апдейтов
+# ---------------------------------------------------------------------------
+
+def _sender(telegram_id: int) -> dict:
+    return {"id": telegram_id, "is_bot": False, "first_name": f"U{telegram_id}"}
+
+
+def _message(update_id: int, telegram_id: int, text: str) -> dict:
+    message = {
+        "message_id": update_id,
+        "date": int(time.time()),
+        "chat": {"id": telegram_id, "type": "private"},
+        "from": _sender(telegram_id),
+        "text": text,
+    }
+    if text.startswith("/"):
+        message["entities"] = [{"type": "bot_command", "offset": 0, "length": len(text.split()[0])}]
+    return {"update_id": update_id, "message": message}
+
+
+def _callback(update_id: int, telegram_id: int, data: str) -> dict:
+    return {
+        "update_id": update_id,
+        "callback_query": {
+            "id": str(update_id),
+            "from": _sender(telegram_id),
+            "chat_instance": str(telegram_id),
+            "data": data,
+            "message": {
+                "message_id": update_id,
+                "date": int(time.time()),
+                "chat": {"id": telegram_id, "type": "private"},
+                "from": BOT_USER,
+                "text": "…",
+            },
+        },
+    }
+
+
+def generate_updates(store_path: str, count: int, seed: int = 1, mix=DEFAULT_MIX) -> list[dict]:
+    """Детерминированный поток апдейтов по синтетическому реестру."""
+    from bot.registry import get_device_index, get_user_index
+
+    rng = random.Random(seed)
+    users = [u for u in get_user_index(store_path).records() if u.get("status") == "active" and u["id"] != 3]
+    devices = get_device_index(store_path)
+    with_devices = [(u, devices.by_user(u["id"])) for u in users[:5000]]
+    with_devices = [(u, d) for u, d in with_devices if d]
+    if not users or not with_devices:
+        raise ValueError(f"{store_path}: no active users with devices")
+
+    weights = [w for w, _ in mix]
+    actions = [a for _, a in mix]
+    updates = []
+    for update_id in range(1, count + 1):
+        action = rng.choices(actions, weights)[0]
+        user, user_devices = rng.choice(with_devices)
+        tg_id = telegram_id_for(user["id"])
+        if action == "user:/start":
+            updates.append(_message(update_id, tg_id, "/start"))
+        elif action == "user:/devices":
+            updates.append(_message(update_id, tg_id, "/devices"))
+        elif action == "user:device_card":
+            updates.append(_callback(update_id, tg_id, f"mydev:c:{rng.choice(user_devices)['uuid']}"))
+        elif action == "user:devices_back":
+            updates.append(_callback(update_id, tg_id, "mydev:back"))
+        elif action == "user:my_appeals":
+            updates.append(_callback(update_id, tg_id, "appeal:my_list"))
+        elif action == "guest:/start":
+            updates.append(_message(update_id, 900_000_000 + rng.randrange(10**6), "/start"))
+        elif action == "admin:/users":
+            updates.append(_message(update_id, ADMIN_TELEGRAM_ID, "/users"))
+        elif action == "admin:user_card":
+            updates.append(_callback(update_id, ADMIN_TELEGRAM_ID, f"users:c:{rng.choice(users)['id']}:all"))
+        elif action == "admin:/appeals":
+            updates.append(_message(update_id, ADMIN_TELEGRAM_ID, "/appeals"))
+    return updates
+
+
+def load_updates(path: str) -> list[dict]:
+    """Записанный поток (NDJSON); update_id перенумеровываются по порядку."""
+    updates = []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                update = json.loads(line)
+                update["update_id"] = len(updates) + 1
+                updates.append(update)
+    return updates
+
+
+def update_label(update: Update) -> str:
+    """Метка для статистики: команда или префикс callback_data."""
+    if update.message is not None:
+        text = update.message.text or ""
+        return "message:" + (text.split()[0] if text.startswith("/") else "text")
+    if update.callback_query is not None:
+        data = update.callback_query.data or ""
+        return "callback:" + ":".join(data.split(":")[:2])
+    return update.event_type
+
+
+# ---------------------------------------------------------------------------
+# Замер
+# ---------------------------------------------------------------------------
+
+class LatencyRecorder(BaseMiddleware):
+    """Outer middleware: задержка от origin[update_id] до конца обработки."""
+
+    def __init__(self, origin: dict[int, float]) -> None:
+        self.origin = origin
+        self.samples: dict[str, list[float]] = defaultdict(list)
+        self.failures: dict[str, int] = defaultdict(int)
+        self.done = 0
+        self.finished = asyncio.Event()
+        self.expected = 0
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: dict[str, Any],
+    ) -> Any:
+        label = update_label(event)
+        try:
+            return await handler(event, data)
+        except Exception:
+            self.failures[label] += 1
+            raise
+        finally:
+            started = self.origin.get(event.update_id)
+            if started is not None:
+                self.samples[label].append((time.monotonic() - started) * 1000)
+            self.done += 1
+            if self.done >= self.expected:
+                self.finished.set()
+
+
+def _row(scale: int, name: str, samples: list[float], **extra) -> dict:
+    return {
+        "scale": scale,
+        "name": name,
+        "runs": len(samples),
+        "mean_ms": round(sum(samples) / len(samples), 3) if samples else 0.0,
+        "p50_ms": round(percentile(samples, 0.50), 3),
+        "p95_ms": round(percentile(samples, 0.95), 3),
+        "p99_ms": round(percentile(samples, 0.99), 3),
+        "max_ms": round(max(samples), 3) if samples else 0.0,
+        **extra,
+    }
+
+
+async def replay(args: argparse.Namespace) -> dict:
+    root = Path(args.workdir) / f"users-{args.users}-seed{args.seed}"
+    ensure_registry(root, args.users, args.seed)
+    use_keys()
+
+    scripts = args.scripts or str(root / "no-scripts")
+    scratch = None
+    if args.fake_scripts:
+        scratch = Path(tempfile.mkdtemp(prefix="sigilgate-replay-"))
+        shutil.copytree(root, scratch / "registry")
+        root = scratch / "registry"
+        scripts = str(install(
+            scratch / "scripts", root,
+            parse_latency(args.script_latency), parse_latency(args.entry_latency),
+        ))
+
+    api = FakeBotAPI(args.latency, args.jitter, args.rate_limit, args.retry_after, args.error_rate, args.seed)
+    url = await api.start()
+
+    os.environ.update({
+        "SIGILGATE_BOT_TOKEN": BENCH_TOKEN,
+        "SIGIL_STORE_PATH": str(root),
+        "SIGIL_SCRIPTS_PATH": scripts,
+        "SIGILGATE_ADMIN_IDS": str(ADMIN_TELEGRAM_ID),
+        "SIGILGATE_BOT_API_URL": url,
+    })
+    os.environ.setdefault("SIGILGATE_TRACE_SLOW_MS", "60000")
+
+    from bot.__main__ import build_indexes, configure_runtime, create_bot, create_dispatcher, shutdown_runtime
+    from bot.config import load_config
+
+    config = load_config()
+    bot = create_bot(config)
+    dp = create_dispatcher(config)
+    configure_runtime(config)
+    await build_indexes(config["store_path"])
+
+    updates = load_updates(args.replay) if args.replay else generate_updates(str(root), args.updates, args.seed)
+    if args.dump:
+        with open(args.dump, "w", encoding="utf-8") as f:
+            f.writelines(json.dumps(u, ensure_ascii=False) + "\n" for u in updates)
+
+    origin: dict[int, float] = api.delivered_at if args.mode == "polling" else {}
+    recorder = LatencyRecorder(origin)
+    recorder.expected = len(updates)
+    dp.update.outer_middleware(recorder)
+
+    started = time.monotonic()
+    try:
+        if args.mode == "polling":
+            api.enqueue(updates)
+            polling = asyncio.create_task(
+                dp.start_polling(bot, handle_signals=False, polling_timeout=1, close_bot_session=False)
+            )
+            try:
+                await asyncio.wait_for(recorder.finished.wait(), args.deadline)
+            finally:
+                await dp.stop_polling()
+                await polling
+        else:
+            gate = asyncio.Semaphore(args.concurrency)
+
+            async def feed(raw: dict) -> None:
+                async with gate:
+                    update = Update.model_validate(raw, context={"bot": bot})
+                    origin[update.update_id] = time.monotonic()
+                    try:
+                        await dp.feed_update(bot, update)
+                    except Exception:
+                        pass  # учтено в LatencyRecorder.failures
+
+            await asyncio.wait_for(asyncio.gather(*(feed(u) for u in updates)), args.deadline)
+    finally:
+        elapsed = time.monotonic() - started
+        await bot.session.close()
+        await shutdown_runtime()
+        await api.close()
+        if scratch is not None:
+            shutil.rmtree(scratch, ignore_errors=True)
+
+    all_samples = [s for samples in recorder.samples.values() for s in samples]
+    results = [_row(
+        args.users, "replay.total", all_samples,
+        throughput=round(recorder.done / elapsed, 1) if elapsed else 0.0,
+        failures=sum(recorder.failures.values()),
+    )]
+    for label in sorted(recorder.samples):
+        results.append(_row(args.users, f"replay.{label}", recorder.samples[label],
+                            failures=recorder.failures.get(label, 0)))
+    return {"results": results, "api": api.stats(), "elapsed": elapsed}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Replay updates through the bot against a fake Bot API")
+    parser.add_argument("--mode", choices=("feed", "polling"), default="feed")
+    parser.add_argument("--users", type=int, default=1000, help="synthetic registry size")
+    parser.add_argument("--updates", type=int, default=2000, help="generated updates")
+    parser.add_argument("--replay", help="recorded updates (NDJSON) instead of generated")
+    parser.add_argument("--dump", help="write the update stream to this NDJSON file")
+    parser.add_argument("--concurrency", type=int, default=64, help="feed mode: updates in flight")
+    parser.add_argument("--latency", type=float, default=0.0, help="fake API latency, seconds")
+    parser.add_argument("--jitter", type=float, default=0.0)
+    parser.add_argument("--rate-limit", type=float, default=0.0, help="share of 429 responses")
+    parser.add_argument("--retry-after", type=int, default=1)
+    parser.add_argument("--error-rate", type=float, default=0.0, help="share of 400 responses")
+    parser.add_argument("--scripts", help="SIGIL_SCRIPTS_PATH for handlers that run scripts")
+    parser.add_argument("--fake-scripts", action="store_true",
+                        help="use bench/scripts.py over a copy of the registry")
+    parser.add_argument("--script-latency", action="append", default=[], metavar="[SCRIPT=]SECONDS",
+                        help="fake scripts: latency per script (repeatable)")
+    parser.add_argument("--entry-latency", action="append", default=[], metavar="[IP=]SECONDS",
+                        help="fake scripts: latency per entry node operation (repeatable)")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--deadline", type=float, default=600.0, help="give up after this many seconds")
+    parser.add_argument("--workdir", default=str(Path(tempfile.gettempdir()) / "sigilgate-bench"))
+    parser.add_argument("--out", default="bench-replay.json")
+    args = parser.parse_args()
+    if args.scripts and args.fake_scripts:
+        parser.error("--scripts and --fake-scripts are mutually exclusive")
+
+    logging.basicConfig(level=logging.WARNING)
+    logging.getLogger("aiogram.event").setLevel(logging.CRITICAL)  # ошибки хендлеров — в failures
+    outcome = asyncio.run(replay(args))
+
+    total = outcome["results"][0]
+    print(f"{total['runs']} updates in {outcome['elapsed']:.2f}s — {total['throughput']} upd/s, "
+          f"p50 {total['p50_ms']} ms, p99 {total['p99_ms']} ms, failures {total['failures']}")
+    for row in outcome["results"][1:]:
+        print(f"  {row['name']:<32} n={row['runs']:<6} p50 {row['p50_ms']:>8} ms  p99 {row['p99_ms']:>8} ms"
+              f"  fail {row['failures']}")
+    print("api calls:", json.dumps(outcome["api"]["calls"], sort_keys=True))
+
+    params = {k: v for k, v in vars(args).items() if k not in ("out", "dump", "workdir")}
+    params["api"] = outcome["api"]
+    write_report(args.out, f"replay-{args.mode}", params, outcome["results"])
+    print(f"report: {args.out}")
+
+
+if __name__ == "__main__":
+    main()
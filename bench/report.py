@@ -0,0 +1,153 @@
+"""
+bench/report.py
+Измерение и JSON-отчёт бенчмарков; сравнение двух отчётов.
+
+Отчёт:
+  {"suite": ..., "meta": {commit, python, platform, created, params},
+   "results": [{"scale": ..., "name": ..., "runs", "mean_ms", "p50_ms",
+                "p95_ms", "min_ms", "max_ms", "peak_kib", ...}]}
+
+Сравнение: python -m bench.report old.json new.json — отношение p50
+(новый / старый) по каждой паре (scale, name).
+"""
+
+import json
+import platform
+import statistics
+import subprocess
+import sys
+import time
+import tracemalloc
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Callable
+
+
+def _git_commit() -> str | None:
+    try:
+        out = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=Path(__file__).resolve().parent, capture_output=True, text=True, timeout=5,
+        )
+    except (OSError, subprocess.TimeoutExpired):
+        return None
+    return out.stdout.strip() or None
+
+
+def percentile(samples: list[float], q: float) -> float:
+    ordered = sorted(samples)
+    if not ordered:
+        return 0.0
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+def measure(
+    fn: Callable[[], Any],
+    min_runs: int = 3,
+    max_runs: int = 200,
+    budget: float = 1.0,
+) -> dict:
+    """
+    Вызывать fn, пока не наберётся budget секунд (не меньше min_runs и не
+    больше max_runs раз) после одного прогревочного вызова; затем один
+    вызов под tracemalloc — пик памяти.
+    """
+    fn()  # прогрев: ленивые индексы, кэши, импорт
+    samples = []
+    started = time.perf_counter()
+    while len(samples) < max_runs:
+        t0 = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - t0) * 1000)
+        if len(samples) >= min_runs and time.perf_counter() - started >= budget:
+            break
+
+    tracemalloc.start()
+    try:
+        fn()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    return {
+        "runs": len(samples),
+        "mean_ms": round(statistics.fmean(samples), 4),
+        "p50_ms": round(percentile(samples, 0.50), 4),
+        "p95_ms": round(percentile(samples, 0.95), 4),
+        "min_ms": round(min(samples), 4),
+        "max_ms": round(max(samples), 4),
+        "peak_kib": round(peak / 1024, 1),
+    }
+
+
+def retained(fn: Callable[[], Any]) -> tuple[Any, float]:
+    """Результат fn и прирост памяти после вызова (KiB) — размер резидентных структур."""
+    tracemalloc.start()
+    try:
+        before, _ = tracemalloc.get_traced_memory()
+        result = fn()
+        after, _ = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return result, round((after - before) / 1024, 1)
+
+
+def write_report(path: str | Path, suite: str, params: dict, results: list[dict]) -> dict:
+    report = {
+        "suite": suite,
+        "meta": {
+            "commit": _git_commit(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "created": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "params": params,
+        },
+        "results": results,
+    }
+    Path(path).write_text(json.dumps(report, ensure_ascii=False, indent=2) + "\n", encoding="utf-8")
+    return report
+
+
+def print_results(results: list[dict]) -> None:
+    width = max((len(r["name"]) for r in results), default=4)
+    print(f"{'scale':>7}  {'name':<{width}}  {'runs':>5} {'p50 ms':>10} {'p95 ms':>10} {'peak KiB':>10}")
+    for r in results:
+        print(
+            f"{r['scale']:>7}  {r['name']:<{width}}  {r.get('runs', 1):>5} "
+            f"{r.get('p50_ms', 0):>10.3f} {r.get('p95_ms', 0):>10.3f} {r.get('peak_kib', 0):>10.1f}"
+        )
+
+
+def compare(old: dict, new: dict, metric: str = "p50_ms") -> list[dict]:
+    """Отношение metric (новый / старый) для общих пар (scale, name)."""
+    before = {(r["scale"], r["name"]): r for r in old["results"]}
+    rows = []
+    for r in new["results"]:
+        base = before.get((r["scale"], r["name"]))
+        if base is None or metric not in r or metric not in base:
+            continue
+        ratio = r[metric] / base[metric] if base[metric] else float("inf")
+        rows.append({"scale": r["scale"], "name": r["name"], "old": base[metric], "new": r[metric], "ratio": ratio})
+    return rows
+
+
+def main() -> None:
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Compare two benchmark reports")
+    parser.add_argument("old")
+    parser.add_argument("new")
+    parser.add_argument("--metric", default="p50_ms")
+    args = parser.parse_args()
+
+    old = json.loads(Path(args.old).read_text(encoding="utf-8"))
+    new = json.loads(Path(args.new).read_text(encoding="utf-8"))
+    if old.get("suite") != new.get("suite"):
+        sys.exit(f"suite mismatch: {old.get('suite')} vs {new.get('suite')}")
+    print(f"{old['meta'].get('commit')} → {new['meta'].get('commit')} ({args.metric})")
+    for row in compare(old, new, args.metric):
+        print(f"{row['scale']:>7}  {row['name']:<32} {row['old']:>10.3f} {row['new']:>10.3f}  ×{row['ratio']:.2f}")
+
+
+if __name__ == "__main__":
+    main()
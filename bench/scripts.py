@@ -0,0 +1,777 @@
+"""
+bench/scripts.py
+Поддельное дерево скриптов (SIGIL_SCRIPTS_PATH) поверх временного реестра.
+
+Реализует контракт docs/scripts.md — users/, devices/, nodes/, entry/,
+store/, trial/, appeals/ — с теми же аргументами, stdout и кодами возврата,
+но без SSH: Entry-ноды эмулируются файлами состояния в <tree>/state/entry/.
+Каждый скрипт — shim-файл, исполняющий python -m bench.scripts run.
+
+Задержки (секунды) задаются в <tree>/fake-scripts.json и перечитываются
+при каждом вызове:
+
+  latency        — на скрипт: {"default": 0.02, "users/list.sh": 0.3}
+  entry_latency  — на Entry-ноду: {"default": 0.5, "10.1.0.2": 2.0};
+                   вызовы к одной ноде идут по очереди (блокировка на ноду,
+                   как перезапуск Xray), к разным — параллельно
+  entry_down     — недоступные ноды: entry/* отвечает как ssh, код 255
+
+Оркестраторы (add / update / remove / deactivate) вызывают атомарные
+операции в том же процессе: задержка скрипта считается один раз, а каждая
+операция на Entry-ноде — отдельно.
+
+    python -m bench.scripts install /tmp/sigil-scripts --store /tmp/registry \\
+        --latency 0.02 --entry-latency 0.5 --entry-latency 10.1.0.2=2.0
+    SIGIL_SCRIPTS_PATH=/tmp/sigil-scripts SIGIL_STORE_PATH=/tmp/registry python -m bot
+"""
+
+import fcntl
+import json
+import os
+import re
+import subprocess
+import sys
+import time
+import uuid as uuidlib
+from contextlib import contextmanager
+from datetime import date, datetime, timezone
+from pathlib import Path
+from typing import Callable, Iterator
+
+CONFIG = "fake-scripts.json"
+TRIAL_USER_ID = 3
+
+_STATUSES = ("active", "inactive", "archived")
+_EMAIL_RE = re.compile(r"^[^@\s]+@[^@\s]+\.[^@\s]+$")
+_SSH_RC = 255
+
+
+class ScriptError(Exception):
+    """Отказ скрипта: сообщение в stderr, код возврата rc."""
+
+    def __init__(self, message: str, rc: int = 1) -> None:
+        super().__init__(message)
+        self.rc = rc
+
+
+# ---------------------------------------------------------------------------
+# Контекст вызова
+# ---------------------------------------------------------------------------
+
+class FakeTree:
+    def __init__(self, tree: str | Path, store: str | Path | None = None) -> None:
+        self.tree = Path(tree)
+        config_path = self.tree / CONFIG
+        self.config = json.loads(config_path.read_text(encoding="utf-8")) if config_path.exists() else {}
+        self.store = Path(store or os.environ.get("SIGIL_STORE_PATH") or self.config.get("store", ""))
+        if not str(self.store) or not self.store.is_dir():
+            raise ScriptError(f"registry not found: {self.store}")
+        self.state = self.tree / "state"
+        (self.state / "entry").mkdir(parents=True, exist_ok=True)
+        self.out: list[str] = []
+
+    # -- задержки ------------------------------------------------------------
+
+    def delay(self, script: str) -> None:
+        latency = self.config.get("latency", {})
+        seconds = latency.get(script, latency.get("default", 0.0))
+        if seconds > 0:
+            time.sleep(seconds)
+
+    def entry_delay(self, host: str) -> float:
+        latency = self.config.get("entry_latency", {})
+        return latency.get(host, latency.get("default", 0.0))
+
+    # -- реестр ----------------------------------------------------------------
+
+    @contextmanager
+    def locked(self, name: str = "registry") -> Iterator[None]:
+        with open(self.state / f"{name}.lock", "a") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+
+    def read(self, kind: str, key) -> dict | None:
+        try:
+            return json.loads((self.store / kind / f"{key}.json").read_text(encoding="utf-8"))
+        except (OSError, json.JSONDecodeError):
+            return None
+
+    def write(self, kind: str, key, data: dict) -> None:
+        path = self.store / kind / f"{key}.json"
+        path.parent.mkdir(exist_ok=True)
+        tmp = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+        tmp.write_text(json.dumps(data, ensure_ascii=False, indent=2) + "\n", encoding="utf-8")
+        os.replace(tmp, path)
+
+    def remove(self, kind: str, key) -> None:
+        try:
+            (self.store / kind / f"{key}.json").unlink()
+        except FileNotFoundError:
+            pass
+
+    def records(self, kind: str) -> Iterator[dict]:
+        directory = self.store / kind
+        if not directory.is_dir():
+            return
+        for path in sorted(directory.glob("*.json")):  # порядок glob в shell
+            try:
+                yield json.loads(path.read_text(encoding="utf-8"))
+            except (OSError, json.JSONDecodeError):
+                continue
+
+    def emit(self, value) -> None:
+        self.out.append(value if isinstance(value, str) else json.dumps(value, ensure_ascii=False))
+
+
+def _required(args: dict, name: str) -> str:
+    value = args.get(name)
+    if value is None or value == "":
+        raise ScriptError(f"--{name.replace('_', '-')} is required")
+    return value
+
+
+def _nullable(value: str | None) -> str | None:
+    return value or None
+
+
+def _today() -> str:
+    return date.today().isoformat()
+
+
+# ---------------------------------------------------------------------------
+# Шифрование Telegram ID (как у настоящих скриптов: ключи из окружения)
+# ---------------------------------------------------------------------------
+
+def _telegram_fields(telegram_id: int) -> dict:
+    if not os.environ.get("SIGIL_TELEGRAM_HASH_KEY"):
+        return {"telegram_id": telegram_id, "hash_telegram_id": None, "encrypted_telegram_id": None}
+    from bot.crypto import encrypt_telegram_id, hash_telegram_id
+    return {
+        "telegram_id": None,
+        "hash_telegram_id": hash_telegram_id(telegram_id),
+        "encrypted_telegram_id": encrypt_telegram_id(telegram_id),
+    }
+
+
+def _encrypted(telegram_id: str) -> str:
+    from bot.crypto import encrypt_telegram_id
+    try:
+        return encrypt_telegram_id(int(telegram_id))
+    except (RuntimeError, ValueError) as e:
+        raise ScriptError(f"cannot encrypt telegram id: {e}")
+
+
+def _parse_telegram_id(value: str) -> int:
+    if not value.isdigit() or int(value) <= 0:
+        raise ScriptError(f"invalid telegram id: {value}")
+    return int(value)
+
+
+# ---------------------------------------------------------------------------
+# users/
+# ---------------------------------------------------------------------------
+
+def _user(t: FakeTree, user_id) -> dict:
+    user = t.read("users", user_id)
+    if user is None:
+        raise ScriptError(f"user not found: {user_id}")
+    return user
+
+
+def _check_username(t: FakeTree, username: str, exclude=None) -> None:
+    if not username.strip():
+        raise ScriptError("username must not be empty")
+    for u in t.records("users"):
+        if u.get("username") == username and u.get("id") != exclude:
+            raise ScriptError(f"username already exists: {username}")
+
+
+def _check_telegram_id(t: FakeTree, fields: dict, exclude=None) -> None:
+    for u in t.records("users"):
+        if u.get("id") == exclude:
+            continue
+        if (fields["hash_telegram_id"] and u.get("hash_telegram_id") == fields["hash_telegram_id"]) or \
+                (fields["telegram_id"] and u.get("telegram_id") == fields["telegram_id"]):
+            raise ScriptError("telegram id already registered")
+
+
+def _check_core_node(t: FakeTree, ip: str) -> None:
+    node = t.read("nodes", ip)
+    if node is None or node.get("role") != "core" or node.get("status") != "active":
+        raise ScriptError(f"core node not found or not active: {ip}")
+
+
+def users_create(t: FakeTree, args: dict) -> None:
+    username = _required(args, "username")
+    status = args.get("status") or "active"
+    if status not in _STATUSES:
+        raise ScriptError(f"invalid status: {status}")
+    if args.get("email") and not _EMAIL_RE.match(args["email"]):
+        raise ScriptError(f"invalid email: {args['email']}")
+    if args.get("telegram") and not args["telegram"].startswith("@"):
+        raise ScriptError("telegram username must start with @")
+    core_nodes = []
+    if args.get("core_node"):
+        _check_core_node(t, args["core_node"])
+        core_nodes.append(args["core_node"])
+
+    fields = {"telegram_id": None, "hash_telegram_id": None, "encrypted_telegram_id": None}
+    if args.get("telegram_id"):
+        fields = _telegram_fields(_parse_telegram_id(args["telegram_id"]))
+
+    with t.locked():
+        _check_username(t, username)
+        if args.get("telegram_id"):
+            _check_telegram_id(t, fields)
+        user_id = max((int(u["id"]) for u in t.records("users") if str(u.get("id", "")).isdigit()), default=0) + 1
+        t.write("users", user_id, {
+            "id": user_id,
+            "username": username,
+            "status": status,
+            "hash": _nullable(args.get("hash")),
+            "email": _nullable(args.get("email")),
+            "telegram": _nullable(args.get("telegram")),
+            **fields,
+            "core_nodes": core_nodes,
+            "created": _today(),
+        })
+    t.emit(str(user_id))
+
+
+def users_add(t: FakeTree, args: dict) -> None:
+    _required(args, "username")
+    _required(args, "core_node")
+    users_create(t, args)
+    store_commit(t, {"message": f"Add user {args['username']}"})
+
+
+def users_modify(t: FakeTree, args: dict) -> None:
+    user_id = _required(args, "id")
+    with t.locked():
+        user = _user(t, user_id)
+        if "username" in args:
+            _check_username(t, args["username"], exclude=user["id"])
+            user["username"] = args["username"]
+        if "status" in args:
+            if args["status"] not in _STATUSES:
+                raise ScriptError(f"invalid status: {args['status']}")
+            user["status"] = args["status"]
+        for field in ("email", "telegram", "hash"):
+            if field in args:
+                user[field] = _nullable(args[field])
+        if "telegram_id" in args:
+            if args["telegram_id"]:
+                fields = _telegram_fields(_parse_telegram_id(args["telegram_id"]))
+                _check_telegram_id(t, fields, exclude=user["id"])
+            else:
+                fields = {"telegram_id": None, "hash_telegram_id": None, "encrypted_telegram_id": None}
+            user.update(fields)
+        core_nodes = list(user.get("core_nodes") or [])
+        if args.get("add_core_node"):
+            _check_core_node(t, args["add_core_node"])
+            if args["add_core_node"] not in core_nodes:
+                core_nodes.append(args["add_core_node"])
+        if args.get("remove_core_node") in core_nodes:
+            core_nodes.remove(args["remove_core_node"])
+        user["core_nodes"] = core_nodes
+        t.write("users", user_id, user)
+
+
+def users_update(t: FakeTree, args: dict) -> None:
+    users_modify(t, args)
+    store_commit(t, {"message": f"Update user {args['id']}"})
+
+
+def _devices_of(t: FakeTree, user_id) -> list[dict]:
+    return [d for d in t.records("devices") if str(d.get("user_id")) == str(user_id)]
+
+
+def users_delete(t: FakeTree, args: dict) -> None:
+    user_id = _required(args, "id")
+    if t.read("users", user_id) is None:
+        return
+    if _devices_of(t, user_id):
+        raise ScriptError(f"user {user_id} has devices, remove them first")
+    t.remove("users", user_id)
+
+
+def users_remove(t: FakeTree, args: dict) -> None:
+    user_id = _required(args, "id")
+    if t.read("users", user_id) is None:
+        return
+    nodes = _entry_nodes_for(t, user_id)
+    for device in _devices_of(t, user_id):
+        _detach(t, device["uuid"], nodes)
+        t.remove("devices", device["uuid"])
+    t.remove("users", user_id)
+    store_commit(t, {"message": f"Remove user {user_id}"})
+
+
+def users_get(t: FakeTree, args: dict) -> None:
+    t.emit(_user(t, _required(args, "id")))
+
+
+def users_list(t: FakeTree, args: dict) -> None:
+    status = args.get("status")
+    t.emit([
+        {"id": u.get("id"), "username": u.get("username"), "status": u.get("status")}
+        for u in t.records("users") if status is None or u.get("status") == status
+    ])
+
+
+# ---------------------------------------------------------------------------
+# devices/
+# ---------------------------------------------------------------------------
+
+def _device(t: FakeTree, uuid: str) -> dict:
+    device = t.read("devices", uuid)
+    if device is None:
+        raise ScriptError(f"device not found: {uuid}")
+    return device
+
+
+def devices_create(t: FakeTree, args: dict) -> str:
+    user = _user(t, _required(args, "user"))
+    if user.get("status") != "active":
+        raise ScriptError(f"user {user['id']} is not active")
+    name = _required(args, "device")
+    status = args.get("status") or "active"
+    if status not in _STATUSES:
+        raise ScriptError(f"invalid status: {status}")
+    uuid = str(uuidlib.uuid4())
+    created = datetime.now(timezone.utc).isoformat() if user["id"] == TRIAL_USER_ID else _today()
+    t.write("devices", uuid, {
+        "uuid": uuid, "user_id": user["id"], "device": name, "status": status, "created": created,
+    })
+    t.emit(uuid)
+    return uuid
+
+
+def devices_add(t: FakeTree, args: dict) -> None:
+    uuid = devices_create(t, args)
+    store_commit(t, {"message": f"Add device {args['device']}"})
+    for node in _entry_nodes_for(t, args["user"]):
+        _entry_call(t, "add", node["ip"], uuid, node["service_name"], args["device"])
+
+
+def devices_modify(t: FakeTree, args: dict) -> None:
+    uuid = _required(args, "uuid")
+    with t.locked():
+        device = _device(t, uuid)
+        if "device" in args:
+            if not args["device"]:
+                raise ScriptError("device name must not be empty")
+            device["device"] = args["device"]
+        if "status" in args:
+            if args["status"] not in _STATUSES:
+                raise ScriptError(f"invalid status: {args['status']}")
+            device["status"] = args["status"]
+        t.write("devices", uuid, device)
+
+
+def devices_update(t: FakeTree, args: dict) -> None:
+    devices_modify(t, args)
+    store_commit(t, {"message": f"Update device {args['uuid']}"})
+
+
+def devices_delete(t: FakeTree, args: dict) -> None:
+    t.remove("devices", _required(args, "uuid"))
+
+
+def devices_remove(t: FakeTree, args: dict) -> None:
+    uuid = _required(args, "uuid")
+    device = t.read("devices", uuid)
+    if device is None:
+        return
+    _detach(t, uuid, _entry_nodes_for(t, device["user_id"]))
+    t.remove("devices", uuid)
+    store_commit(t, {"message": f"Remove device {uuid}"})
+
+
+def devices_deactivate(t: FakeTree, args: dict) -> None:
+    uuid = _required(args, "uuid")
+    device = _device(t, uuid)
+    if device.get("status") == "inactive":
+        return
+    if device.get("status") == "archived":
+        raise ScriptError(f"device {uuid} is archived")
+    _detach(t, uuid, _entry_nodes_for(t, device["user_id"]))
+    devices_modify(t, {"uuid": uuid, "status": "inactive"})
+    store_commit(t, {"message": f"Deactivate device {uuid}"})
+
+
+def devices_get(t: FakeTree, args: dict) -> None:
+    t.emit(_device(t, _required(args, "uuid")))
+
+
+def devices_list(t: FakeTree, args: dict) -> None:
+    user_id = _required(args, "user")
+    t.emit([
+        {"uuid": d.get("uuid"), "device": d.get("device"), "status": d.get("status"), "created": d.get("created")}
+        for d in _devices_of(t, user_id)
+    ])
+
+
+def devices_config(t: FakeTree, args: dict) -> None:
+    from bot.vless import build_link
+
+    device = _device(t, _required(args, "uuid"))
+    user = t.read("users", device.get("user_id"))
+    core_nodes = set((user or {}).get("core_nodes") or [])
+    links = []
+    if device.get("status") == "active" and core_nodes:
+        for route in t.records("routes"):
+            if route.get("status") == "active" and route.get("core_ip") in core_nodes and route.get("service_name"):
+                links.append(build_link(device["uuid"], device.get("device", ""), route))
+    t.emit(links)
+
+
+# ---------------------------------------------------------------------------
+# nodes/
+# ---------------------------------------------------------------------------
+
+def _nodes(t: FakeTree, role: str) -> list[dict]:
+    return [n for n in t.records("nodes") if n.get("role") == role and n.get("status") == "active"]
+
+
+def _public(node: dict) -> dict:
+    return {"ip": node.get("ip"), "hostname": node.get("hostname"), "location": node.get("location")}
+
+
+def _entry_nodes_for(t: FakeTree, user_id) -> list[dict]:
+    """Entry-ноды пользователя через core_nodes → routes (как nodes/list-entry.sh --user)."""
+    user = t.read("users", user_id)
+    core_nodes = set((user or {}).get("core_nodes") or [])
+    entries = {n["ip"]: n for n in _nodes(t, "entry")}
+    result = []
+    for route in t.records("routes"):
+        node = entries.get(route.get("entry_ip"))
+        if route.get("status") == "active" and route.get("core_ip") in core_nodes and node is not None:
+            result.append({**_public(node), "service_name": route.get("service_name"), "domain": route.get("domain")})
+    return result
+
+
+def nodes_list_core(t: FakeTree, args: dict) -> None:
+    t.emit([_public(n) for n in _nodes(t, "core")])
+
+
+def nodes_list_entry(t: FakeTree, args: dict) -> None:
+    if args.get("user"):
+        t.emit(_entry_nodes_for(t, args["user"]))
+    else:
+        t.emit([_public(n) for n in _nodes(t, "entry")])
+
+
+# ---------------------------------------------------------------------------
+# entry/ — конфиг Xray на ноде эмулируется файлом state/entry/<ip>.json
+# ---------------------------------------------------------------------------
+
+def _entry_call(t: FakeTree, action: str, host: str, uuid: str, service_name: str, name: str = "") -> None:
+    if host in t.config.get("entry_down", ()):
+        raise ScriptError(f"ssh: connect to host {host} port 22: Connection refused", _SSH_RC)
+    path = t.state / "entry" / f"{host}.json"
+    with t.locked(f"entry/{host}"):  # одна нода — один перезапуск Xray за раз
+        seconds = t.entry_delay(host)
+        if seconds > 0:
+            time.sleep(seconds)
+        clients = json.loads(path.read_text(encoding="utf-8")) if path.exists() else {}
+        key = f"{service_name}/{uuid}"
+        if action == "add":
+            clients[key] = name
+        else:
+            clients.pop(key, None)
+        path.write_text(json.dumps(clients, ensure_ascii=False, indent=1), encoding="utf-8")
+
+
+def _detach(t: FakeTree, uuid: str, nodes: list[dict]) -> None:
+    for node in nodes:
+        _entry_call(t, "remove", node["ip"], uuid, node["service_name"])
+
+
+def entry_add_client(t: FakeTree, args: dict) -> None:
+    _entry_call(t, "add", _required(args, "host"), _required(args, "uuid"),
+                _required(args, "service_name"), _required(args, "name"))
+
+
+def entry_remove_client(t: FakeTree, args: dict) -> None:
+    _entry_call(t, "remove", _required(args, "host"), _required(args, "uuid"), _required(args, "service_name"))
+
+
+# ---------------------------------------------------------------------------
+# store/
+# ---------------------------------------------------------------------------
+
+def store_commit(t: FakeTree, args: dict) -> None:
+    """git add -A && git commit, если реестр — git-репозиторий; иначе ничего."""
+    message = _required(args, "message")
+    if not (t.store / ".git").exists():
+        return
+    with t.locked("git"):
+        subprocess.run(["git", "-C", str(t.store), "add", "-A"], check=True, capture_output=True)
+        staged = subprocess.run(["git", "-C", str(t.store), "diff", "--cached", "--quiet"])
+        if staged.returncode != 0:
+            subprocess.run(["git", "-C", str(t.store), "commit", "-q", "-m", message],
+                           check=True, capture_output=True)
+
+
+# ---------------------------------------------------------------------------
+# trial/
+# ---------------------------------------------------------------------------
+
+def _trial_devices(t: FakeTree, key: str, status: str | None = None) -> list[dict]:
+    pattern = re.compile(rf"^{re.escape(key)}[0-9]$")
+    return [
+        {"uuid": d.get("uuid"), "device": d.get("device"), "status": d.get("status"), "created": d.get("created")}
+        for d in _devices_of(t, TRIAL_USER_ID)
+        if pattern.match(d.get("device") or "") and (status is None or d.get("status") == status)
+    ]
+
+
+def trial_find(t: FakeTree, args: dict) -> None:
+    key = args.get("telegram_id") or args.get("hash_telegram_id")
+    if not key:
+        raise ScriptError("--telegram-id or --hash-telegram-id is required")
+    t.emit(_trial_devices(t, key, args.get("status")))
+
+
+def trial_expire(t: FakeTree, args: dict) -> None:
+    uuid = _required(args, "uuid")
+    devices_deactivate(t, {"uuid": uuid})
+    devices_update(t, {"uuid": uuid, "status": "archived"})
+
+
+def trial_prune(t: FakeTree, args: dict) -> None:
+    archived = _trial_devices(t, _required(args, "telegram_id"), "archived")
+    if len(archived) < 2:
+        return
+    keep = min(archived, key=lambda d: int(d["device"][-1]))
+    for device in archived:
+        if device["uuid"] != keep["uuid"]:
+            devices_remove(t, {"uuid": device["uuid"]})
+
+
+def trial_cleanup(t: FakeTree, args: dict) -> None:
+    max_age = int(args.get("max_age") or 3600)
+    now = time.time()
+    telegram_ids = set()
+    for device in _devices_of(t, TRIAL_USER_ID):
+        name = device.get("device") or ""
+        telegram_ids.add(name[:-1])
+        if device.get("status") != "active":
+            continue
+        try:
+            age = now - (t.store / "devices" / f"{device['uuid']}.json").stat().st_mtime
+        except OSError:
+            continue
+        if age > max_age:
+            trial_expire(t, {"uuid": device["uuid"]})
+    for telegram_id in sorted(telegram_ids):
+        if telegram_id:
+            trial_prune(t, {"telegram_id": telegram_id})
+
+
+# ---------------------------------------------------------------------------
+# appeals/
+# ---------------------------------------------------------------------------
+
+def _appeal(t: FakeTree, appeal_id: str) -> dict:
+    appeal = t.read("appeals", appeal_id)
+    if appeal is None:
+        raise ScriptError(f"appeal not found: {appeal_id}")
+    return appeal
+
+
+def _now() -> str:
+    return datetime.now(timezone.utc).isoformat()
+
+
+def appeals_add(t: FakeTree, args: dict) -> None:
+    text = _required(args, "text")
+    appeal_id = str(uuidlib.uuid4())
+    t.write("appeals", appeal_id, {
+        "id": appeal_id,
+        "user_id": int(_required(args, "user_id")),
+        "username": _required(args, "username"),
+        "encrypted_telegram_id": _encrypted(_required(args, "telegram_id")),
+        "admin_encrypted_telegram_id": None,
+        "device_uuid": _nullable(args.get("device_uuid")),
+        "subject": text.splitlines()[0][:64],
+        "status": "inactive",
+        "messages": [{"from": "user", "text": text, "ts": _now()}],
+        "created": _now(),
+    })
+    store_commit(t, {"message": f"Add appeal {appeal_id}"})
+    t.emit(appeal_id)
+
+
+def appeals_reply(t: FakeTree, args: dict) -> None:
+    appeal_id = _required(args, "id")
+    sender = _required(args, "from")
+    if sender not in ("user", "admin"):
+        raise ScriptError(f"invalid --from: {sender}")
+    with t.locked():
+        appeal = _appeal(t, appeal_id)
+        appeal.setdefault("messages", []).append({"from": sender, "text": _required(args, "text"), "ts": _now()})
+        t.write("appeals", appeal_id, appeal)
+    store_commit(t, {"message": f"Reply to appeal {appeal_id}"})
+
+
+def appeals_update(t: FakeTree, args: dict) -> None:
+    appeal_id = _required(args, "id")
+    with t.locked():
+        appeal = _appeal(t, appeal_id)
+        if "status" in args:
+            if args["status"] not in _STATUSES:
+                raise ScriptError(f"invalid status: {args['status']}")
+            appeal["status"] = args["status"]
+        if "admin_telegram_id" in args:
+            admin = args["admin_telegram_id"]
+            appeal["admin_encrypted_telegram_id"] = _encrypted(admin) if admin else None
+        t.write("appeals", appeal_id, appeal)
+    store_commit(t, {"message": f"Update appeal {appeal_id}"})
+
+
+# ---------------------------------------------------------------------------
+# Диспетчер
+# ---------------------------------------------------------------------------
+
+SCRIPTS: dict[str, Callable[[FakeTree, dict], object]] = {
+    "users/create.sh": users_create,
+    "users/add.sh": users_add,
+    "users/modify.sh": users_modify,
+    "users/update.sh": users_update,
+    "users/delete.sh": users_delete,
+    "users/remove.sh": users_remove,
+    "users/get.sh": users_get,
+    "users/list.sh": users_list,
+    "devices/create.sh": devices_create,
+    "devices/add.sh": devices_add,
+    "devices/modify.sh": devices_modify,
+    "devices/update.sh": devices_update,
+    "devices/delete.sh": devices_delete,
+    "devices/remove.sh": devices_remove,
+    "devices/deactivate.sh": devices_deactivate,
+    "devices/get.sh": devices_get,
+    "devices/list.sh": devices_list,
+    "devices/config.sh": devices_config,
+    "nodes/list-core.sh": nodes_list_core,
+    "nodes/list-entry.sh": nodes_list_entry,
+    "entry/add-client.sh": entry_add_client,
+    "entry/remove-client.sh": entry_remove_client,
+    "store/commit.sh": store_commit,
+    "trial/find.sh": trial_find,
+    "trial/expire.sh": trial_expire,
+    "trial/prune.sh": trial_prune,
+    "trial/cleanup.sh": trial_cleanup,
+    "appeals/add.sh": appeals_add,
+    "appeals/reply.sh": appeals_reply,
+    "appeals/update.sh": appeals_update,
+}
+
+
+def parse_args(argv: list[str]) -> dict:
+    """--key value → {"key": value}; дефисы в именах заменяются на '_'."""
+    args = {}
+    i = 0
+    while i < len(argv):
+        flag = argv[i]
+        if not flag.startswith("--"):
+            raise ScriptError(f"unexpected argument: {flag}")
+        if i + 1 >= len(argv):
+            raise ScriptError(f"{flag} requires a value")
+        args[flag[2:].replace("-", "_")] = argv[i + 1]
+        i += 2
+    return args
+
+
+def run(tree: str | Path, script: str, argv: list[str]) -> int:
+    """Выполнить скрипт дерева tree; stdout — в sys.stdout, ошибка — в stderr."""
+    handler = SCRIPTS.get(script)
+    if handler is None:
+        print(f"{script}: not implemented by the fake tree", file=sys.stderr)
+        return 127
+    try:
+        t = FakeTree(tree)
+        t.delay(script)
+        handler(t, parse_args(argv))
+    except ScriptError as e:
+        print(f"{script}: {e}", file=sys.stderr)
+        return e.rc
+    for line in t.out:
+        print(line)
+    return 0
+
+
+# ---------------------------------------------------------------------------
+# Установка дерева
+# ---------------------------------------------------------------------------
+
+_SHIM = """#!/bin/sh
+PYTHONPATH={repo}${{PYTHONPATH:+:$PYTHONPATH}} exec {python} -m bench.scripts run {tree} {script} "$@"
+"""
+
+
+def install(
+    tree: str | Path,
+    store: str | Path,
+    latency: dict[str, float] | None = None,
+    entry_latency: dict[str, float] | None = None,
+    entry_down: list[str] | None = None,
+) -> Path:
+    """Создать дерево shim-скриптов и fake-scripts.json; вернуть путь к дереву."""
+    tree = Path(tree).resolve()
+    repo = Path(__file__).resolve().parent.parent
+    for script in SCRIPTS:
+        path = tree / script
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(_SHIM.format(repo=repo, python=sys.executable, tree=tree, script=script))
+        path.chmod(0o755)
+    configure(tree, store=str(Path(store).resolve()), latency=latency or {},
+              entry_latency=entry_latency or {}, entry_down=entry_down or [])
+    return tree
+
+
+def configure(tree: str | Path, **changes) -> dict:
+    """Обновить fake-scripts.json (действует со следующего вызова скрипта)."""
+    path = Path(tree) / CONFIG
+    config = json.loads(path.read_text(encoding="utf-8")) if path.exists() else {}
+    config.update(changes)
+    path.write_text(json.dumps(config, ensure_ascii=False, indent=2) + "\n", encoding="utf-8")
+    return config
+
+
+def parse_latency(values: list[str]) -> dict[str, float]:
+    """['0.05', 'users/list.sh=0.3'] → {"default": 0.05, "users/list.sh": 0.3}"""
+    latency = {}
+    for value in values:
+        key, _, seconds = value.rpartition("=")
+        latency[key or "default"] = float(seconds)
+    return latency
+
+
+def main() -> None:
+    if len(sys.argv) >= 4 and sys.argv[1] == "run":
+        sys.exit(run(sys.argv[2], sys.argv[3], sys.argv[4:]))
+
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Install a fake SIGIL_SCRIPTS_PATH tree over a registry")
+    sub = parser.add_subparsers(dest="command", required=True)
+    inst = sub.add_parser("install", help="create the shim tree")
+    inst.add_argument("tree")
+    inst.add_argument("--store", required=True, help="registry the scripts operate on")
+    inst.add_argument("--latency", action="append", default=[], metavar="[SCRIPT=]SECONDS")
+    inst.add_argument("--entry-latency", action="append", default=[], metavar="[IP=]SECONDS")
+    inst.add_argument("--entry-down", action="append", default=[], metavar="IP")
+    args = parser.parse_args()
+
+    tree = install(args.tree, args.store, parse_latency(args.latency),
+                   parse_latency(args.entry_latency), args.entry_down)
+    print(f"SIGIL_SCRIPTS_PATH={tree}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,248 @@
+"""
+bench/telegram.py
+Локальная замена api.telegram.org для нагрузочных прогонов (aiohttp).
+
+Реализованы методы, которые вызывает бот:
+  getMe, getUpdates (long polling с offset / timeout / limit),
+  sendMessage, sendPhoto, editMessageText, editMessageMedia,
+  editMessageReplyMarkup, answerCallbackQuery, deleteMessage.
+Остальные методы отвечают {"ok": true, "result": true}.
+
+Настраиваются задержка ответа (latency ± jitter), доля ответов 429 с
+retry_after и доля ответов 400 — для всех методов, кроме getMe / getUpdates.
+
+Служебные эндпоинты:
+  POST /bench/updates  — поставить апдейты в очередь (JSON-массив или NDJSON)
+  GET  /bench/stats    — счётчики вызовов по методам
+
+Бот направляется сюда через SIGILGATE_BOT_API_URL=http://127.0.0.1:<port>.
+
+    python -m bench.telegram --port 8081 --latency 0.05 --rate-limit 0.01
+"""
+
+import asyncio
+import itertools
+import json
+import logging
+import random
+import time
+from collections import Counter
+
+from aiohttp import web
+
+logger = logging.getLogger(__name__)
+
+BOT_USER = {
+    "id": 1000,
+    "is_bot": True,
+    "first_name": "SigilGate",
+    "username": "sigilgate_bench_bot",
+}
+
+# Методы, возвращающие Message
+_MESSAGE_METHODS = frozenset({
+    "sendmessage", "sendphoto", "editmessagetext", "editmessagemedia",
+    "editmessagereplymarkup", "editmessagecaption", "senddocument",
+})
+# Служебные методы без задержки и без инъекции ошибок
+_CONTROL_METHODS = frozenset({"getme", "getupdates", "deletewebhook", "close", "logout"})
+
+
+class FakeBotAPI:
+    def __init__(
+        self,
+        latency: float = 0.0,
+        jitter: float = 0.0,
+        rate_limit: float = 0.0,
+        retry_after: int = 1,
+        error_rate: float = 0.0,
+        seed: int = 1,
+    ) -> None:
+        self.latency = latency
+        self.jitter = jitter
+        self.rate_limit = rate_limit
+        self.retry_after = retry_after
+        self.error_rate = error_rate
+        self.rng = random.Random(seed)
+
+        self.calls: Counter[str] = Counter()
+        self.rate_limited: Counter[str] = Counter()
+        self.errors: Counter[str] = Counter()
+        self.delivered_at: dict[int, float] = {}  # update_id → monotonic время выдачи в getUpdates
+
+        self._queue: list[dict] = []
+        self._arrived = asyncio.Event()
+        self._message_ids = itertools.count(1_000_000)
+        self._runner: web.AppRunner | None = None
+
+    # ------------------------------------------------------------------
+    # Очередь апдейтов
+    # ------------------------------------------------------------------
+
+    def enqueue(self, updates: list[dict]) -> None:
+        self._queue.extend(updates)
+        self._arrived.set()
+
+    @property
+    def pending(self) -> int:
+        return len(self._queue)
+
+    async def _get_updates(self, params: dict) -> list[dict]:
+        offset = int(params.get("offset") or 0)
+        limit = min(int(params.get("limit") or 100), 100)
+        timeout = float(params.get("timeout") or 0)
+
+        if offset:
+            self._queue = [u for u in self._queue if u["update_id"] >= offset]
+        if not self._queue and timeout > 0:
+            self._arrived.clear()
+            try:
+                await asyncio.wait_for(self._arrived.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+
+        batch = self._queue[:limit]
+        now = time.monotonic()
+        for update in batch:
+            self.delivered_at.setdefault(update["update_id"], now)
+        return batch
+
+    # ------------------------------------------------------------------
+    # Ответы
+    # ------------------------------------------------------------------
+
+    def _message(self, params: dict) -> dict:
+        chat_id = int(params.get("chat_id") or 0)
+        message = {
+            "message_id": int(params.get("message_id") or next(self._message_ids)),
+            "date": int(time.time()),
+            "chat": {"id": chat_id, "type": "private"},
+            "from": BOT_USER,
+        }
+        if "text" in params:
+            message["text"] = params["text"]
+        if "photo" in params or "media" in params:
+            message["photo"] = [{
+                "file_id": f"bench-photo-{message['message_id']}",
+                "file_unique_id": f"p{message['message_id']}",
+                "width": 290,
+                "height": 290,
+            }]
+        if "caption" in params:
+            message["caption"] = params["caption"]
+        return message
+
+    async def handle_method(self, request: web.Request) -> web.Response:
+        method = request.match_info["method"]
+        key = method.lower()
+        params = dict(await request.post()) if request.can_read_body else {}
+        params.update(request.query)
+        self.calls[method] += 1
+
+        if key == "getupdates":
+            return web.json_response({"ok": True, "result": await self._get_updates(params)})
+        if key == "getme":
+            return web.json_response({"ok": True, "result": BOT_USER})
+        if key in _CONTROL_METHODS:
+            return web.json_response({"ok": True, "result": True})
+
+        delay = self.latency + (self.rng.uniform(-self.jitter, self.jitter) if self.jitter else 0.0)
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+        roll = self.rng.random()
+        if roll < self.rate_limit:
+            self.rate_limited[method] += 1
+            return web.json_response({
+                "ok": False,
+                "error_code": 429,
+                "description": f"Too Many Requests: retry after {self.retry_after}",
+                "parameters": {"retry_after": self.retry_after},
+            }, status=429)
+        if roll < self.rate_limit + self.error_rate:
+            self.errors[method] += 1
+            return web.json_response({
+                "ok": False, "error_code": 400, "description": "Bad Request: injected error",
+            }, status=400)
+
+        if key in _MESSAGE_METHODS:
+            return web.json_response({"ok": True, "result": self._message(params)})
+        return web.json_response({"ok": True, "result": True})
+
+    async def handle_enqueue(self, request: web.Request) -> web.Response:
+        body = (await request.text()).strip()
+        if body.startswith("["):
+            updates = json.loads(body)
+        else:
+            updates = [json.loads(line) for line in body.splitlines() if line.strip()]
+        self.enqueue(updates)
+        return web.json_response({"queued": len(updates), "pending": self.pending})
+
+    async def handle_stats(self, request: web.Request) -> web.Response:
+        return web.json_response(self.stats())
+
+    def stats(self) -> dict:
+        return {
+            "calls": dict(self.calls),
+            "rate_limited": dict(self.rate_limited),
+            "errors": dict(self.errors),
+            "pending": self.pending,
+        }
+
+    # ------------------------------------------------------------------
+
+    def create_app(self) -> web.Application:
+        app = web.Application(client_max_size=64 * 1024 * 1024)
+        app.router.add_post("/bench/updates", self.handle_enqueue)
+        app.router.add_get("/bench/stats", self.handle_stats)
+        app.router.add_route("*", "/bot{token}/{method}", self.handle_method)
+        return app
+
+    async def start(self, host: str = "127.0.0.1", port: int = 0) -> str:
+        """Запустить сервер; вернуть базовый URL (port=0 — свободный порт)."""
+        self._runner = web.AppRunner(self.create_app(), access_log=None)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, host, port)
+        await site.start()
+        bound = self._runner.addresses[0][1]
+        return f"http://{host}:{bound}"
+
+    async def close(self) -> None:
+        if self._runner is not None:
+            self._arrived.set()  # отпустить висящие getUpdates
+            await self._runner.cleanup()
+            self._runner = None
+
+
+def main() -> None:
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Fake Telegram Bot API server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8081)
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds per API call")
+    parser.add_argument("--jitter", type=float, default=0.0)
+    parser.add_argument("--rate-limit", type=float, default=0.0, help="share of 429 responses")
+    parser.add_argument("--retry-after", type=int, default=1)
+    parser.add_argument("--error-rate", type=float, default=0.0, help="share of 400 responses")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+
+    async def serve() -> None:
+        api = FakeBotAPI(args.latency, args.jitter, args.rate_limit, args.retry_after, args.error_rate)
+        url = await api.start(args.host, args.port)
+        logger.info("Fake Bot API at %s (SIGILGATE_BOT_API_URL=%s)", url, url)
+        try:
+            await asyncio.Event().wait()
+        finally:
+            await api.close()
+
+    try:
+        asyncio.run(serve())
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
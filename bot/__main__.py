@@ -2,12 +2,30 @@ import asyncio
 import logging
 
 from aiogram import Bot, Dispatcher
+from aiogram.client.session.aiohttp import AiohttpSession
+from aiogram.client.telegram import TelegramAPIServer
 from aiogram.fsm.storage.memory import MemoryStorage
 
+from bot import broadcast, progress, tracing
+from bot.appeals import AppealIndex
+from bot.broadcast_jobs import broadcast_jobs
+from bot.cache import invalidator, parse_cache
 from bot.config import load_config
 from bot.handlers import admin, guest, start, user
-from bot.handlers import reg, trial, announce, appeals
+from bot.handlers import reg, trial, announce, appeals, perf
+from bot.http import start_http_server
+from bot.metrics import monitor_loop_lag, register_bot_gauges
 from bot.middlewares.auth import AuthMiddleware
+from bot.middlewares.metrics import HandlerMetricsMiddleware, TelegramMetricsMiddleware, UpdateMetricsMiddleware
+from bot.models import set_decoder
+from bot.query import set_read_mode
+from bot.registry import DirectoryIndex, get_device_index, get_index, get_user_index
+from bot.runner import configure_limits, configure_pool, shutdown_pool
+from bot.scheduler import scheduler
+from bot.script_cache import script_cache, watcher_invalidator
+from bot.transaction import configure_group_commit, shutdown_group_commit
+from bot.vless import RouteIndex, invalidate_all as invalidate_links, invalidate_device as invalidate_device_links
+from bot.watcher import RegistryWatcher
 
 logging.basicConfig(
     level=logging.INFO,
@@ -16,10 +34,18 @@ logging.basicConfig(
 logger = logging.getLogger(__name__)
 
 
-async def main() -> None:
-    config = load_config()
+def create_bot(config: dict) -> Bot:
+    """Bot с middleware сессии; SIGILGATE_BOT_API_URL — свой сервер Bot API."""
+    session = None
+    if config["bot_api_url"]:
+        session = AiohttpSession(api=TelegramAPIServer.from_base(config["bot_api_url"]))
+    bot = Bot(token=config["token"], session=session)
+    bot.session.middleware(TelegramMetricsMiddleware())
+    return bot
+
 
-    bot = Bot(token=config["token"])
+def create_dispatcher(config: dict) -> Dispatcher:
+    """Dispatcher со всеми middleware и роутерами (роутеры подключаются один раз за процесс)."""
     dp = Dispatcher(storage=MemoryStorage())
 
     dp["store_path"] = config["store_path"]
@@ -28,6 +54,10 @@ async def main() -> None:
     dp["verbose"] = config["verbose"]
     dp["channel_id"] = config["channel_id"]
 
+    dp.update.outer_middleware(UpdateMetricsMiddleware())
+    dp.message.middleware(HandlerMetricsMiddleware())
+    dp.callback_query.middleware(HandlerMetricsMiddleware())
+
     dp.update.middleware(AuthMiddleware(
         store_path=config["store_path"],
         admin_ids=config["admin_ids"],
@@ -38,12 +68,95 @@ async def main() -> None:
     dp.include_router(admin.router)
     dp.include_router(announce.router)
     dp.include_router(appeals.router)
+    dp.include_router(perf.router)
     dp.include_router(user.router)
     dp.include_router(trial.router)
     dp.include_router(guest.router)
+    return dp
+
+
+def configure_runtime(config: dict) -> None:
+    """Декодер, режим чтения, кэши, пул, лимиты и полосы скриптов, групповой коммит, трассировка, рассылки, ход операций."""
+    logger.info("JSON decoder: %s", set_decoder(config["json_decoder"]))
+    logger.info("Registry read path: %s", set_read_mode(config["read_path"]))
+    parse_cache.resize(config["parse_cache_size"])
+    configure_pool(config["script_workers"], config["script_worker_max_jobs"])
+    configure_limits(config["script_timeouts"], config["script_output_limit"])
+    script_cache.enabled = config["script_cache"]
+    scheduler.configure(config["script_lanes"])
+    configure_group_commit(config["scripts_path"], config["group_commit_delay"])
+    tracing.configure(config["trace_slow_ms"], config["trace_export"])
+    broadcast.configure(config["broadcast_rate"], config["broadcast_concurrency"])
+    broadcast_jobs.configure(config["state_dir"])
+    progress.configure(config["progress_interval"])
+
+
+async def build_indexes(store_path: str) -> dict[str, DirectoryIndex]:
+    indexes = {
+        "users": get_user_index(store_path),
+        "devices": get_device_index(store_path),
+        "appeals": get_index(AppealIndex, store_path),
+        "routes": get_index(RouteIndex, store_path),
+    }
+    for index in indexes.values():
+        await asyncio.to_thread(index.build)
+    return indexes
+
+
+def start_watcher(config: dict, indexes: dict[str, DirectoryIndex]) -> RegistryWatcher:
+    watcher = RegistryWatcher(config["store_path"], config["registry_poll_interval"])
+    for subdir in ("users", "devices", "appeals", "routes"):
+        watcher.subscribe(subdir, indexes[subdir].invalidate)
+    watcher.subscribe("devices", invalidate_device_links)
+    for subdir in ("users", "routes", "nodes"):
+        watcher.subscribe(subdir, invalidate_links)
+    for subdir in ("users", "appeals"):
+        watcher.subscribe(subdir, invalidator(config["store_path"], subdir))
+    for subdir in ("users", "devices", "nodes", "routes"):
+        watcher.subscribe(subdir, watcher_invalidator(subdir))
+    watcher.start()
+    return watcher
+
+
+async def shutdown_runtime() -> None:
+    await broadcast_jobs.shutdown()
+    await shutdown_group_commit()
+    await shutdown_pool()
+
+
+async def main() -> None:
+    config = load_config()
+
+    bot = create_bot(config)
+    dp = create_dispatcher(config)
+    configure_runtime(config)
+
+    watcher = None
+    indexes = {}
+    if config["store_path"]:
+        indexes = await build_indexes(config["store_path"])
+        watcher = start_watcher(config, indexes)
+
+    http_runner = None
+    lag_task = None
+    if config["metrics_port"] > 0:
+        register_bot_gauges(dp.storage, indexes)
+        lag_task = asyncio.create_task(monitor_loop_lag())
+        http_runner = await start_http_server(config["metrics_host"], config["metrics_port"])
+
+    await broadcast_jobs.resume(bot)
 
     logger.info("Bot starting (v0.1.0)...")
-    await dp.start_polling(bot)
+    try:
+        await dp.start_polling(bot)
+    finally:
+        if http_runner is not None:
+            await http_runner.cleanup()
+        if lag_task is not None:
+            lag_task.cancel()
+        if watcher is not None:
+            await watcher.stop()
+        await shutdown_runtime()
 
 
 if __name__ == "__main__":
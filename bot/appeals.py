@@ -4,10 +4,15 @@ Read-only хелперы для работы с обращениями из regi
 Запись — только через скрипты (appeals/add.sh, update.sh, reply.sh).
 """
 
+import bisect
 import json
 import logging
 from pathlib import Path
 
+from bot.cache import load_json
+from bot.models import Appeal, loads
+from bot.registry import DirectoryIndex, get_index
+
 logger = logging.getLogger(__name__)
 
 _TRIAL_USERNAME = "trial"
@@ -18,39 +23,113 @@ def get_appeal(store_path: str, appeal_id: str) -> dict | None:
     if not path.exists():
         return None
     try:
-        return json.loads(path.read_text())
+        return load_json(path)
     except (json.JSONDecodeError, OSError) as e:
         logger.warning("Failed to read appeal %s: %s", appeal_id, e)
         return None
 
 
+class AppealIndex(DirectoryIndex):
+    """
+    Индекс обращений: бакеты по status и по user_id.
+
+    Каждый бакет — список (created, имя файла), упорядоченный по возрастанию
+    и поддерживаемый через bisect; выдача идёт в обратном порядке
+    (новые сверху), так что листинг не требует ни скана, ни сортировки.
+    """
+
+    subdir = "appeals"
+    record_type = Appeal
+
+    def __init__(self, store_path: str) -> None:
+        super().__init__(store_path)
+        self._all: list[tuple[str, str]] = []
+        self._by_status: dict[str, list[tuple[str, str]]] = {}
+        self._by_user: dict[str, list[tuple[str, str]]] = {}
+
+    @staticmethod
+    def _keys(data: dict) -> tuple[str, str | None, str]:
+        return (
+            str(data.get("created", "")),
+            data.get("status"),
+            str(data.get("user_id", "")),
+        )
+
+    def _index(self, name: str, data: dict) -> None:
+        created, status, user_id = self._keys(data)
+        item = (created, name)
+        bisect.insort(self._all, item)
+        bisect.insort(self._by_status.setdefault(status, []), item)
+        bisect.insort(self._by_user.setdefault(user_id, []), item)
+
+    def _unindex(self, name: str, data: dict) -> None:
+        created, status, user_id = self._keys(data)
+        item = (created, name)
+        _bucket_remove(self._all, item)
+        _bucket_remove(self._by_status.get(status), item)
+        _bucket_remove(self._by_user.get(user_id), item)
+
+    def _clear_indexes(self) -> None:
+        self._all.clear()
+        self._by_status.clear()
+        self._by_user.clear()
+
+    def query(
+        self,
+        *,
+        status: str | None = None,
+        user_id: str | None = None,
+        limit: int | None = None,
+    ) -> list[dict]:
+        with self._lock:
+            self.refresh()
+
+            if status is not None and user_id is not None:
+                by_status = self._by_status.get(status, [])
+                by_user = self._by_user.get(str(user_id), [])
+                # Идём по меньшему бакету, второе условие проверяем по записи
+                if len(by_status) <= len(by_user):
+                    bucket, field, value = by_status, "user_id", str(user_id)
+                else:
+                    bucket, field, value = by_user, "status", status
+                result = []
+                for _, name in reversed(bucket):
+                    data = self._records[name][1]
+                    if str(data.get(field, "")) == value:
+                        result.append(data)
+                        if limit is not None and len(result) >= limit:
+                            break
+                return result
+
+            if status is not None:
+                bucket = self._by_status.get(status, [])
+            elif user_id is not None:
+                bucket = self._by_user.get(str(user_id), [])
+            else:
+                bucket = self._all
+
+            start = max(len(bucket) - limit, 0) if limit is not None else 0
+            return [self._records[name][1] for _, name in reversed(bucket[start:])]
+
+
+def _bucket_remove(bucket: list[tuple[str, str]] | None, item: tuple[str, str]) -> None:
+    if not bucket:
+        return
+    i = bisect.bisect_left(bucket, item)
+    if i < len(bucket) and bucket[i] == item:
+        del bucket[i]
+
+
 def list_appeals(
     store_path: str,
     *,
     status: str | None = None,
     user_id: str | None = None,
+    limit: int | None = None,
 ) -> list[dict]:
-    appeals_dir = Path(store_path) / "appeals"
-    if not appeals_dir.is_dir():
-        return []
-
-    result = []
-    for file in appeals_dir.glob("*.json"):
-        try:
-            data = json.loads(file.read_text())
-        except (json.JSONDecodeError, OSError) as e:
-            logger.warning("Failed to read %s: %s", file, e)
-            continue
-
-        if status is not None and data.get("status") != status:
-            continue
-        if user_id is not None and str(data.get("user_id", "")) != str(user_id):
-            continue
-
-        result.append(data)
-
-    result.sort(key=lambda a: a.get("created", ""), reverse=True)
-    return result
+    """Обращения по фильтрам, новые сверху (created по убыванию)."""
+    index = get_index(AppealIndex, store_path)
+    return index.query(status=status, user_id=user_id, limit=limit)
 
 
 def list_users_for_broadcast(store_path: str) -> list[dict]:
@@ -62,7 +141,7 @@ def list_users_for_broadcast(store_path: str) -> list[dict]:
     result = []
     for file in users_dir.glob("*.json"):
         try:
-            data = json.loads(file.read_text())
+            data = loads(file.read_bytes())
         except (json.JSONDecodeError, OSError) as e:
             logger.warning("Failed to read %s: %s", file, e)
             continue
@@ -0,0 +1,213 @@
+"""
+bot/broadcast.py
+Рассылка одного сообщения многим получателям в пределах лимитов Bot API.
+
+Вместо последовательного bot.send_message по каждому получателю:
+
+  TokenBucket         — общий для всех рассылок темп отправки
+                        (SIGILGATE_BROADCAST_RATE, по умолчанию 25 сообщений/с
+                        при лимите Bot API ~30: остаток — ответам хендлеров)
+  concurrency         — запросов в полёте одновременно
+                        (SIGILGATE_BROADCAST_CONCURRENCY)
+  TelegramRetryAfter  — корзина останавливается на retry_after для всех,
+                        получатель возвращается в очередь
+
+Ошибка по одному получателю не прерывает рассылку — результат содержит
+исход по каждому: sent, blocked (бот заблокирован / чат недоступен) или
+failed с причиной.
+"""
+
+import asyncio
+import logging
+import time
+from typing import Callable
+
+from aiogram import Bot
+from aiogram.exceptions import (
+    TelegramBadRequest,
+    TelegramForbiddenError,
+    TelegramNetworkError,
+    TelegramNotFound,
+    TelegramRetryAfter,
+    TelegramServerError,
+)
+
+from bot.metrics import broadcast_messages, broadcast_retries
+from bot.tracing import span
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_RATE = 25.0        # сообщений в секунду
+DEFAULT_CONCURRENCY = 8
+MAX_ATTEMPTS = 5           # попыток на получателя (429 и сетевые ошибки)
+MAX_BACKOFF = 30.0         # секунд между попытками после сетевой ошибки
+
+SENT = "sent"
+BLOCKED = "blocked"
+FAILED = "failed"
+
+# (ключ получателя для отчёта — ID в реестре или ID канала, chat_id)
+Recipient = tuple[str, int | str]
+
+
+class TokenBucket:
+    """
+    Корзина токенов: rate в секунду, не больше burst подряд.
+
+    Ожидающие обслуживаются по очереди (FIFO). pause() останавливает выдачу
+    для всех — так исполняется retry_after из ответа 429. rate <= 0 — без
+    ограничения.
+    """
+
+    def __init__(self, rate: float, burst: float = 1.0) -> None:
+        self.rate = rate
+        self.burst = max(1.0, burst)
+        self._tokens = self.burst
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+        self._lock = asyncio.Lock()
+
+    def pause(self, seconds: float) -> None:
+        self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+        self._tokens = 0.0
+
+    async def acquire(self) -> None:
+        if self.rate <= 0 and self._paused_until <= time.monotonic():
+            return
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                if now < self._paused_until:
+                    await asyncio.sleep(self._paused_until - now)
+                    continue
+                if self.rate <= 0:
+                    return
+                self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1.0:
+                    self._tokens -= 1.0
+                    return
+                await asyncio.sleep((1.0 - self._tokens) / self.rate)
+
+
+_bucket = TokenBucket(DEFAULT_RATE)
+_concurrency = DEFAULT_CONCURRENCY
+
+
+def configure(rate: float, concurrency: int) -> None:
+    global _bucket, _concurrency
+    _bucket = TokenBucket(rate)
+    _concurrency = max(1, concurrency)
+
+
+class BroadcastResult:
+    def __init__(self, total: int = 0) -> None:
+        self.total = total
+        self.outcomes: dict[str, tuple[str, str]] = {}  # ключ → (исход, причина)
+
+    def record(self, key: str, outcome: str, reason: str = "") -> None:
+        self.outcomes[key] = (outcome, reason)
+        broadcast_messages.inc(outcome)
+
+    def count(self, outcome: str) -> int:
+        return sum(1 for o, _ in self.outcomes.values() if o == outcome)
+
+    @property
+    def sent(self) -> int:
+        return self.count(SENT)
+
+    @property
+    def failed(self) -> int:
+        return len(self.outcomes) - self.sent
+
+    def summary(self) -> str:
+        blocked = self.count(BLOCKED)
+        if not self.failed:
+            return f"Отправлено: {self.sent}"
+        text = f"Отправлено: {self.sent}, ошибок: {self.failed}"
+        if blocked:
+            text += f" (заблокировали бота: {blocked})"
+        return text
+
+
+async def _deliver(
+    bot: Bot,
+    key: str,
+    chat_id: int | str,
+    text: str,
+    attempt: int,
+    result: BroadcastResult,
+    requeue: Callable[[Recipient, int], None],
+) -> None:
+    await _bucket.acquire()
+    try:
+        await bot.send_message(chat_id, text)
+    except TelegramRetryAfter as e:
+        broadcast_retries.inc("retry_after")
+        _bucket.pause(e.retry_after)
+        if attempt < MAX_ATTEMPTS:
+            logger.info("Broadcast rate limited, pausing %ss (recipient %s)", e.retry_after, key)
+            requeue((key, chat_id), attempt + 1)
+        else:
+            result.record(key, FAILED, f"429 после {attempt} попыток")
+    except (TelegramForbiddenError, TelegramNotFound) as e:
+        result.record(key, BLOCKED, e.message)
+    except TelegramBadRequest as e:
+        logger.warning("Broadcast to %s rejected: %s", key, e.message)
+        result.record(key, FAILED, e.message)
+    except (TelegramNetworkError, TelegramServerError) as e:
+        broadcast_retries.inc("error")
+        if attempt < MAX_ATTEMPTS:
+            await asyncio.sleep(min(MAX_BACKOFF, 2.0 ** attempt))
+            requeue((key, chat_id), attempt + 1)
+        else:
+            logger.warning("Broadcast to %s failed after %d attempts: %s", key, attempt, e)
+            result.record(key, FAILED, str(e))
+    except Exception as e:
+        logger.warning("Failed to send broadcast message to %s: %s", key, e)
+        result.record(key, FAILED, str(e))
+    else:
+        result.record(key, SENT)
+
+
+async def broadcast(
+    bot: Bot,
+    recipients: list[Recipient],
+    text: str,
+    result: BroadcastResult | None = None,
+    stop: asyncio.Event | None = None,
+) -> BroadcastResult:
+    """
+    Отправить text всем recipients. Получатели, уже записанные в result
+    (например, с ошибкой расшифровки ID), учитываются в total, но не
+    отправляются повторно. После stop.set() воркеры не берут новых
+    получателей — оставшиеся остаются без исхода.
+    """
+    if result is None:
+        result = BroadcastResult()
+    pending = [(key, chat_id) for key, chat_id in recipients if key not in result.outcomes]
+    result.total = len(result.outcomes) + len(pending)
+
+    queue: asyncio.Queue[tuple[Recipient, int]] = asyncio.Queue()
+    for recipient in pending:
+        queue.put_nowait((recipient, 1))
+
+    def requeue(recipient: Recipient, attempt: int) -> None:
+        queue.put_nowait((recipient, attempt))
+
+    async def worker() -> None:
+        while not queue.empty() and not (stop is not None and stop.is_set()):
+            (key, chat_id), attempt = queue.get_nowait()
+            await _deliver(bot, key, chat_id, text, attempt, result, requeue)
+
+    started = time.monotonic()
+    with span("broadcast", recipients=len(pending)) as current:
+        await asyncio.gather(*(worker() for _ in range(min(_concurrency, len(pending)) or 1)))
+        if current is not None:
+            current.set(sent=result.sent, failed=result.failed)
+
+    logger.info(
+        "Broadcast to %d recipients in %.1fs: %d sent, %d failed",
+        len(pending), time.monotonic() - started, result.sent, result.failed,
+    )
+    return result
@@ -0,0 +1,353 @@
+"""
+bot/broadcast_jobs.py
+Рассылки как задания с журналом на диске: переживают перезапуск бота.
+
+Журнал задания — <SIGILGATE_STATE_DIR>/broadcasts/<id>.jsonl, только
+дописывается, по событию на строку:
+
+  {"op": "create", "id", "created", "target", "text", "chat_id",
+   "message_id", "recipients": [{"key", "enc"} | {"key", "chat_id"}]}
+  {"op": "outcome", "key", "outcome", "reason"}   — исход получателя
+  {"op": "status", "status", "ts"}                — running / paused /
+                                                    cancelled / done
+
+Курсор задания — множество получателей с исходом: при возобновлении
+отправляются только остальные. Telegram ID хранятся в журнале так же, как
+в реестре, — зашифрованными (encrypted_telegram_id); расшифровка — перед
+отправкой. Строка исхода дописывается сразу после ответа Bot API, поэтому
+после аварийной остановки повторно могут уйти не больше
+SIGILGATE_BROADCAST_CONCURRENCY сообщений, бывших в полёте.
+
+При старте бота задания в статусе running продолжаются автоматически,
+paused ждут администратора (/broadcasts). Исключение при выполнении ставит
+задание на паузу с причиной в сообщении администратору. Сообщение «Отправляю...» у
+администратора показывает ход рассылки (bot/progress.py): счётчики и
+оставшееся время, не чаще одной правки за SIGILGATE_PROGRESS_INTERVAL.
+Журналы завершённых заданий
+удаляются через JOB_RETENTION. Без SIGILGATE_STATE_DIR задания живут
+только в памяти.
+"""
+
+import asyncio
+import json
+import logging
+import os
+import time
+import uuid
+from datetime import datetime, timezone
+from pathlib import Path
+
+from aiogram import Bot
+
+from bot.broadcast import FAILED, SENT, BroadcastResult, Recipient, broadcast
+from bot.crypto import decrypt_telegram_id
+from bot.progress import Progress
+from bot.tracing import detached_context
+
+logger = logging.getLogger(__name__)
+
+JOB_RETENTION = 30 * 24 * 3600  # секунд хранения журналов завершённых заданий
+
+RUNNING = "running"
+PAUSED = "paused"
+CANCELLED = "cancelled"
+DONE = "done"
+FINISHED = (CANCELLED, DONE)
+
+
+def _now() -> str:
+    return datetime.now(timezone.utc).isoformat(timespec="seconds")
+
+
+class JobResult(BroadcastResult):
+    """BroadcastResult, дописывающий каждый исход в журнал задания."""
+
+    def __init__(self, job: "BroadcastJob") -> None:
+        super().__init__(len(job.recipients))
+        self.job = job
+
+    def record(self, key: str, outcome: str, reason: str = "") -> None:
+        super().record(key, outcome, reason)
+        self.job.append({"op": "outcome", "key": key, "outcome": outcome, "reason": reason})
+        if self.job.progress is not None:
+            self.job.progress.advance(outcome == SENT)
+
+
+class BroadcastJob:
+    def __init__(
+        self,
+        job_id: str,
+        target: str,
+        text: str,
+        recipients: list[dict],
+        chat_id: int | None,
+        message_id: int | None,
+        created: str,
+        path: Path | None,
+    ) -> None:
+        self.id = job_id
+        self.target = target
+        self.text = text
+        self.recipients = recipients
+        self.chat_id = chat_id        # сообщение о ходе рассылки у администратора
+        self.message_id = message_id
+        self.created = created
+        self.path = path
+        self.status = RUNNING
+        self.result = JobResult(self)
+        self.stop = asyncio.Event()
+        self.task: asyncio.Task | None = None
+        self.progress: Progress | None = None
+        self.error: str | None = None  # почему выполнение прервано (пауза по ошибке)
+        self._journal = None  # открытый журнал на время выполнения
+
+    # -- журнал ----------------------------------------------------------------
+
+    def open(self) -> None:
+        """Держать журнал открытым на время выполнения: исход получателя — одна
+        запись в буфер строки, без open/close на event loop."""
+        if self.path is not None and self._journal is None:
+            self._journal = open(self.path, "a", encoding="utf-8", buffering=1)
+
+    def close(self) -> None:
+        if self._journal is not None:
+            self._journal.close()
+            self._journal = None
+
+    def append(self, event: dict, sync: bool = False) -> None:
+        if self.path is None:
+            return
+        line = json.dumps(event, ensure_ascii=False) + "\n"
+        if self._journal is not None:
+            self._journal.write(line)
+            if sync:
+                os.fsync(self._journal.fileno())
+            return
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.write(line)
+            if sync:
+                f.flush()
+                os.fsync(f.fileno())
+
+    def set_status(self, status: str) -> None:
+        self.status = status
+        self.append({"op": "status", "status": status, "ts": _now()}, sync=True)
+
+    @classmethod
+    def load(cls, path: Path) -> "BroadcastJob":
+        """Восстановить задание из журнала; оборванная последняя строка пропускается."""
+        job = None
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    event = json.loads(line)
+                except json.JSONDecodeError:
+                    logger.warning("Broadcast journal %s: skipping damaged line", path.name)
+                    continue
+                if event.get("op") == "create":
+                    job = cls(
+                        event["id"], event.get("target", ""), event["text"], event["recipients"],
+                        event.get("chat_id"), event.get("message_id"), event.get("created", ""), path,
+                    )
+                elif job is None:
+                    continue
+                elif event.get("op") == "outcome":
+                    # Без записи в журнал и метрики — исход уже учтён
+                    job.result.outcomes[event["key"]] = (event["outcome"], event.get("reason", ""))
+                elif event.get("op") == "status":
+                    job.status = event["status"]
+        if job is None:
+            raise ValueError(f"{path.name}: no create record")
+        return job
+
+    # -- получатели --------------------------------------------------------------
+
+    @property
+    def remaining(self) -> int:
+        return len(self.recipients) - len(self.result.outcomes)
+
+    def pending(self) -> list[Recipient]:
+        """Получатели без исхода; ошибки расшифровки сразу записываются как failed."""
+        recipients = []
+        for spec in self.recipients:
+            key = spec["key"]
+            if key in self.result.outcomes:
+                continue
+            if "chat_id" in spec:
+                recipients.append((key, spec["chat_id"]))
+                continue
+            try:
+                recipients.append((key, decrypt_telegram_id(spec["enc"])))
+            except Exception as e:
+                logger.warning("Failed to decrypt telegram_id for user %s: %s", key, e)
+                self.result.record(key, FAILED, "не удалось расшифровать ID")
+        return recipients
+
+
+class BroadcastJobs:
+    """Реестр заданий рассылки процесса; журналы — в state_dir/broadcasts."""
+
+    def __init__(self) -> None:
+        self.directory: Path | None = None
+        self.jobs: dict[str, BroadcastJob] = {}
+        self.bot: Bot | None = None
+
+    def configure(self, state_dir: str) -> None:
+        if not state_dir:
+            logger.warning("SIGILGATE_STATE_DIR is not set, broadcast jobs will not survive a restart")
+            self.directory = None
+            return
+        self.directory = Path(state_dir) / "broadcasts"
+        self.directory.mkdir(parents=True, exist_ok=True)
+
+    # -- жизненный цикл ------------------------------------------------------------
+
+    async def resume(self, bot: Bot) -> None:
+        """Загрузить журналы; продолжить задания в статусе running."""
+        self.bot = bot
+        if self.directory is None:
+            return
+        cutoff = time.time() - JOB_RETENTION
+        for path in sorted(self.directory.glob("*.jsonl")):
+            try:
+                job = await asyncio.to_thread(BroadcastJob.load, path)
+            except (OSError, ValueError, KeyError) as e:
+                logger.error("Cannot load broadcast journal %s: %s", path.name, e)
+                continue
+            if job.status in FINISHED and path.stat().st_mtime < cutoff:
+                path.unlink(missing_ok=True)
+                continue
+            self.jobs[job.id] = job
+            if job.status == RUNNING:
+                logger.info("Resuming broadcast %s: %d of %d recipients left",
+                            job.id, job.remaining, len(job.recipients))
+                self._start(job)
+
+    async def shutdown(self) -> None:
+        """Остановить воркеры, не меняя статус: running-задания продолжатся при старте."""
+        tasks = [job.task for job in self.jobs.values() if job.task is not None and not job.task.done()]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    # -- операции -------------------------------------------------------------------
+
+    def create(
+        self,
+        bot: Bot,
+        target: str,
+        text: str,
+        recipients: list[dict],
+        errors: dict[str, str],
+        chat_id: int | None = None,
+        message_id: int | None = None,
+    ) -> BroadcastJob:
+        """
+        Записать задание в журнал и запустить. recipients — [{"key", "enc"}] или
+        [{"key", "chat_id"}]; errors — получатели, для которых ID не найден.
+        """
+        self.bot = bot
+        job_id = uuid.uuid4().hex[:8]
+        path = self.directory / f"{job_id}.jsonl" if self.directory is not None else None
+        specs = recipients + [{"key": key, "chat_id": None} for key in errors]
+        job = BroadcastJob(job_id, target, text, specs, chat_id, message_id, _now(), path)
+        job.append({
+            "op": "create", "id": job_id, "created": job.created, "target": target, "text": text,
+            "chat_id": chat_id, "message_id": message_id, "recipients": specs,
+        }, sync=True)
+        for key, reason in errors.items():
+            job.result.record(key, FAILED, reason)
+        self.jobs[job_id] = job
+        self._start(job)
+        return job
+
+    def pause(self, job_id: str) -> BroadcastJob | None:
+        job = self.jobs.get(job_id)
+        if job is None or job.status != RUNNING:
+            return None
+        job.set_status(PAUSED)
+        job.stop.set()
+        return job
+
+    def resume_job(self, job_id: str) -> BroadcastJob | None:
+        job = self.jobs.get(job_id)
+        if job is None or job.status != PAUSED or (job.task is not None and not job.task.done()):
+            return None
+        job.set_status(RUNNING)
+        self._start(job)
+        return job
+
+    def cancel(self, job_id: str) -> BroadcastJob | None:
+        job = self.jobs.get(job_id)
+        if job is None or job.status in FINISHED:
+            return None
+        job.set_status(CANCELLED)
+        job.stop.set()
+        return job
+
+    def list(self, limit: int = 10) -> list[BroadcastJob]:
+        """Незавершённые задания, затем последние завершённые; новые сверху."""
+        jobs = sorted(self.jobs.values(), key=lambda j: j.created, reverse=True)
+        active = [j for j in jobs if j.status not in FINISHED]
+        return (active + [j for j in jobs if j.status in FINISHED])[:limit]
+
+    # -- выполнение ------------------------------------------------------------------
+
+    def _start(self, job: BroadcastJob) -> None:
+        job.stop = asyncio.Event()
+        # Задание переживает апдейт /send — не в его трейсе
+        job.task = asyncio.create_task(
+            self._run(job), name=f"broadcast-{job.id}", context=detached_context()
+        )
+
+    async def _run(self, job: BroadcastJob) -> None:
+        if job.chat_id is not None and job.message_id is not None:
+            job.progress = Progress(
+                lambda text: self.bot.edit_message_text(text, chat_id=job.chat_id, message_id=job.message_id),
+                f"Рассылка {job.id}", total=len(job.recipients),
+                done=len(job.result.outcomes), errors=job.result.failed, stage="отправка",
+            )
+        job.open()
+        job.error = None
+        try:
+            await broadcast(self.bot, job.pending(), job.text, job.result, job.stop)
+            job.result.total = len(job.recipients)
+            if not job.stop.is_set():  # пауза или отмена — статус уже записан
+                job.set_status(DONE)
+        except Exception as e:
+            # Задание не должно зависнуть в running: пауза, продолжение — из /broadcasts
+            logger.exception("Broadcast %s failed", job.id)
+            job.error = (str(e) or type(e).__name__)[:200]
+            if job.status == RUNNING:
+                job.set_status(PAUSED)
+        finally:
+            job.close()
+            progress, job.progress = job.progress, None
+            if progress is not None:
+                await progress.close()
+        await self.report(job, describe(job))
+
+    async def report(self, job: BroadcastJob, text: str) -> None:
+        if job.chat_id is None or job.message_id is None:
+            return
+        try:
+            await self.bot.edit_message_text(text, chat_id=job.chat_id, message_id=job.message_id)
+        except Exception as e:
+            logger.warning("Cannot update broadcast %s status message: %s", job.id, e)
+
+
+def describe(job: BroadcastJob) -> str:
+    """Строка состояния задания для администратора."""
+    if job.status == DONE:
+        return f"Готово. {job.result.summary()}"
+    summary = f"{job.result.summary()}, осталось: {job.remaining}"
+    if job.status == PAUSED and job.error:
+        return f"Рассылка {job.id} остановлена из-за ошибки ({job.error}). {summary}"
+    if job.status == PAUSED:
+        return f"Рассылка {job.id} на паузе. {summary}"
+    if job.status == CANCELLED:
+        return f"Рассылка {job.id} отменена. {summary}"
+    return f"Отправляю... {summary}"
+
+
+broadcast_jobs = BroadcastJobs()
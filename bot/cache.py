@@ -0,0 +1,116 @@
+"""
+bot/cache.py
+LRU-кэш разобранных JSON-файлов реестра.
+
+Ключ — путь к файлу, значение действительно, пока не изменился
+(st_mtime_ns, st_size, st_ino). Неизменённый файл стоит один stat без
+чтения и json.loads. Размер кэша ограничен числом записей
+(SIGILGATE_PARSE_CACHE_SIZE).
+
+Возвращаемые объекты разделяются между вызовами — не изменять.
+"""
+
+import logging
+import os
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any
+
+from bot.models import loads
+from bot.registry import StatSig, stat_sig
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_ENTRIES = 1024
+
+
+class ParseCache:
+    def __init__(self, max_entries: int = DEFAULT_MAX_ENTRIES) -> None:
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._entries: OrderedDict[str, tuple[StatSig, Any]] = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def load(self, path: str | Path) -> Any:
+        """
+        Прочитать и разобрать JSON-файл, используя кэш.
+
+        Исключения те же, что у чтения файла и json.loads
+        (OSError, json.JSONDecodeError) — обработка остаётся у вызывающего.
+        """
+        key = os.fspath(path)
+        sig = stat_sig(os.stat(key))
+
+        with self._lock:
+            cached = self._entries.get(key)
+            if cached is not None and cached[0] == sig:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return cached[1]
+            self.misses += 1
+
+        data = loads(Path(key).read_bytes())
+
+        with self._lock:
+            self._entries[key] = (sig, data)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return data
+
+    def invalidate(self, path: str | Path | None = None) -> None:
+        """Сбросить запись по пути или весь кэш."""
+        with self._lock:
+            if path is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(os.fspath(path), None)
+
+    def invalidate_dir(self, directory: str | Path) -> None:
+        """Сбросить все записи внутри директории."""
+        prefix = os.path.join(os.fspath(directory), "")
+        with self._lock:
+            for key in [k for k in self._entries if k.startswith(prefix)]:
+                del self._entries[key]
+
+    def resize(self, max_entries: int) -> None:
+        with self._lock:
+            self.max_entries = max_entries
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+        }
+
+
+parse_cache = ParseCache()
+
+
+def load_json(path: str | Path) -> Any:
+    """json.loads(path.read_text()) через общий кэш."""
+    return parse_cache.load(path)
+
+
+def invalidator(store_path: str, subdir: str):
+    """Колбэк для RegistryWatcher.subscribe: сбрасывает записи <store>/<subdir>/."""
+    base = Path(store_path) / subdir
+
+    def _invalidate(name: str | None) -> None:
+        if name is None:
+            parse_cache.invalidate_dir(base)
+        else:
+            parse_cache.invalidate(base / name)
+
+    return _invalidate
@@ -0,0 +1,233 @@
+"""
+bot/cascade.py
+Каскадная деактивация / архивация устройств пользователя.
+
+Вместо последовательного devices/deactivate.sh по каждому устройству
+(N × SSH + перезапуск Xray) UUID снимаются с Entry-нод напрямую:
+
+  nodes/list-entry.sh --user <id>        → Entry-ноды пользователя
+  entry/remove-client.sh --host ... × N  → разные ноды параллельно,
+                                           в пределах ноды — по очереди
+  devices/update.sh --uuid ... --status  → запись в реестр
+                                           (или devices/modify.sh в транзакции)
+
+Вызовы entry/* к одному хосту идут по очереди во всём процессе (блокировка
+на хост), поэтому два каскада или каскад и очистка триала не перезапускают
+Xray на одной ноде одновременно. entry/remove-client.sh идёт в полосе
+планировщика entry (SIGILGATE_SCRIPT_LANE_ENTRY), а не background: иначе
+параллельно обрабатывались бы не больше двух нод. Ошибка по одному устройству не прерывает каскад —
+результат содержит исход по каждому устройству. Ход каскада (снятие с нод,
+затем запись в реестр) можно показывать администратору через Progress.
+"""
+
+import asyncio
+import json
+import logging
+
+from bot.models import loads
+from bot.progress import Progress
+from bot.query import list_devices
+from bot.runner import SendFunc, run_script
+from bot.transaction import WriteTransaction
+
+logger = logging.getLogger(__name__)
+
+_host_locks: dict[str, asyncio.Lock] = {}  # Entry-нода → блокировка (общая для всех каскадов)
+
+
+def _host_lock(host: str) -> asyncio.Lock:
+    lock = _host_locks.get(host)
+    if lock is None:
+        lock = _host_locks[host] = asyncio.Lock()
+    return lock
+
+
+class CascadeResult:
+    def __init__(self, total: int = 0) -> None:
+        self.total = total
+        self.done: list[str] = []
+        self.failed: dict[str, str] = {}  # uuid → причина
+        self.error: str | None = None  # каскад не удалось начать
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None and not self.failed
+
+    def summary(self) -> str:
+        if self.error is not None:
+            return f"Ошибка: {self.error}"
+        lines = [f"Устройств: {self.total}, успешно: {len(self.done)}, ошибок: {len(self.failed)}"]
+        for uuid, reason in self.failed.items():
+            lines.append(f"• <code>{uuid}</code>: {reason}")
+        if self.failed:
+            # entry/remove-client.sh идемпотентен — повтор снимает только оставшееся
+            lines.append("Статус этих устройств не изменён, повторите операцию.")
+        return "\n".join(lines)
+
+
+async def _entry_nodes(
+    user_id: str, scripts_path: str, send: SendFunc | None, verbose: bool
+) -> tuple[dict[str, list[str]] | None, str]:
+    """IP Entry-ноды → список service_name. (None, причина) при ошибке."""
+    rc, stdout, stderr = await run_script(
+        [f"{scripts_path}/nodes/list-entry.sh", "--user", user_id],
+        send=send, verbose=verbose,
+    )
+    if rc != 0:
+        logger.error("nodes/list-entry.sh failed for user %s: %s", user_id, stderr)
+        return None, "nodes/list-entry.sh failed"
+    try:
+        nodes = loads(stdout)
+    except json.JSONDecodeError:
+        logger.error("nodes/list-entry.sh returned invalid JSON: %s", stdout)
+        return None, "nodes/list-entry.sh returned invalid JSON"
+
+    by_host: dict[str, list[str]] = {}
+    for node in nodes:
+        host, service_name = node.get("ip"), node.get("service_name")
+        if host and service_name and service_name not in by_host.setdefault(host, []):
+            by_host[host].append(service_name)
+    return by_host, ""
+
+
+async def _remove_from_node(
+    host: str,
+    service_names: list[str],
+    uuids: list[str],
+    scripts_path: str,
+    send: SendFunc | None,
+    verbose: bool,
+    progress: Progress | None = None,
+) -> dict[str, str]:
+    """Снять UUID с одной Entry-ноды по очереди. Возвращает uuid → ошибка."""
+    errors: dict[str, str] = {}
+    async with _host_lock(host):
+        for uuid in uuids:
+            for service_name in service_names:
+                rc, _, stderr = await run_script(
+                    [
+                        f"{scripts_path}/entry/remove-client.sh",
+                        "--host", host, "--uuid", uuid, "--service-name", service_name,
+                    ],
+                    send=send, verbose=verbose, lane="entry",
+                )
+                if rc != 0:
+                    logger.error("entry/remove-client.sh failed for %s on %s: %s", uuid, host, stderr)
+                    errors[uuid] = stderr.strip()
+                    break
+            if progress is not None:
+                progress.advance(uuid not in errors)
+    return errors
+
+
+async def detach_from_entries(
+    user_id: str,
+    uuids: list[str],
+    scripts_path: str,
+    send: SendFunc | None = None,
+    verbose: bool = False,
+    progress: Progress | None = None,
+) -> dict[str, str]:
+    """
+    Снять UUID устройств пользователя со всех его Entry-нод.
+    Возвращает uuid → причина для устройств, которые снять не удалось;
+    в причине перечислены все ноды, где снятие не прошло.
+    С progress шаг — одно устройство на одной ноде.
+    """
+    if not uuids:
+        return {}
+    by_host, reason = await _entry_nodes(user_id, scripts_path, send, verbose)
+    if by_host is None:
+        return {uuid: reason for uuid in uuids}
+
+    if progress is not None:
+        progress.add(len(uuids) * len(by_host))
+    per_node = await asyncio.gather(*(
+        _remove_from_node(host, names, uuids, scripts_path, send, verbose, progress)
+        for host, names in by_host.items()
+    ))
+    hosts: dict[str, list[str]] = {}
+    for host, errors in zip(by_host, per_node):
+        for uuid in errors:
+            hosts.setdefault(uuid, []).append(host)
+    return {uuid: "не снято с " + ", ".join(failed) for uuid, failed in hosts.items()}
+
+
+async def _set_status(
+    uuid: str,
+    status: str,
+    scripts_path: str,
+    send: SendFunc | None,
+    verbose: bool,
+    tx: WriteTransaction | None,
+) -> bool:
+    if tx is not None:
+        script = "devices/modify.sh"
+        rc, _, stderr = await tx.run(
+            [f"{scripts_path}/{script}", "--uuid", uuid, "--status", status]
+        )
+    else:
+        script = "devices/update.sh"
+        rc, _, stderr = await run_script(
+            [f"{scripts_path}/{script}", "--uuid", uuid, "--status", status],
+            send=send, verbose=verbose,
+        )
+    if rc != 0:
+        logger.error("%s --status %s failed for %s: %s", script, status, uuid, stderr)
+    return rc == 0
+
+
+async def run_cascade(
+    user_id: str,
+    target_status: str,
+    store_path: str,
+    scripts_path: str,
+    send: SendFunc | None = None,
+    verbose: bool = False,
+    tx: WriteTransaction | None = None,
+    progress: Progress | None = None,
+) -> CascadeResult:
+    """
+    Перевести устройства пользователя в target_status (inactive / archived).
+
+    Активные устройства сначала снимаются со всех Entry-нод пользователя;
+    статус в реестре меняется только у устройств, снятых со всех нод.
+    С tx статусы пишутся devices/modify.sh и коммитятся вместе с транзакцией.
+    progress получает шаги: устройство × Entry-нода, затем запись по устройству.
+    """
+    devices = await list_devices(user_id, store_path, scripts_path, send=send, verbose=verbose)
+    if devices is None:
+        result = CascadeResult()
+        result.error = "devices/list.sh failed"
+        return result
+
+    targets = [d for d in devices if d.get("uuid") and d.get("status") not in (target_status, "archived")]
+    result = CascadeResult(len(targets))
+    active = [d["uuid"] for d in targets if d.get("status") == "active"]
+
+    if progress is not None:
+        progress.add(len(targets))
+        progress.set_stage("снятие с Entry-нод")
+    result.failed.update(await detach_from_entries(user_id, active, scripts_path, send, verbose, progress))
+
+    # Запись в реестр — последовательно (один git-репозиторий)
+    if progress is not None:
+        progress.set_stage("запись в реестр")
+    for device in targets:
+        uuid = device["uuid"]
+        if uuid in result.failed:
+            if progress is not None:
+                progress.advance(ok=False)
+            continue
+        if await _set_status(uuid, target_status, scripts_path, send, verbose, tx):
+            result.done.append(uuid)
+        else:
+            result.failed[uuid] = "status update failed"
+        if progress is not None:
+            progress.advance(uuid in result.done)
+
+    logger.info(
+        "Cascade %s for user %s: %d done, %d failed",
+        target_status, user_id, len(result.done), len(result.failed),
+    )
+    return result
@@ -31,6 +31,96 @@ def load_config() -> dict:
     if not channel_id:
         logger.warning("SIGILGATE_CHANNEL_ID is not set, channel messaging will not work")
 
+    try:
+        registry_poll_interval = float(os.environ.get("SIGILGATE_REGISTRY_POLL_INTERVAL", "5"))
+    except ValueError:
+        logger.warning("SIGILGATE_REGISTRY_POLL_INTERVAL is not a number, using 5")
+        registry_poll_interval = 5.0
+
+    try:
+        parse_cache_size = int(os.environ.get("SIGILGATE_PARSE_CACHE_SIZE", "1024"))
+    except ValueError:
+        logger.warning("SIGILGATE_PARSE_CACHE_SIZE is not an integer, using 1024")
+        parse_cache_size = 1024
+
+    json_decoder = os.environ.get("SIGILGATE_JSON_DECODER", "auto").strip().lower() or "auto"
+
+    read_path = os.environ.get("SIGILGATE_READ_PATH", "native").strip().lower() or "native"
+
+    try:
+        script_workers = int(os.environ.get("SIGILGATE_SCRIPT_WORKERS", "0"))
+        script_worker_max_jobs = int(os.environ.get("SIGILGATE_SCRIPT_WORKER_MAX_JOBS", "100"))
+    except ValueError:
+        logger.warning("SIGILGATE_SCRIPT_WORKERS* are not integers, worker pool disabled")
+        script_workers, script_worker_max_jobs = 0, 100
+
+    script_lanes = {}
+    for lane, default in (("read", 8), ("write", 4), ("background", 2), ("entry", 8)):
+        env = f"SIGILGATE_SCRIPT_LANE_{lane.upper()}"
+        try:
+            script_lanes[lane] = int(os.environ.get(env, str(default)))
+        except ValueError:
+            logger.warning("%s is not an integer, using %d", env, default)
+            script_lanes[lane] = default
+
+    try:
+        group_commit_delay = float(os.environ.get("SIGILGATE_GROUP_COMMIT_DELAY", "0"))
+    except ValueError:
+        logger.warning("SIGILGATE_GROUP_COMMIT_DELAY is not a number, group commit disabled")
+        group_commit_delay = 0.0
+
+    script_timeouts = {}
+    for cls, default in (("read", 15.0), ("write", 120.0), ("entry", 60.0)):
+        env = f"SIGILGATE_SCRIPT_TIMEOUT_{cls.upper()}"
+        try:
+            script_timeouts[cls] = float(os.environ.get(env, str(default)))
+        except ValueError:
+            logger.warning("%s is not a number, using %s", env, default)
+            script_timeouts[cls] = default
+
+    try:
+        script_output_limit = int(os.environ.get("SIGILGATE_SCRIPT_OUTPUT_LIMIT", str(32 * 1024 * 1024)))
+    except ValueError:
+        logger.warning("SIGILGATE_SCRIPT_OUTPUT_LIMIT is not an integer, using 32 MiB")
+        script_output_limit = 32 * 1024 * 1024
+
+    script_cache = os.environ.get("SIGILGATE_SCRIPT_CACHE", "1").lower() not in ("0", "false", "no")
+
+    try:
+        metrics_port = int(os.environ.get("SIGILGATE_METRICS_PORT", "0"))
+    except ValueError:
+        logger.warning("SIGILGATE_METRICS_PORT is not an integer, metrics endpoint disabled")
+        metrics_port = 0
+    metrics_host = os.environ.get("SIGILGATE_METRICS_HOST", "127.0.0.1")
+
+    try:
+        trace_slow_ms = float(os.environ.get("SIGILGATE_TRACE_SLOW_MS", "3000"))
+    except ValueError:
+        logger.warning("SIGILGATE_TRACE_SLOW_MS is not a number, using 3000")
+        trace_slow_ms = 3000.0
+    trace_export = os.environ.get("SIGILGATE_TRACE_EXPORT") or None
+
+    bot_api_url = os.environ.get("SIGILGATE_BOT_API_URL", "").rstrip("/") or None
+
+    state_dir = os.environ.get("SIGILGATE_STATE_DIR", "")
+
+    try:
+        broadcast_rate = float(os.environ.get("SIGILGATE_BROADCAST_RATE", "25"))
+    except ValueError:
+        logger.warning("SIGILGATE_BROADCAST_RATE is not a number, using 25")
+        broadcast_rate = 25.0
+    try:
+        broadcast_concurrency = int(os.environ.get("SIGILGATE_BROADCAST_CONCURRENCY", "8"))
+    except ValueError:
+        logger.warning("SIGILGATE_BROADCAST_CONCURRENCY is not an integer, using 8")
+        broadcast_concurrency = 8
+
+    try:
+        progress_interval = float(os.environ.get("SIGILGATE_PROGRESS_INTERVAL", "3"))
+    except ValueError:
+        logger.warning("SIGILGATE_PROGRESS_INTERVAL is not a number, using 3")
+        progress_interval = 3.0
+
     return {
         "token": token,
         "store_path": store_path,
@@ -38,4 +128,24 @@ def load_config() -> dict:
         "scripts_path": scripts_path,
         "verbose": verbose,
         "channel_id": channel_id,
+        "registry_poll_interval": registry_poll_interval,
+        "parse_cache_size": parse_cache_size,
+        "json_decoder": json_decoder,
+        "read_path": read_path,
+        "script_workers": script_workers,
+        "script_worker_max_jobs": script_worker_max_jobs,
+        "script_cache": script_cache,
+        "script_lanes": script_lanes,
+        "group_commit_delay": group_commit_delay,
+        "script_timeouts": script_timeouts,
+        "script_output_limit": script_output_limit,
+        "metrics_port": metrics_port,
+        "metrics_host": metrics_host,
+        "trace_slow_ms": trace_slow_ms,
+        "trace_export": trace_export,
+        "bot_api_url": bot_api_url,
+        "broadcast_rate": broadcast_rate,
+        "broadcast_concurrency": broadcast_concurrency,
+        "state_dir": state_dir,
+        "progress_interval": progress_interval,
     }
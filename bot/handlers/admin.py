@@ -10,9 +10,15 @@ from aiogram.types import (
     Message,
 )
 
+from bot.cascade import detach_from_entries, run_cascade
 from bot.crypto import decrypt_telegram_id, hash_telegram_id
+from bot.models import loads
+from bot.progress import Progress
+from bot.query import get_device, get_user, list_users
 from bot.roles import Role
-from bot.runner import run_script
+from bot.runner import failure_text, run_script
+from bot.scheduler import background
+from bot.transaction import WriteTransaction, transaction
 
 logger = logging.getLogger(__name__)
 
@@ -115,25 +121,12 @@ def _list_text(status_filter: str, count: int) -> str:
 
 async def _fetch_users(
     status_filter: str,
+    store_path: str,
     scripts_path: str,
     verbose: bool,
     send,
 ) -> list[dict] | None:
-    cmd = [f"{scripts_path}/users/list.sh"]
-    if status_filter == "active":
-        cmd += ["--status", "active"]
-
-    rc, stdout, stderr = await run_script(cmd, send=send, verbose=verbose)
-
-    if rc != 0:
-        logger.error("users/list.sh failed: %s", stderr)
-        return None
-
-    try:
-        return json.loads(stdout)
-    except json.JSONDecodeError:
-        logger.error("users/list.sh returned invalid JSON: %s", stdout)
-        return None
+    return await list_users(status_filter, store_path, scripts_path, send=send, verbose=verbose)
 
 
 # ---------------------------------------------------------------------------
@@ -142,11 +135,17 @@ async def _fetch_users(
 
 async def _cleanup_trial_devices(
     hash_tg_id: str,
+    store_path: str,
     scripts_path: str,
-    verbose: bool,
-    send,
+    tx: WriteTransaction,
+    progress: Progress | None = None,
 ) -> None:
-    """Удаляет все триал-устройства пользователя после одобрения регистрации."""
+    """
+    Удаляет все триал-устройства пользователя после одобрения регистрации.
+
+    Активные устройства снимаются с Entry-нод, записи удаляются
+    devices/delete.sh в транзакции одобрения (один коммит на всё).
+    """
     hash_prefix = hash_tg_id[:16]
     rc, stdout, stderr = await run_script(
         [f"{scripts_path}/trial/find.sh", "--hash-telegram-id", hash_prefix],
@@ -156,21 +155,44 @@ async def _cleanup_trial_devices(
         return
 
     try:
-        devices = json.loads(stdout)
+        devices = loads(stdout)
     except json.JSONDecodeError:
         logger.warning("trial/find.sh returned invalid JSON for hash=%s: %s", hash_prefix, stdout)
         return
 
+    # UUID активных устройств по владельцу (пользователь trial) — для снятия с Entry-нод
+    active: dict[str, list[str]] = {}
+    uuids = []
     for dev in devices:
         uuid = dev.get("uuid")
         if not uuid:
             continue
-        rc, _, stderr = await run_script(
-            [f"{scripts_path}/devices/remove.sh", "--uuid", uuid],
-            send=send, verbose=verbose,
-        )
+        uuids.append(uuid)
+        if dev.get("status") == "active":
+            record = await get_device(uuid, store_path, scripts_path)
+            if record is not None and record.get("user_id") is not None:
+                active.setdefault(str(record["user_id"]), []).append(uuid)
+
+    if progress is not None:
+        progress.add(len(uuids))
+        progress.set_stage("снятие триал-устройств с Entry-нод")
+    failed: dict[str, str] = {}
+    for owner, owned in active.items():
+        failed.update(await detach_from_entries(owner, owned, scripts_path, progress=progress))
+
+    if progress is not None:
+        progress.set_stage("удаление триал-устройств")
+    for uuid in uuids:
+        if uuid in failed:
+            logger.warning("Trial device %s left in place: %s", uuid, failed[uuid])
+            if progress is not None:
+                progress.advance(ok=False)
+            continue
+        rc, _, stderr = await tx.run([f"{scripts_path}/devices/delete.sh", "--uuid", uuid])
         if rc != 0:
-            logger.warning("devices/remove.sh failed for trial uuid=%s: %s", uuid, stderr)
+            logger.warning("devices/delete.sh failed for trial uuid=%s: %s", uuid, stderr)
+        if progress is not None:
+            progress.advance(rc == 0)
 
 
 # ---------------------------------------------------------------------------
@@ -181,6 +203,7 @@ async def _cleanup_trial_devices(
 async def cmd_users(
     message: Message,
     role: Role,
+    store_path: str,
     scripts_path: str,
     verbose: bool,
 ) -> None:
@@ -188,7 +211,7 @@ async def cmd_users(
         await message.answer("Доступ ограничен.")
         return
 
-    users = await _fetch_users("all", scripts_path, verbose, message.answer)
+    users = await _fetch_users("all", store_path, scripts_path, verbose, message.answer)
     if users is None:
         await message.answer("Не удалось получить список пользователей.")
         return
@@ -207,6 +230,7 @@ async def cmd_users(
 async def cb_users_filter(
     callback: CallbackQuery,
     role: Role,
+    store_path: str,
     scripts_path: str,
     verbose: bool,
 ) -> None:
@@ -216,7 +240,7 @@ async def cb_users_filter(
 
     status_filter = callback.data.split(":")[2]
 
-    users = await _fetch_users(status_filter, scripts_path, verbose, callback.message.answer)
+    users = await _fetch_users(status_filter, store_path, scripts_path, verbose, callback.message.answer)
     if users is None:
         await callback.answer("Ошибка при получении списка.", show_alert=True)
         return
@@ -236,6 +260,7 @@ async def cb_users_filter(
 async def cb_user_card(
     callback: CallbackQuery,
     role: Role,
+    store_path: str,
     scripts_path: str,
     verbose: bool,
 ) -> None:
@@ -247,21 +272,11 @@ async def cb_user_card(
     user_id = parts[2]
     status_filter = parts[3] if len(parts) > 3 else "all"
 
-    cmd = [f"{scripts_path}/users/get.sh", "--id", user_id]
-    rc, stdout, stderr = await run_script(cmd, send=callback.message.answer, verbose=verbose)
-
-    if rc != 0:
-        logger.error("users/get.sh failed: %s", stderr)
+    user = await get_user(user_id, store_path, scripts_path, send=callback.message.answer, verbose=verbose)
+    if user is None:
         await callback.answer("Ошибка при получении данных.", show_alert=True)
         return
 
-    try:
-        user = json.loads(stdout)
-    except json.JSONDecodeError:
-        logger.error("users/get.sh returned invalid JSON: %s", stdout)
-        await callback.answer("Ошибка при разборе данных.", show_alert=True)
-        return
-
     await callback.message.edit_text(
         _format_user_card(user),
         reply_markup=_kb_user_card(user, status_filter),
@@ -278,6 +293,7 @@ async def cb_user_card(
 async def cb_users_back(
     callback: CallbackQuery,
     role: Role,
+    store_path: str,
     scripts_path: str,
     verbose: bool,
 ) -> None:
@@ -287,7 +303,7 @@ async def cb_users_back(
 
     status_filter = callback.data.split(":")[2]
 
-    users = await _fetch_users(status_filter, scripts_path, verbose, callback.message.answer)
+    users = await _fetch_users(status_filter, store_path, scripts_path, verbose, callback.message.answer)
     if users is None:
         await callback.answer("Ошибка при получении списка.", show_alert=True)
         return
@@ -299,87 +315,16 @@ async def cb_users_back(
     await callback.answer()
 
 
-# ---------------------------------------------------------------------------
-# Каскадные операции с устройствами
-# ---------------------------------------------------------------------------
-
-async def _cascade_deactivate_devices(
-    user_id: str, scripts_path: str, verbose: bool, send
-) -> bool:
-    """Деактивировать все активные устройства пользователя (снять с Entry-нод)."""
-    rc, stdout, _ = await run_script(
-        [f"{scripts_path}/devices/list.sh", "--user", user_id],
-        send=send, verbose=verbose,
-    )
-    if rc != 0:
-        return False
-    try:
-        devices = json.loads(stdout)
-    except json.JSONDecodeError:
-        return False
-
-    for device in devices:
-        if device.get("status") != "active":
-            continue
-        uuid = device["uuid"]
-        rc, _, stderr = await run_script(
-            [f"{scripts_path}/devices/deactivate.sh", "--uuid", uuid],
-            send=send, verbose=verbose,
-        )
-        if rc != 0:
-            logger.error("devices/deactivate.sh failed for %s: %s", uuid, stderr)
-            return False
-    return True
-
-
-async def _cascade_archive_devices(
-    user_id: str, scripts_path: str, verbose: bool, send
-) -> bool:
-    """Деактивировать и архивировать все устройства пользователя."""
-    rc, stdout, _ = await run_script(
-        [f"{scripts_path}/devices/list.sh", "--user", user_id],
-        send=send, verbose=verbose,
-    )
-    if rc != 0:
-        return False
-    try:
-        devices = json.loads(stdout)
-    except json.JSONDecodeError:
-        return False
-
-    for device in devices:
-        uuid = device["uuid"]
-        status = device.get("status", "")
-
-        if status == "active":
-            rc, _, stderr = await run_script(
-                [f"{scripts_path}/devices/deactivate.sh", "--uuid", uuid],
-                send=send, verbose=verbose,
-            )
-            if rc != 0:
-                logger.error("devices/deactivate.sh failed for %s: %s", uuid, stderr)
-                return False
-
-        if status != "archived":
-            rc, _, stderr = await run_script(
-                [f"{scripts_path}/devices/update.sh", "--uuid", uuid, "--status", "archived"],
-                send=send, verbose=verbose,
-            )
-            if rc != 0:
-                logger.error("devices/update.sh --status archived failed for %s: %s", uuid, stderr)
-                return False
-    return True
-
-
 async def _refresh_user_card(
     callback: CallbackQuery,
     user_id: str,
     status_filter: str,
+    store_path: str,
     scripts_path: str,
     verbose: bool,
 ) -> None:
     """Перезагрузить и отобразить карточку пользователя."""
-    user = await _fetch_user_by_id(user_id, scripts_path, verbose, callback.message.answer)
+    user = await _fetch_user_by_id(user_id, store_path, scripts_path, verbose, callback.message.answer)
     if not user:
         await callback.message.edit_text("Пользователь не найден.")
         return
@@ -420,6 +365,7 @@ def _kb_core_selection_card(user_id: str, status_filter: str, nodes: list[dict])
 async def cb_user_approve(
     callback: CallbackQuery,
     role: Role,
+    store_path: str,
     scripts_path: str,
     verbose: bool,
 ) -> None:
@@ -436,11 +382,11 @@ async def cb_user_approve(
     )
     if rc != 0:
         logger.error("nodes/list-core.sh failed: %s", stderr)
-        await callback.answer("Не удалось получить список Core-нод.", show_alert=True)
+        await callback.answer(failure_text(rc, "Не удалось получить список Core-нод."), show_alert=True)
         return
 
     try:
-        nodes = json.loads(stdout)
+        nodes = loads(stdout)
     except json.JSONDecodeError:
         logger.error("nodes/list-core.sh returned invalid JSON: %s", stdout)
         await callback.answer("Ошибка при получении списка нод.", show_alert=True)
@@ -450,7 +396,7 @@ async def cb_user_approve(
         await callback.answer("Нет доступных Core-нод.", show_alert=True)
         return
 
-    user = await _fetch_user_by_id(user_id, scripts_path, verbose, callback.message.answer)
+    user = await _fetch_user_by_id(user_id, store_path, scripts_path, verbose, callback.message.answer)
     username = user["username"] if user else f"ID={user_id}"
 
     await callback.message.edit_text(
@@ -466,6 +412,7 @@ async def cb_user_core(
     callback: CallbackQuery,
     role: Role,
     bot: Bot,
+    store_path: str,
     scripts_path: str,
     verbose: bool,
 ) -> None:
@@ -480,43 +427,49 @@ async def cb_user_core(
 
     user_id, status_filter, core_ip = parts[2], parts[3], parts[4]
 
-    user = await _fetch_user_by_id(user_id, scripts_path, verbose, callback.message.answer)
+    user = await _fetch_user_by_id(user_id, store_path, scripts_path, verbose, callback.message.answer)
     if not user:
         await callback.answer("Пользователь не найден или уже обработан.", show_alert=True)
         return
 
-    rc, _, stderr = await run_script(
-        [
-            f"{scripts_path}/users/update.sh",
-            "--id", user_id,
-            "--add-core-node", core_ip,
-            "--status", "active",
-        ],
-        send=callback.message.answer, verbose=verbose,
-    )
-    if rc != 0:
-        logger.error("users/update.sh failed: %s", stderr)
-        await callback.answer("Ошибка при одобрении заявки.", show_alert=True)
-        return
-
-    enc_tg_id = user.get("encrypted_telegram_id")
-    hash_tg_id = user.get("hash_telegram_id")
-    if enc_tg_id:
-        try:
-            real_tg_id = decrypt_telegram_id(enc_tg_id)
-            await bot.send_message(
-                real_tg_id,
-                "Ваша заявка одобрена. Добро пожаловать в Sigil Gate!\n"
-                "Введите /start для начала работы.",
-            )
-        except Exception as e:
-            logger.warning("Failed to notify approved user: %s", e)
-
-    # Удаляем триал-устройства одобренного пользователя
-    if hash_tg_id:
-        await _cleanup_trial_devices(hash_tg_id, scripts_path, verbose, callback.message.answer)
-
-    await _refresh_user_card(callback, user_id, status_filter, scripts_path, verbose)
+    # Коммит — при выходе из блока, в том числе если упадёт уведомление или очистка триала
+    async with transaction(
+        scripts_path, f"Approve user {user_id}", callback.message.answer, verbose
+    ) as tx:
+        rc, _, stderr = await tx.run(
+            [
+                f"{scripts_path}/users/modify.sh",
+                "--id", user_id,
+                "--add-core-node", core_ip,
+                "--status", "active",
+            ]
+        )
+        if rc != 0:
+            logger.error("users/modify.sh failed: %s", stderr)
+            await callback.answer(failure_text(rc, "Ошибка при одобрении заявки."), show_alert=True)
+            return
+
+        enc_tg_id = user.get("encrypted_telegram_id")
+        hash_tg_id = user.get("hash_telegram_id")
+        if enc_tg_id:
+            try:
+                real_tg_id = decrypt_telegram_id(enc_tg_id)
+                await bot.send_message(
+                    real_tg_id,
+                    "Ваша заявка одобрена. Добро пожаловать в Sigil Gate!\n"
+                    "Введите /start для начала работы.",
+                )
+            except Exception as e:
+                logger.warning("Failed to notify approved user: %s", e)
+
+        # Удаляем триал-устройства одобренного пользователя
+        if hash_tg_id:
+            async with Progress(callback.message.edit_text, f"Одобрение пользователя {user_id}") as progress:
+                await progress.start()
+                with background():
+                    await _cleanup_trial_devices(hash_tg_id, store_path, scripts_path, tx, progress)
+
+    await _refresh_user_card(callback, user_id, status_filter, store_path, scripts_path, verbose)
     await callback.answer()
 
 
@@ -524,6 +477,7 @@ async def cb_user_core(
 async def cb_user_back(
     callback: CallbackQuery,
     role: Role,
+    store_path: str,
     scripts_path: str,
     verbose: bool,
 ) -> None:
@@ -534,7 +488,7 @@ async def cb_user_back(
     parts = callback.data.split(":")  # user:back:<id>:<filter>
     user_id, status_filter = parts[2], parts[3]
 
-    await _refresh_user_card(callback, user_id, status_filter, scripts_path, verbose)
+    await _refresh_user_card(callback, user_id, status_filter, store_path, scripts_path, verbose)
     await callback.answer()
 
 
@@ -542,6 +496,7 @@ async def cb_user_back(
 async def cb_user_activate(
     callback: CallbackQuery,
     role: Role,
+    store_path: str,
     scripts_path: str,
     verbose: bool,
 ) -> None:
@@ -558,10 +513,10 @@ async def cb_user_activate(
     )
     if rc != 0:
         logger.error("users/update.sh failed: %s", stderr)
-        await callback.answer("Ошибка при восстановлении пользователя.", show_alert=True)
+        await callback.answer(failure_text(rc, "Ошибка при восстановлении пользователя."), show_alert=True)
         return
 
-    await _refresh_user_card(callback, user_id, status_filter, scripts_path, verbose)
+    await _refresh_user_card(callback, user_id, status_filter, store_path, scripts_path, verbose)
     await callback.answer()
 
 
@@ -569,6 +524,7 @@ async def cb_user_activate(
 async def cb_user_suspend(
     callback: CallbackQuery,
     role: Role,
+    store_path: str,
     scripts_path: str,
     verbose: bool,
 ) -> None:
@@ -579,23 +535,33 @@ async def cb_user_suspend(
     parts = callback.data.split(":")  # user:suspend:<id>:<filter>
     user_id, status_filter = parts[2], parts[3]
 
-    ok = await _cascade_deactivate_devices(
-        user_id, scripts_path, verbose, callback.message.answer
-    )
-    if not ok:
+    # Сообщение с карточкой показывает ход каскада (и теряет кнопки до конца)
+    async with Progress(callback.message.edit_text, f"Приостановка пользователя {user_id}") as progress:
+        await progress.start()
+        async with transaction(
+            scripts_path, f"Suspend user {user_id}", callback.message.answer, verbose
+        ) as tx:
+            with background():
+                cascade = await run_cascade(
+                    user_id, "inactive", store_path, scripts_path,
+                    send=callback.message.answer, verbose=verbose, tx=tx, progress=progress,
+                )
+            if cascade.ok:
+                rc, _, stderr = await tx.run(
+                    [f"{scripts_path}/users/modify.sh", "--id", user_id, "--status", "inactive"]
+                )
+    if not cascade.ok:
+        await callback.message.answer(cascade.summary(), parse_mode="HTML")
+        await _refresh_user_card(callback, user_id, status_filter, store_path, scripts_path, verbose)
         await callback.answer("Ошибка при деактивации устройств.", show_alert=True)
         return
-
-    rc, _, stderr = await run_script(
-        [f"{scripts_path}/users/update.sh", "--id", user_id, "--status", "inactive"],
-        send=callback.message.answer, verbose=verbose,
-    )
     if rc != 0:
-        logger.error("users/update.sh failed: %s", stderr)
-        await callback.answer("Ошибка при приостановке пользователя.", show_alert=True)
+        logger.error("users/modify.sh failed: %s", stderr)
+        await _refresh_user_card(callback, user_id, status_filter, store_path, scripts_path, verbose)
+        await callback.answer(failure_text(rc, "Ошибка при приостановке пользователя."), show_alert=True)
         return
 
-    await _refresh_user_card(callback, user_id, status_filter, scripts_path, verbose)
+    await _refresh_user_card(callback, user_id, status_filter, store_path, scripts_path, verbose)
     await callback.answer()
 
 
@@ -603,6 +569,7 @@ async def cb_user_suspend(
 async def cb_user_archive(
     callback: CallbackQuery,
     role: Role,
+    store_path: str,
     scripts_path: str,
     verbose: bool,
 ) -> None:
@@ -613,23 +580,33 @@ async def cb_user_archive(
     parts = callback.data.split(":")  # user:archive:<id>:<filter>
     user_id, status_filter = parts[2], parts[3]
 
-    ok = await _cascade_archive_devices(
-        user_id, scripts_path, verbose, callback.message.answer
-    )
-    if not ok:
+    # Сообщение с карточкой показывает ход каскада (и теряет кнопки до конца)
+    async with Progress(callback.message.edit_text, f"Архивация пользователя {user_id}") as progress:
+        await progress.start()
+        async with transaction(
+            scripts_path, f"Archive user {user_id}", callback.message.answer, verbose
+        ) as tx:
+            with background():
+                cascade = await run_cascade(
+                    user_id, "archived", store_path, scripts_path,
+                    send=callback.message.answer, verbose=verbose, tx=tx, progress=progress,
+                )
+            if cascade.ok:
+                rc, _, stderr = await tx.run(
+                    [f"{scripts_path}/users/modify.sh", "--id", user_id, "--status", "archived"]
+                )
+    if not cascade.ok:
+        await callback.message.answer(cascade.summary(), parse_mode="HTML")
+        await _refresh_user_card(callback, user_id, status_filter, store_path, scripts_path, verbose)
         await callback.answer("Ошибка при архивировании устройств.", show_alert=True)
         return
-
-    rc, _, stderr = await run_script(
-        [f"{scripts_path}/users/update.sh", "--id", user_id, "--status", "archived"],
-        send=callback.message.answer, verbose=verbose,
-    )
     if rc != 0:
-        logger.error("users/update.sh failed: %s", stderr)
-        await callback.answer("Ошибка при архивировании пользователя.", show_alert=True)
+        logger.error("users/modify.sh failed: %s", stderr)
+        await _refresh_user_card(callback, user_id, status_filter, store_path, scripts_path, verbose)
+        await callback.answer(failure_text(rc, "Ошибка при архивировании пользователя."), show_alert=True)
         return
 
-    await _refresh_user_card(callback, user_id, status_filter, scripts_path, verbose)
+    await _refresh_user_card(callback, user_id, status_filter, store_path, scripts_path, verbose)
     await callback.answer()
 
 
@@ -637,6 +614,7 @@ async def cb_user_archive(
 async def cb_user_remove(
     callback: CallbackQuery,
     role: Role,
+    store_path: str,
     scripts_path: str,
     verbose: bool,
 ) -> None:
@@ -653,10 +631,10 @@ async def cb_user_remove(
     )
     if rc != 0:
         logger.error("users/remove.sh failed: %s", stderr)
-        await callback.answer("Ошибка при удалении пользователя.", show_alert=True)
+        await callback.answer(failure_text(rc, "Ошибка при удалении пользователя."), show_alert=True)
         return
 
-    users = await _fetch_users(status_filter, scripts_path, verbose, callback.message.answer)
+    users = await _fetch_users(status_filter, store_path, scripts_path, verbose, callback.message.answer)
     if users is None:
         await callback.message.edit_text("Пользователь удалён.")
         await callback.answer()
@@ -704,20 +682,9 @@ def _fmt_reg_notify(user: dict) -> str:
 
 
 async def _fetch_user_by_id(
-    user_id: str, scripts_path: str, verbose: bool, send
+    user_id: str, store_path: str, scripts_path: str, verbose: bool, send
 ) -> dict | None:
-    rc, stdout, stderr = await run_script(
-        [f"{scripts_path}/users/get.sh", "--id", user_id],
-        send=send, verbose=verbose,
-    )
-    if rc != 0:
-        logger.error("users/get.sh failed: %s", stderr)
-        return None
-    try:
-        return json.loads(stdout)
-    except json.JSONDecodeError:
-        logger.error("users/get.sh returned invalid JSON: %s", stdout)
-        return None
+    return await get_user(user_id, store_path, scripts_path, send=send, verbose=verbose)
 
 
 # ---------------------------------------------------------------------------
@@ -728,6 +695,7 @@ async def _fetch_user_by_id(
 async def cb_reg_approve(
     callback: CallbackQuery,
     role: Role,
+    store_path: str,
     scripts_path: str,
     verbose: bool,
 ) -> None:
@@ -743,11 +711,11 @@ async def cb_reg_approve(
     )
     if rc != 0:
         logger.error("nodes/list-core.sh failed: %s", stderr)
-        await callback.answer("Не удалось получить список Core-нод.", show_alert=True)
+        await callback.answer(failure_text(rc, "Не удалось получить список Core-нод."), show_alert=True)
         return
 
     try:
-        nodes = json.loads(stdout)
+        nodes = loads(stdout)
     except json.JSONDecodeError:
         logger.error("nodes/list-core.sh returned invalid JSON: %s", stdout)
         await callback.answer("Ошибка при получении списка нод.", show_alert=True)
@@ -757,7 +725,7 @@ async def cb_reg_approve(
         await callback.answer("Нет доступных Core-нод.", show_alert=True)
         return
 
-    user = await _fetch_user_by_id(user_id, scripts_path, verbose, callback.message.answer)
+    user = await _fetch_user_by_id(user_id, store_path, scripts_path, verbose, callback.message.answer)
     username = user["username"] if user else f"ID={user_id}"
 
     await callback.message.edit_text(
@@ -777,6 +745,7 @@ async def cb_reg_core(
     callback: CallbackQuery,
     role: Role,
     bot: Bot,
+    store_path: str,
     scripts_path: str,
     verbose: bool,
 ) -> None:
@@ -792,47 +761,52 @@ async def cb_reg_core(
     user_id = parts[2]
     core_ip = parts[3]
 
-    user = await _fetch_user_by_id(user_id, scripts_path, verbose, callback.message.answer)
+    user = await _fetch_user_by_id(user_id, store_path, scripts_path, verbose, callback.message.answer)
     if not user:
         await callback.answer("Пользователь не найден или уже обработан.", show_alert=True)
         return
 
-    rc, stdout, stderr = await run_script(
-        [
-            f"{scripts_path}/users/update.sh",
-            "--id", user_id,
-            "--add-core-node", core_ip,
-            "--status", "active",
-        ],
-        send=callback.message.answer, verbose=verbose,
-    )
-    if rc != 0:
-        logger.error("users/update.sh failed: %s", stderr)
-        await callback.answer("Ошибка при одобрении заявки.", show_alert=True)
-        return
-
-    username = user["username"]
-    await callback.message.edit_text(
-        f"Пользователь <b>{username}</b> одобрен.\nCore-нода: {core_ip}",
-        parse_mode="HTML",
-    )
-
-    enc_tg_id = user.get("encrypted_telegram_id")
-    hash_tg_id = user.get("hash_telegram_id")
-    if enc_tg_id:
-        try:
-            real_tg_id = decrypt_telegram_id(enc_tg_id)
-            await bot.send_message(
-                real_tg_id,
-                "Ваша заявка одобрена. Добро пожаловать в Sigil Gate!\n"
-                "Введите /start для начала работы.",
-            )
-        except Exception as e:
-            logger.warning("Failed to notify approved user: %s", e)
-
-    # Удаляем триал-устройства одобренного пользователя
-    if hash_tg_id:
-        await _cleanup_trial_devices(hash_tg_id, scripts_path, verbose, callback.message.answer)
+    # Коммит — при выходе из блока, в том числе если упадёт уведомление или очистка триала
+    async with transaction(
+        scripts_path, f"Approve user {user_id}", callback.message.answer, verbose
+    ) as tx:
+        rc, stdout, stderr = await tx.run(
+            [
+                f"{scripts_path}/users/modify.sh",
+                "--id", user_id,
+                "--add-core-node", core_ip,
+                "--status", "active",
+            ]
+        )
+        if rc != 0:
+            logger.error("users/modify.sh failed: %s", stderr)
+            await callback.answer(failure_text(rc, "Ошибка при одобрении заявки."), show_alert=True)
+            return
+
+        username = user["username"]
+        approved = f"Пользователь <b>{username}</b> одобрен.\nCore-нода: {core_ip}"
+        await callback.message.edit_text(approved, parse_mode="HTML")
+
+        enc_tg_id = user.get("encrypted_telegram_id")
+        hash_tg_id = user.get("hash_telegram_id")
+        if enc_tg_id:
+            try:
+                real_tg_id = decrypt_telegram_id(enc_tg_id)
+                await bot.send_message(
+                    real_tg_id,
+                    "Ваша заявка одобрена. Добро пожаловать в Sigil Gate!\n"
+                    "Введите /start для начала работы.",
+                )
+            except Exception as e:
+                logger.warning("Failed to notify approved user: %s", e)
+
+        # Удаляем триал-устройства одобренного пользователя
+        if hash_tg_id:
+            async with Progress(callback.message.edit_text, f"Одобрение пользователя {user_id}") as progress:
+                await progress.start()
+                with background():
+                    await _cleanup_trial_devices(hash_tg_id, store_path, scripts_path, tx, progress)
+            await callback.message.edit_text(approved, parse_mode="HTML")
 
     await callback.answer()
 
@@ -845,6 +819,7 @@ async def cb_reg_core(
 async def cb_reg_decline(
     callback: CallbackQuery,
     role: Role,
+    store_path: str,
     scripts_path: str,
     verbose: bool,
 ) -> None:
@@ -854,7 +829,7 @@ async def cb_reg_decline(
 
     user_id = callback.data.split(":")[2]
 
-    user = await _fetch_user_by_id(user_id, scripts_path, verbose, callback.message.answer)
+    user = await _fetch_user_by_id(user_id, store_path, scripts_path, verbose, callback.message.answer)
     username = user["username"] if user else f"ID={user_id}"
 
     rc, stdout, stderr = await run_script(
@@ -863,7 +838,7 @@ async def cb_reg_decline(
     )
     if rc != 0:
         logger.error("users/remove.sh failed: %s", stderr)
-        await callback.answer("Ошибка при удалении заявки.", show_alert=True)
+        await callback.answer(failure_text(rc, "Ошибка при удалении заявки."), show_alert=True)
         return
 
     await callback.message.edit_text(
@@ -881,6 +856,7 @@ async def cb_reg_decline(
 async def cb_reg_ban(
     callback: CallbackQuery,
     role: Role,
+    store_path: str,
     scripts_path: str,
     verbose: bool,
 ) -> None:
@@ -890,7 +866,7 @@ async def cb_reg_ban(
 
     user_id = callback.data.split(":")[2]
 
-    user = await _fetch_user_by_id(user_id, scripts_path, verbose, callback.message.answer)
+    user = await _fetch_user_by_id(user_id, store_path, scripts_path, verbose, callback.message.answer)
     username = user["username"] if user else f"ID={user_id}"
 
     rc, stdout, stderr = await run_script(
@@ -899,7 +875,7 @@ async def cb_reg_ban(
     )
     if rc != 0:
         logger.error("users/update.sh failed: %s", stderr)
-        await callback.answer("Ошибка при блокировке пользователя.", show_alert=True)
+        await callback.answer(failure_text(rc, "Ошибка при блокировке пользователя."), show_alert=True)
         return
 
     await callback.message.edit_text(
@@ -917,6 +893,7 @@ async def cb_reg_ban(
 async def cb_reg_back(
     callback: CallbackQuery,
     role: Role,
+    store_path: str,
     scripts_path: str,
     verbose: bool,
 ) -> None:
@@ -926,7 +903,7 @@ async def cb_reg_back(
 
     user_id = callback.data.split(":")[2]
 
-    user = await _fetch_user_by_id(user_id, scripts_path, verbose, callback.message.answer)
+    user = await _fetch_user_by_id(user_id, store_path, scripts_path, verbose, callback.message.answer)
     if not user:
         await callback.answer("Пользователь не найден или уже обработан.", show_alert=True)
         return
@@ -9,13 +9,17 @@ bot/handlers/announce.py
   - all       — канал + все пользователи
 
 Администратор остается скрыт от получателей — все сообщения идут от бота.
+Отправка — задание bot/broadcast_jobs.py (журнал на диске, продолжение после
+перезапуска) поверх bot/broadcast.py (общий темп, параллельность, retry_after).
+/broadcasts — список заданий, пауза, продолжение и отмена.
 """
 
-import json
+import html
 import logging
 from pathlib import Path
 
 from aiogram import Bot, F, Router
+from aiogram.exceptions import TelegramBadRequest
 from aiogram.filters import Command, StateFilter, or_f
 from aiogram.fsm.context import FSMContext
 from aiogram.fsm.state import State, StatesGroup
@@ -27,7 +31,8 @@ from aiogram.types import (
 )
 
 from bot.appeals import list_users_for_broadcast
-from bot.crypto import decrypt_telegram_id
+from bot.broadcast_jobs import CANCELLED, DONE, PAUSED, RUNNING, BroadcastJob, broadcast_jobs, describe
+from bot.cache import load_json
 from bot.roles import Role
 
 logger = logging.getLogger(__name__)
@@ -101,61 +106,85 @@ def _target_label(target: str, user_count: int = 0) -> str:
     return target
 
 
-async def _do_send(
-    bot: Bot,
-    target: str,
-    text: str,
-    store_path: str,
-    channel_id: str,
-) -> tuple[int, int]:
-    """Выполнить рассылку. Возвращает (sent, failed)."""
-    sent = failed = 0
-
-    async def _send_to(chat_id: int | str) -> bool:
-        nonlocal sent, failed
-        try:
-            await bot.send_message(chat_id, text)
-            sent += 1
-            return True
-        except Exception as e:
-            logger.warning("Failed to send message to %s: %s", chat_id, e)
-            failed += 1
-            return False
+def _recipients(target: str, store_path: str, channel_id: str) -> tuple[list[dict], dict[str, str]]:
+    """
+    Получатели рассылки для задания (bot/broadcast_jobs.py): [{"key", "enc"}]
+    для пользователей, [{"key", "chat_id"}] для канала. Второй элемент —
+    получатели без Telegram ID: ключ → причина.
+    """
+    recipients: list[dict] = []
+    errors: dict[str, str] = {}
 
     if target in ("channel", "all"):
         if channel_id:
-            await _send_to(channel_id)
+            recipients.append({"key": "channel", "chat_id": channel_id})
         else:
             logger.warning("SIGILGATE_CHANNEL_ID not set, skipping channel")
 
     if target in ("broadcast", "all"):
-        users = list_users_for_broadcast(store_path)
-        for user in users:
+        for user in list_users_for_broadcast(store_path):
             enc = user.get("encrypted_telegram_id")
-            if not enc:
-                continue
-            try:
-                await _send_to(decrypt_telegram_id(enc))
-            except Exception as e:
-                logger.warning("Failed to decrypt telegram_id for user %s: %s", user.get("id"), e)
-                failed += 1
+            if enc:
+                recipients.append({"key": str(user.get("id")), "enc": enc})
 
     if target.startswith("user:"):
         _, user_reg_id, _ = target.split(":", 2)
         user_file = Path(store_path) / "users" / f"{user_reg_id}.json"
         try:
-            user_data = json.loads(user_file.read_text())
-            enc = user_data.get("encrypted_telegram_id")
+            enc = load_json(user_file).get("encrypted_telegram_id")
+        except Exception as e:
+            logger.warning("Failed to load user %s: %s", user_reg_id, e)
+            errors[user_reg_id] = "не удалось прочитать пользователя"
+        else:
             if enc:
-                await _send_to(decrypt_telegram_id(enc))
+                recipients.append({"key": user_reg_id, "enc": enc})
             else:
                 logger.warning("User %s has no encrypted_telegram_id", user_reg_id)
-                failed += 1
-        except Exception as e:
-            logger.warning("Failed to load/decrypt user %s: %s", user_reg_id, e)
-            failed += 1
+                errors[user_reg_id] = "нет telegram_id"
+
+    return recipients, errors
+
+
+_STATUS_LABELS = {
+    RUNNING:   "▶ идёт",
+    PAUSED:    "⏸ пауза",
+    CANCELLED: "✗ отменена",
+    DONE:      "✓ завершена",
+}
+
 
-    return sent, failed
+def _jobs_text(jobs: list[BroadcastJob]) -> str:
+    if not jobs:
+        return "Рассылок нет."
+    lines = ["<b>Рассылки</b>"]
+    for job in jobs:
+        subject = job.text[:_MAX_SUBJECT_LEN] + ("…" if len(job.text) > _MAX_SUBJECT_LEN else "")
+        done = len(job.recipients) - job.remaining
+        lines.append(
+            f"<code>{job.id}</code> {_STATUS_LABELS.get(job.status, job.status)} · "
+            f"{done}/{len(job.recipients)} · {job.created[:16].replace('T', ' ')}\n"
+            f"{html.escape(subject)}"
+        )
+    return "\n\n".join(lines)
+
+
+def _kb_jobs(jobs: list[BroadcastJob]) -> InlineKeyboardMarkup | None:
+    rows = []
+    for job in jobs:
+        if job.status == RUNNING:
+            rows.append([
+                InlineKeyboardButton(text=f"⏸ {job.id}", callback_data=f"bc:p:{job.id}"),
+                InlineKeyboardButton(text=f"✗ {job.id}", callback_data=f"bc:x:{job.id}"),
+            ])
+        elif job.status == PAUSED:
+            rows.append([
+                InlineKeyboardButton(text=f"▶ {job.id}", callback_data=f"bc:r:{job.id}"),
+                InlineKeyboardButton(text=f"✗ {job.id}", callback_data=f"bc:x:{job.id}"),
+            ])
+    if not rows:
+        return None
+    rows.append([InlineKeyboardButton(text="↻ Обновить", callback_data="bc:list")])
+    return InlineKeyboardMarkup(inline_keyboard=rows)
 
 
 # ---------------------------------------------------------------------------
@@ -321,14 +350,11 @@ async def cb_confirm(
     await state.clear()
     await callback.message.edit_text("Отправляю...")
 
-    sent, failed = await _do_send(bot, target, text, store_path, channel_id)
-
-    if failed == 0:
-        result = f"Отправлено: {sent}"
-    else:
-        result = f"Отправлено: {sent}, ошибок: {failed}"
-
-    await callback.message.edit_text(f"Готово. {result}")
+    recipients, errors = _recipients(target, store_path, channel_id)
+    broadcast_jobs.create(
+        bot, target, text, recipients, errors,
+        chat_id=callback.message.chat.id, message_id=callback.message.message_id,
+    )
     await callback.answer()
 
 
@@ -345,3 +371,42 @@ async def cb_cancel(callback: CallbackQuery, state: FSMContext) -> None:
     await state.clear()
     await callback.message.edit_text("Отменено.")
     await callback.answer()
+
+
+# ---------------------------------------------------------------------------
+# /broadcasts — задания рассылки
+# ---------------------------------------------------------------------------
+
+@router.message(Command("broadcasts"))
+async def cmd_broadcasts(message: Message, role: Role) -> None:
+    if role != Role.ADMIN:
+        await message.answer("Доступ ограничен.")
+        return
+
+    jobs = broadcast_jobs.list()
+    await message.answer(_jobs_text(jobs), parse_mode="HTML", reply_markup=_kb_jobs(jobs))
+
+
+@router.callback_query(F.data.startswith("bc:"))
+async def cb_broadcast_job(callback: CallbackQuery, role: Role) -> None:
+    if role != Role.ADMIN:
+        await callback.answer("Доступ ограничен.", show_alert=True)
+        return
+
+    parts = callback.data.split(":")  # bc:<p|r|x>:<id> | bc:list
+    if parts[1] != "list":
+        action = {"p": broadcast_jobs.pause, "r": broadcast_jobs.resume_job, "x": broadcast_jobs.cancel}
+        job = action[parts[1]](parts[2]) if parts[1] in action else None
+        if job is None:
+            await callback.answer("Действие недоступно для этой рассылки.", show_alert=True)
+            return
+        if job.task is None or job.task.done():
+            await broadcast_jobs.report(job, describe(job))  # задание не выполняется — обновить сразу
+        logger.info("Broadcast %s: %s by admin %s", job.id, job.status, callback.from_user.id)
+
+    jobs = broadcast_jobs.list()
+    try:
+        await callback.message.edit_text(_jobs_text(jobs), parse_mode="HTML", reply_markup=_kb_jobs(jobs))
+    except TelegramBadRequest:
+        pass  # список не изменился
+    await callback.answer()
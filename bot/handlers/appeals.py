@@ -35,7 +35,7 @@ from aiogram.types import (
 from bot.appeals import get_appeal, list_appeals
 from bot.crypto import decrypt_telegram_id
 from bot.roles import Role
-from bot.runner import run_script
+from bot.runner import failure_text, run_script
 
 logger = logging.getLogger(__name__)
 
@@ -315,7 +315,7 @@ async def on_appeal_text(
 
     if rc != 0:
         logger.error("appeals/add.sh failed: %s", stderr)
-        await message.answer("Не удалось создать обращение. Попробуйте позже.")
+        await message.answer(failure_text(rc, "Не удалось создать обращение. Попробуйте позже."))
         return
 
     appeal_id = stdout.strip().splitlines()[-1]
@@ -489,7 +489,7 @@ async def on_reply_text(
 
     if rc != 0:
         logger.error("appeals/reply.sh failed: %s", stderr)
-        await message.answer("Не удалось отправить сообщение. Попробуйте позже.")
+        await message.answer(failure_text(rc, "Не удалось отправить сообщение. Попробуйте позже."))
         return
 
     # Маршрутизация: user → admin, admin → user
@@ -690,7 +690,7 @@ async def cb_admin_accept(
 
     if rc != 0:
         logger.error("appeals/update.sh failed: %s", stderr)
-        await callback.answer("Ошибка при принятии обращения.", show_alert=True)
+        await callback.answer(failure_text(rc, "Ошибка при принятии обращения."), show_alert=True)
         return
 
     # Уведомить пользователя
@@ -775,7 +775,7 @@ async def cb_admin_transfer(
 
     if rc != 0:
         logger.error("appeals/update.sh (transfer) failed: %s", stderr)
-        await callback.answer("Ошибка при передаче обращения.", show_alert=True)
+        await callback.answer(failure_text(rc, "Ошибка при передаче обращения."), show_alert=True)
         return
 
     updated = get_appeal(store_path, appeal_id)
@@ -825,7 +825,7 @@ async def cb_admin_close(
 
     if rc != 0:
         logger.error("appeals/update.sh (close) failed: %s", stderr)
-        await callback.answer("Ошибка при закрытии обращения.", show_alert=True)
+        await callback.answer(failure_text(rc, "Ошибка при закрытии обращения."), show_alert=True)
         return
 
     # Уведомить пользователя
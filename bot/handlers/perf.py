@@ -0,0 +1,70 @@
+import logging
+
+from aiogram import Router
+from aiogram.filters import Command
+from aiogram.types import Message
+
+from bot.cache import parse_cache
+from bot.roles import Role
+from bot.runner import stats as runner_stats
+from bot.script_cache import script_cache
+from bot.telemetry import summary
+
+logger = logging.getLogger(__name__)
+
+router = Router()
+
+_TOP = 15
+
+
+def _ms(seconds: float) -> str:
+    return f"{seconds * 1000:.0f}" if seconds < 10 else f"{seconds:.0f}s"
+
+
+def _format_perf() -> str:
+    rows = summary(_TOP)
+    if not rows:
+        lines = ["Скрипты ещё не запускались."]
+    else:
+        width = max(len(r["script"]) for r in rows)
+        lines = [f"{'script':<{width}}  {'n':>5} {'p50':>5} {'p95':>5} {'max':>5} {'err':>4}"]
+        for r in rows:
+            lines.append(
+                f"{r['script']:<{width}}  {r['count']:>5} {_ms(r['p50']):>5} "
+                f"{_ms(r['p95']):>5} {_ms(r['max']):>5} {r['failures']:>4}"
+            )
+
+    cache = script_cache.stats()
+    parse = parse_cache.stats()
+    runner = runner_stats()
+    lanes = " ".join(
+        f"{name}={lane['running']}/{lane['limit']}+{lane['queued']} (p99 {_ms(lane['wait_p99'])})"
+        for name, lane in runner["lanes"].items()
+    )
+    lines += [
+        "",
+        f"script cache: {cache['hits']}/{cache['hits'] + cache['misses']} hit ({cache['hit_rate']:.0%})",
+        f"parse cache: {parse['hits']}/{parse['hits'] + parse['misses']} hit ({parse['hit_rate']:.0%})",
+        f"coalesced: {runner['coalesced_calls']}",
+        f"lanes: {lanes}",
+    ]
+    pool = runner["pool"]
+    if pool is not None:
+        lines.append(
+            f"pool: {pool['size']} workers, spawned {pool['spawned']}, recycled {pool['recycled']}, "
+            f"crashed {pool['crashed']}, timeouts {pool['timeouts']}"
+        )
+    return "\n".join(lines)
+
+
+@router.message(Command("perf"))
+async def cmd_perf(message: Message, role: Role) -> None:
+    if role != Role.ADMIN:
+        await message.answer("Доступ ограничен.")
+        return
+
+    await message.answer(
+        "<b>Скрипты</b> (время в мс, по суммарному времени)\n"
+        f"<pre>{_format_perf()}</pre>",
+        parse_mode="HTML",
+    )
@@ -1,7 +1,5 @@
 import asyncio
-import json
 import logging
-from pathlib import Path
 
 from aiogram import Bot, F, Router
 from aiogram.filters import Command, StateFilter, or_f
@@ -10,6 +8,7 @@ from aiogram.fsm.state import State, StatesGroup
 from aiogram.types import CallbackQuery, InlineKeyboardButton, InlineKeyboardMarkup, Message
 
 from bot.crypto import hash_telegram_id
+from bot.registry import get_user_index
 from bot.roles import Role
 from bot.runner import run_script
 
@@ -52,32 +51,12 @@ def _kb_confirm() -> InlineKeyboardMarkup:
 
 
 def _is_username_unique(username: str, store_path: str) -> bool:
-    users_dir = Path(store_path) / "users"
-    if not users_dir.is_dir():
-        return True
-    for file in users_dir.glob("*.json"):
-        try:
-            data = json.loads(file.read_text())
-            if data.get("username", "").lower() == username.lower():
-                return False
-        except (json.JSONDecodeError, OSError):
-            pass
-    return True
+    """Никнейм свободен: нет в реестре (без учёта регистра)."""
+    return not get_user_index(store_path).is_username_taken(username)
 
 
 def _is_telegram_id_unique(telegram_id: int, store_path: str) -> bool:
-    users_dir = Path(store_path) / "users"
-    if not users_dir.is_dir():
-        return True
-    tg_hash = hash_telegram_id(telegram_id)
-    for file in users_dir.glob("*.json"):
-        try:
-            data = json.loads(file.read_text())
-            if data.get("hash_telegram_id") == tg_hash:
-                return False
-        except (json.JSONDecodeError, OSError):
-            pass
-    return True
+    return get_user_index(store_path).find_by_hash(hash_telegram_id(telegram_id)) is None
 
 
 def _confirm_text(username: str, email: str | None) -> str:
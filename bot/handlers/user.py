@@ -1,5 +1,4 @@
 import io
-import json
 import logging
 
 from PIL import Image
@@ -18,8 +17,8 @@ from aiogram.types import (
 )
 
 from bot.qr import make_qr_photo
+from bot.query import get_device, get_device_config, list_devices
 from bot.roles import Role
-from bot.runner import run_script
 
 logger = logging.getLogger(__name__)
 
@@ -193,38 +192,23 @@ async def _edit_device_card(callback: CallbackQuery, device: dict, links: list[s
 
 async def _fetch_devices(
     user_id: int,
+    store_path: str,
     scripts_path: str,
     verbose: bool,
     send,
 ) -> list[dict] | None:
-    cmd = [f"{scripts_path}/devices/list.sh", "--user", str(user_id)]
-    rc, stdout, stderr = await run_script(cmd, send=send, verbose=verbose)
-    if rc != 0:
-        logger.error("devices/list.sh failed: %s", stderr)
-        return None
-    try:
-        return json.loads(stdout)
-    except json.JSONDecodeError:
-        logger.error("devices/list.sh returned invalid JSON: %s", stdout)
-        return None
+    return await list_devices(user_id, store_path, scripts_path, send=send, verbose=verbose)
 
 
 async def _fetch_config(
     uuid: str,
+    store_path: str,
     scripts_path: str,
     verbose: bool,
     send,
 ) -> list[str]:
-    cmd = [f"{scripts_path}/devices/config.sh", "--uuid", uuid]
-    rc, stdout, stderr = await run_script(cmd, send=send, verbose=verbose)
-    if rc != 0:
-        logger.error("devices/config.sh failed: %s", stderr)
-        return []
-    try:
-        return json.loads(stdout)
-    except json.JSONDecodeError:
-        logger.error("devices/config.sh returned invalid JSON: %s", stdout)
-        return []
+    links = await get_device_config(uuid, store_path, scripts_path, send=send, verbose=verbose)
+    return links or []
 
 
 # ---------------------------------------------------------------------------
@@ -236,6 +220,7 @@ async def cmd_devices(
     message: Message,
     role: Role,
     registry_user: dict | None,
+    store_path: str,
     scripts_path: str,
     verbose: bool,
 ) -> None:
@@ -247,7 +232,7 @@ async def cmd_devices(
         await message.answer("Ваш аккаунт не найден в реестре.")
         return
 
-    devices = await _fetch_devices(registry_user["id"], scripts_path, verbose, message.answer)
+    devices = await _fetch_devices(registry_user["id"], store_path, scripts_path, verbose, message.answer)
     if devices is None:
         await message.answer("Не удалось получить список устройств.")
         return
@@ -267,6 +252,7 @@ async def cb_device_card(
     callback: CallbackQuery,
     role: Role,
     registry_user: dict | None,
+    store_path: str,
     scripts_path: str,
     verbose: bool,
 ) -> None:
@@ -276,23 +262,16 @@ async def cb_device_card(
 
     uuid = callback.data.split(":", 2)[2]
 
-    cmd_get = [f"{scripts_path}/devices/get.sh", "--uuid", uuid]
-    rc, stdout, stderr = await run_script(cmd_get, send=callback.message.answer, verbose=verbose)
-    if rc != 0:
+    device = await get_device(uuid, store_path, scripts_path, send=callback.message.answer, verbose=verbose)
+    if device is None:
         await callback.answer("Устройство не найдено.", show_alert=True)
         return
 
-    try:
-        device = json.loads(stdout)
-    except json.JSONDecodeError:
-        await callback.answer("Ошибка при разборе данных.", show_alert=True)
-        return
-
     if device.get("user_id") != registry_user["id"]:
         await callback.answer("Доступ ограничен.", show_alert=True)
         return
 
-    links = await _fetch_config(uuid, scripts_path, verbose, callback.message.answer)
+    links = await _fetch_config(uuid, store_path, scripts_path, verbose, callback.message.answer)
 
     await callback.message.delete()
     await _send_device_card(callback.message, device, links)
@@ -308,6 +287,7 @@ async def cb_devices_back(
     callback: CallbackQuery,
     role: Role,
     registry_user: dict | None,
+    store_path: str,
     scripts_path: str,
     verbose: bool,
 ) -> None:
@@ -315,7 +295,7 @@ async def cb_devices_back(
         await callback.answer("Доступ ограничен.", show_alert=True)
         return
 
-    devices = await _fetch_devices(registry_user["id"], scripts_path, verbose, callback.message.answer)
+    devices = await _fetch_devices(registry_user["id"], store_path, scripts_path, verbose, callback.message.answer)
     if devices is None:
         await callback.answer("Ошибка при получении списка.", show_alert=True)
         return
@@ -357,6 +337,7 @@ async def cb_add_cancel(
     role: Role,
     registry_user: dict | None,
     state: FSMContext,
+    store_path: str,
     scripts_path: str,
     verbose: bool,
 ) -> None:
@@ -367,7 +348,7 @@ async def cb_add_cancel(
         await callback.answer()
         return
 
-    devices = await _fetch_devices(registry_user["id"], scripts_path, verbose, callback.message.answer)
+    devices = await _fetch_devices(registry_user["id"], store_path, scripts_path, verbose, callback.message.answer)
     if devices is None:
         await callback.message.edit_text("Отменено.")
         await callback.answer()
@@ -407,6 +388,7 @@ async def cb_device_delete_cancel(
     callback: CallbackQuery,
     role: Role,
     registry_user: dict | None,
+    store_path: str,
     scripts_path: str,
     verbose: bool,
 ) -> None:
@@ -416,19 +398,12 @@ async def cb_device_delete_cancel(
 
     uuid = callback.data.split(":", 2)[2]
 
-    cmd_get = [f"{scripts_path}/devices/get.sh", "--uuid", uuid]
-    rc, stdout, _ = await run_script(cmd_get, verbose=False)
-    if rc != 0:
+    device = await get_device(uuid, store_path, scripts_path)
+    if device is None:
         await callback.answer("Ошибка.", show_alert=True)
         return
 
-    try:
-        device = json.loads(stdout)
-    except json.JSONDecodeError:
-        await callback.answer("Ошибка при разборе данных.", show_alert=True)
-        return
-
-    links = await _fetch_config(uuid, scripts_path, verbose, callback.message.answer)
+    links = await _fetch_config(uuid, store_path, scripts_path, verbose, callback.message.answer)
 
     await _edit_device_card(callback, device, links)
     await callback.answer()
@@ -463,6 +438,7 @@ async def cb_rename_cancel(
     role: Role,
     registry_user: dict | None,
     state: FSMContext,
+    store_path: str,
     scripts_path: str,
     verbose: bool,
 ) -> None:
@@ -475,21 +451,13 @@ async def cb_rename_cancel(
         await callback.answer()
         return
 
-    cmd_get = [f"{scripts_path}/devices/get.sh", "--uuid", uuid]
-    rc, stdout, _ = await run_script(cmd_get, verbose=False)
-    if rc != 0:
-        await callback.message.edit_caption("Отменено.")
-        await callback.answer()
-        return
-
-    try:
-        device = json.loads(stdout)
-    except json.JSONDecodeError:
+    device = await get_device(uuid, store_path, scripts_path)
+    if device is None:
         await callback.message.edit_caption("Отменено.")
         await callback.answer()
         return
 
-    links = await _fetch_config(uuid, scripts_path, verbose, callback.message.answer)
+    links = await _fetch_config(uuid, store_path, scripts_path, verbose, callback.message.answer)
     await _edit_device_card(callback, device, links)
     await callback.answer()
 
@@ -523,6 +491,7 @@ async def cb_device_activate_cancel(
     role: Role,
     registry_user: dict | None,
     state: FSMContext,
+    store_path: str,
     scripts_path: str,
     verbose: bool,
 ) -> None:
@@ -535,21 +504,13 @@ async def cb_device_activate_cancel(
         await callback.answer()
         return
 
-    cmd_get = [f"{scripts_path}/devices/get.sh", "--uuid", uuid]
-    rc, stdout, _ = await run_script(cmd_get, verbose=False)
-    if rc != 0:
-        await callback.message.edit_caption("Отменено.")
-        await callback.answer()
-        return
-
-    try:
-        device = json.loads(stdout)
-    except json.JSONDecodeError:
+    device = await get_device(uuid, store_path, scripts_path)
+    if device is None:
         await callback.message.edit_caption("Отменено.")
         await callback.answer()
         return
 
-    links = await _fetch_config(uuid, scripts_path, verbose, callback.message.answer)
+    links = await _fetch_config(uuid, store_path, scripts_path, verbose, callback.message.answer)
     await _edit_device_card(callback, device, links)
     await callback.answer()
 
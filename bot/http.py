@@ -0,0 +1,63 @@
+"""
+bot/http.py
+HTTP-эндпоинты для мониторинга (aiohttp, рядом с polling).
+
+  GET /metrics  — метрики в текстовом формате Prometheus (bot/metrics.py)
+  GET /healthz  — 200, если Bot API отвечал недавно; иначе 503
+
+Во время polling бот запрашивает getUpdates не реже раза в
+polling_timeout секунд, поэтому долгое отсутствие успешных запросов
+означает, что процесс завис или потерял связь с Telegram.
+"""
+
+import logging
+import time
+
+from aiohttp import web
+
+from bot import metrics
+
+logger = logging.getLogger(__name__)
+
+HEALTH_STALE_AFTER = 120.0  # секунд без успешного запроса к Bot API
+STARTUP_GRACE = 60.0
+
+
+async def handle_metrics(request: web.Request) -> web.Response:
+    return web.Response(
+        body=metrics.render_all().encode(),
+        headers={"Content-Type": "text/plain; version=0.0.4; charset=utf-8"},
+    )
+
+
+async def handle_healthz(request: web.Request) -> web.Response:
+    uptime = metrics.uptime()
+    last_ok = metrics.last_telegram_ok
+    since_ok = None if last_ok is None else time.monotonic() - last_ok
+
+    if since_ok is None:
+        healthy = uptime < STARTUP_GRACE
+    else:
+        healthy = since_ok < HEALTH_STALE_AFTER
+
+    body = {
+        "status": "ok" if healthy else "stale",
+        "uptime": round(uptime, 1),
+        "telegram_last_ok_ago": None if since_ok is None else round(since_ok, 1),
+    }
+    return web.json_response(body, status=200 if healthy else 503)
+
+
+def create_app() -> web.Application:
+    app = web.Application()
+    app.router.add_get("/metrics", handle_metrics)
+    app.router.add_get("/healthz", handle_healthz)
+    return app
+
+
+async def start_http_server(host: str, port: int) -> web.AppRunner:
+    runner = web.AppRunner(create_app(), access_log=None)
+    await runner.setup()
+    await web.TCPSite(runner, host, port).start()
+    logger.info("Metrics endpoint listening on %s:%d", host, port)
+    return runner
@@ -0,0 +1,119 @@
+"""
+bot/jsonstream.py
+Инкрементальный разбор JSON из потока байтов.
+
+Поддерживаются два формата вывода скриптов:
+  JSON-массив  — "[{...}, {...}]": элементы отдаются по мере получения
+  NDJSON       — по одному JSON-значению на строку (или подряд)
+
+Формат определяется по первому непробельному символу ('[' — массив).
+В буфере держится только неразобранный хвост — память не растёт
+с размером вывода. Незаконченное значение повторно разбирается только
+после того, как хвост вырос вдвое: большой элемент, пришедший многими
+кусками, стоит линейного, а не квадратичного времени.
+"""
+
+import codecs
+import json
+from typing import Any
+
+_WS = " \t\r\n"
+
+
+class JSONStreamParser:
+    def __init__(self) -> None:
+        self._decoder = json.JSONDecoder()
+        self._utf8 = codecs.getincrementaldecoder("utf-8")()
+        self._parts: list[str] = []  # неразобранный хвост кусками (без копий при feed)
+        self._size = 0
+        self._retry_at = 0  # размер хвоста, с которого стоит снова пробовать raw_decode
+        self._mode: str | None = None  # "array" | "values"
+        self._expect_value = True
+        self._comma = False  # последним в массиве была ','
+        self._closed = False  # массив закрыт ']'
+
+    @property
+    def pending(self) -> int:
+        """Размер неразобранного хвоста (символов)."""
+        return self._size
+
+    def feed(self, data: bytes) -> list[Any]:
+        """Добавить данные; вернуть разобранные целиком значения."""
+        self._append(self._utf8.decode(data))
+        if self._size < self._retry_at:
+            return []
+        return self._drain(final=False)
+
+    def close(self) -> list[Any]:
+        """Конец потока: вернуть остаток или бросить json.JSONDecodeError."""
+        self._append(self._utf8.decode(b"", final=True))
+        items = self._drain(final=True)
+        if self._mode == "array" and not self._closed:
+            buf = "".join(self._parts)
+            raise json.JSONDecodeError("Unterminated array", buf, len(buf))
+        return items
+
+    def _append(self, text: str) -> None:
+        if text:
+            self._parts.append(text)
+            self._size += len(text)
+
+    def _drain(self, final: bool) -> list[Any]:
+        items = []
+        buf = "".join(self._parts)
+        pos = 0
+        retry_at = 0
+        end_of_buf = len(buf)
+        while True:
+            while pos < end_of_buf and buf[pos] in _WS:
+                pos += 1
+            if pos >= end_of_buf:
+                break
+
+            if self._mode is None:
+                if buf[pos] == "[":
+                    self._mode = "array"
+                    pos += 1
+                    continue
+                self._mode = "values"
+
+            if self._mode == "array":
+                if self._closed:
+                    raise json.JSONDecodeError("Extra data after array", buf, pos)
+                char = buf[pos]
+                if char == "]":
+                    if self._comma:
+                        raise json.JSONDecodeError("Expecting value", buf, pos)
+                    self._closed = True
+                    pos += 1
+                    continue
+                if char == ",":
+                    if self._expect_value:
+                        raise json.JSONDecodeError("Expecting value", buf, pos)
+                    self._expect_value = True
+                    self._comma = True
+                    pos += 1
+                    continue
+                if not self._expect_value:
+                    raise json.JSONDecodeError("Expecting ',' delimiter", buf, pos)
+
+            try:
+                value, end = self._decoder.raw_decode(buf, pos)
+            except json.JSONDecodeError:
+                if final:
+                    raise
+                retry_at = 2 * (end_of_buf - pos)  # значение ещё не пришло целиком
+                break
+            if end == end_of_buf and not final:
+                retry_at = end_of_buf - pos + 1  # число на границе буфера может продолжиться
+                break
+            items.append(value)
+            pos = end
+            self._expect_value = False
+            self._comma = False
+
+        tail = buf[pos:]
+        self._parts = [tail] if tail else []
+        self._size = len(tail)
+        self._retry_at = retry_at
+        return items
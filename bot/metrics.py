@@ -0,0 +1,242 @@
+"""
+bot/metrics.py
+Метрики процесса бота в формате Prometheus.
+
+  sigilgate_updates_total{type}                 — апдейты по типу
+  sigilgate_update_duration_seconds{type}       — обработка апдейта целиком
+  sigilgate_handler_duration_seconds{router,handler}
+  sigilgate_telegram_request_duration_seconds{method}
+  sigilgate_telegram_request_errors_total{method,error}
+  sigilgate_event_loop_lag_seconds              — задержка event loop
+  sigilgate_broadcast_messages_total{outcome}   — исходы рассылки (bot/broadcast.py)
+  sigilgate_broadcast_retries_total{reason}     — повторы: retry_after / error
+  sigilgate_fsm_storage_keys                    — записей в FSM-хранилище
+  sigilgate_cache_*                             — размеры и попадания кэшей
+  sigilgate_script_pool_*                       — пул воркеров скриптов
+  sigilgate_script_*                            — скрипты (bot/telemetry.py)
+
+Счётчики и гистограммы заполняют middleware (bot/middlewares/metrics.py),
+значения кэшей и полос снимаются в момент запроса /metrics: текущие —
+как gauge, накопленные с запуска (попадания, запуски воркеров) — как
+counter с суффиксом _total.
+"""
+
+import asyncio
+import logging
+import time
+from collections import defaultdict
+from typing import Callable
+
+from bot import telemetry
+from bot.telemetry import SECONDS_BUCKETS, Histogram, escape_label, fmt_value, render_histogram
+
+logger = logging.getLogger(__name__)
+
+LOOP_LAG_INTERVAL = 0.5
+
+
+def _labels(names: tuple[str, ...], values: tuple[str, ...]) -> str:
+    return ",".join(f'{n}="{escape_label(str(v))}"' for n, v in zip(names, values))
+
+
+class CounterVec:
+    def __init__(self, name: str, help_text: str, labelnames: tuple[str, ...]) -> None:
+        self.name = name
+        self.help = help_text
+        self.labelnames = labelnames
+        self.values: dict[tuple[str, ...], float] = defaultdict(float)
+
+    def inc(self, *labels: str, amount: float = 1) -> None:
+        self.values[labels] += amount
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        for labels, value in sorted(self.values.items()):
+            lines.append(f"{self.name}{{{_labels(self.labelnames, labels)}}} {fmt_value(value)}")
+        return lines
+
+
+class HistogramVec:
+    def __init__(
+        self,
+        name: str,
+        help_text: str,
+        labelnames: tuple[str, ...],
+        buckets: tuple[float, ...] = SECONDS_BUCKETS,
+    ) -> None:
+        self.name = name
+        self.help = help_text
+        self.labelnames = labelnames
+        self.buckets = buckets
+        self.series: dict[tuple[str, ...], Histogram] = {}
+
+    def observe(self, value: float, *labels: str) -> None:
+        hist = self.series.get(labels)
+        if hist is None:
+            hist = self.series[labels] = Histogram(self.buckets)
+        hist.observe(value)
+
+    def render(self) -> list[str]:
+        return render_histogram(self.name, self.help, [
+            (_labels(self.labelnames, labels), hist) for labels, hist in sorted(self.series.items())
+        ])
+
+
+updates_total = CounterVec("sigilgate_updates_total", "Telegram updates received", ("type",))
+update_duration = HistogramVec(
+    "sigilgate_update_duration_seconds", "Full update processing time", ("type",)
+)
+handler_duration = HistogramVec(
+    "sigilgate_handler_duration_seconds", "Handler execution time", ("router", "handler")
+)
+handler_errors = CounterVec(
+    "sigilgate_handler_errors_total", "Handler exceptions", ("router", "handler", "error")
+)
+telegram_duration = HistogramVec(
+    "sigilgate_telegram_request_duration_seconds", "Bot API request latency", ("method",)
+)
+telegram_errors = CounterVec(
+    "sigilgate_telegram_request_errors_total", "Bot API request errors", ("method", "error")
+)
+broadcast_messages = CounterVec(
+    "sigilgate_broadcast_messages_total", "Broadcast deliveries by outcome", ("outcome",)
+)
+broadcast_retries = CounterVec(
+    "sigilgate_broadcast_retries_total", "Broadcast deliveries re-queued", ("reason",)
+)
+loop_lag = Histogram((0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0))
+
+_families = [
+    updates_total, update_duration, handler_duration, handler_errors,
+    telegram_duration, telegram_errors, broadcast_messages, broadcast_retries,
+]
+
+# Значения, снимаемые при запросе: name → (тип, help, функция → [(метки, значение)])
+_gauges: dict[str, tuple[str, str, Callable[[], list[tuple[str, float]]]]] = {}
+
+_started = time.monotonic()
+_last_loop_lag = 0.0
+last_telegram_ok: float | None = None  # monotonic время последнего успешного запроса к Bot API
+
+
+def register_gauge(name: str, help_text: str, collect: Callable[[], list[tuple[str, float]]]) -> None:
+    """collect() возвращает [(строка меток без скобок, значение)]."""
+    _gauges[name] = ("gauge", help_text, collect)
+
+
+def register_counter(name: str, help_text: str, collect: Callable[[], list[tuple[str, float]]]) -> None:
+    """Как register_gauge, но значение только растёт с запуска (rate() в Prometheus)."""
+    _gauges[name] = ("counter", help_text, collect)
+
+
+def mark_telegram_ok() -> None:
+    global last_telegram_ok
+    last_telegram_ok = time.monotonic()
+
+
+def uptime() -> float:
+    return time.monotonic() - _started
+
+
+async def monitor_loop_lag(interval: float = LOOP_LAG_INTERVAL) -> None:
+    """Фоновая задача: насколько позже запланированного просыпается sleep()."""
+    global _last_loop_lag
+    loop = asyncio.get_running_loop()
+    while True:
+        expected = loop.time() + interval
+        await asyncio.sleep(interval)
+        lag = max(0.0, loop.time() - expected)
+        _last_loop_lag = lag
+        loop_lag.observe(lag)
+
+
+def render_all() -> str:
+    lines: list[str] = []
+    for family in _families:
+        lines += family.render()
+
+    lines += render_histogram(
+        "sigilgate_event_loop_lag_seconds", "Event loop wake-up delay", [("", loop_lag)]
+    )
+    lines += [
+        "# HELP sigilgate_event_loop_lag_last_seconds Most recent event loop lag sample",
+        "# TYPE sigilgate_event_loop_lag_last_seconds gauge",
+        f"sigilgate_event_loop_lag_last_seconds {fmt_value(_last_loop_lag)}",
+        "# HELP sigilgate_uptime_seconds Process uptime",
+        "# TYPE sigilgate_uptime_seconds gauge",
+        f"sigilgate_uptime_seconds {fmt_value(uptime())}",
+    ]
+
+    for name, (kind, help_text, collect) in sorted(_gauges.items()):
+        try:
+            samples = collect()
+        except Exception:
+            logger.exception("Metrics collector %s failed", name)
+            continue
+        lines += [f"# HELP {name} {help_text}", f"# TYPE {name} {kind}"]
+        for labels, value in samples:
+            suffix = f"{{{labels}}}" if labels else ""
+            lines.append(f"{name}{suffix} {fmt_value(value)}")
+
+    return "\n".join(lines) + "\n" + telemetry.render()
+
+
+# ---------------------------------------------------------------------------
+# Значения кэшей, полос и FSM
+# ---------------------------------------------------------------------------
+
+def register_bot_gauges(storage: object, indexes: dict[str, object]) -> None:
+    """Снимаемые при запросе значения: FSM, кэши, индексы реестра, полосы, пул."""
+    from bot.cache import parse_cache
+    from bot.runner import stats as runner_stats
+    from bot.script_cache import script_cache
+
+    def fsm() -> list[tuple[str, float]]:
+        # MemoryStorage держит состояния в dict; у Redis-хранилища размера нет
+        data = getattr(storage, "storage", None)
+        return [("", len(data))] if data is not None else []
+
+    def caches(key: str) -> Callable[[], list[tuple[str, float]]]:
+        def collect() -> list[tuple[str, float]]:
+            return [
+                ('cache="script"', script_cache.stats()[key]),
+                ('cache="parse"', parse_cache.stats()[key]),
+            ]
+        return collect
+
+    def index_sizes() -> list[tuple[str, float]]:
+        return [(f'index="{escape_label(name)}"', len(index)) for name, index in indexes.items()]
+
+    def lanes(key: str) -> Callable[[], list[tuple[str, float]]]:
+        def collect() -> list[tuple[str, float]]:
+            return [
+                (f'lane="{name}"', lane[key]) for name, lane in runner_stats()["lanes"].items()
+            ]
+        return collect
+
+    def pool_size() -> list[tuple[str, float]]:
+        stats = runner_stats()["pool"]
+        return [] if stats is None else [("", stats["size"])]
+
+    def pool_events() -> list[tuple[str, float]]:
+        stats = runner_stats()["pool"]
+        if stats is None:
+            return []
+        return [(f'event="{key}"', value) for key, value in stats.items() if key != "size"]
+
+    register_gauge("sigilgate_fsm_storage_keys", "FSM storage records", fsm)
+    register_gauge("sigilgate_cache_entries", "Cache entries", caches("entries"))
+    register_counter("sigilgate_cache_hits_total", "Cache hits since start", caches("hits"))
+    register_counter("sigilgate_cache_misses_total", "Cache misses since start", caches("misses"))
+    register_gauge("sigilgate_cache_hit_ratio", "Cache hit ratio since start", caches("hit_rate"))
+    register_gauge("sigilgate_registry_index_entries", "Registry index entries", index_sizes)
+    register_gauge("sigilgate_lane_running", "Scripts running per scheduler lane", lanes("running"))
+    register_gauge("sigilgate_lane_queued", "Scripts waiting per scheduler lane", lanes("queued"))
+    register_gauge("sigilgate_script_pool_size", "Worker pool slots", pool_size)
+    register_counter(
+        "sigilgate_script_pool_events_total", "Worker pool events: spawned / recycled / crashed / timeouts", pool_events
+    )
+    register_counter(
+        "sigilgate_coalesced_calls_total", "Read-only calls served by a shared run",
+        lambda: [("", runner_stats()["coalesced_calls"])],
+    )
@@ -6,6 +6,7 @@ from aiogram import BaseMiddleware
 from aiogram.types import TelegramObject, Update
 
 from bot.roles import Role, find_user_by_telegram_id
+from bot.tracing import span, start_trace
 
 logger = logging.getLogger(__name__)
 
@@ -22,25 +23,31 @@ class AuthMiddleware(BaseMiddleware):
         data: dict[str, Any],
     ) -> Any:
         user = None
+        attributes = {}
         if isinstance(event, Update):
+            attributes = {"update_type": event.event_type, "update_id": event.update_id}
             if event.message and event.message.from_user:
                 user = event.message.from_user
             elif event.callback_query and event.callback_query.from_user:
                 user = event.callback_query.from_user
 
-        if user:
-            registry_user = await asyncio.to_thread(find_user_by_telegram_id, user.id, self.store_path)
-            if user.id in self.admin_ids:
-                role = Role.ADMIN
-            elif registry_user is not None and registry_user.get("status") == "active":
-                role = Role.USER
+        # Корневой спан трейса апдейта (bot/tracing.py)
+        with start_trace("update", **attributes) as root:
+            if user:
+                with span("auth.lookup"):
+                    registry_user = await asyncio.to_thread(find_user_by_telegram_id, user.id, self.store_path)
+                if user.id in self.admin_ids:
+                    role = Role.ADMIN
+                elif registry_user is not None and registry_user.get("status") == "active":
+                    role = Role.USER
+                else:
+                    role = Role.GUEST
+                data["role"] = role
+                data["registry_user"] = registry_user
+                logger.debug("User %s (id=%d) -> role=%s", user.full_name, user.id, role.value)
             else:
-                role = Role.GUEST
-            data["role"] = role
-            data["registry_user"] = registry_user
-            logger.debug("User %s (id=%d) -> role=%s", user.full_name, user.id, role.value)
-        else:
-            data["role"] = Role.GUEST
-            data["registry_user"] = None
-
-        return await handler(event, data)
+                data["role"] = Role.GUEST
+                data["registry_user"] = None
+
+            root.set(role=data["role"].value)
+            return await handler(event, data)
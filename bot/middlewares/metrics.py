@@ -0,0 +1,80 @@
+import logging
+import time
+from typing import Any, Awaitable, Callable
+
+from aiogram import BaseMiddleware, Bot
+from aiogram.client.session.middlewares.base import BaseRequestMiddleware, NextRequestMiddlewareType
+from aiogram.methods import Response, TelegramMethod
+from aiogram.methods.base import TelegramType
+from aiogram.types import TelegramObject, Update
+
+from bot import metrics
+from bot.tracing import span
+
+logger = logging.getLogger(__name__)
+
+
+class UpdateMetricsMiddleware(BaseMiddleware):
+    """Outer middleware на dp.update: число апдейтов и время обработки по типу."""
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: dict[str, Any],
+    ) -> Any:
+        update_type = event.event_type if isinstance(event, Update) else type(event).__name__
+        metrics.updates_total.inc(update_type)
+        started = time.perf_counter()
+        try:
+            return await handler(event, data)
+        finally:
+            metrics.update_duration.observe(time.perf_counter() - started, update_type)
+
+
+class HandlerMetricsMiddleware(BaseMiddleware):
+    """Inner middleware: время и исключения хендлера (router — модуль, handler — функция), спан handler."""
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: dict[str, Any],
+    ) -> Any:
+        handler_object = data.get("handler")
+        callback = getattr(handler_object, "callback", None)
+        router = getattr(callback, "__module__", "unknown").rsplit(".", 1)[-1]
+        name = getattr(callback, "__qualname__", "unknown")
+
+        started = time.perf_counter()
+        try:
+            with span("handler", router=router, handler=name):
+                return await handler(event, data)
+        except Exception as e:
+            metrics.handler_errors.inc(router, name, type(e).__name__)
+            raise
+        finally:
+            metrics.handler_duration.observe(time.perf_counter() - started, router, name)
+
+
+class TelegramMetricsMiddleware(BaseRequestMiddleware):
+    """Middleware сессии бота: задержка и ошибки запросов к Bot API по методу, спан telegram.<method>."""
+
+    async def __call__(
+        self,
+        make_request: NextRequestMiddlewareType[TelegramType],
+        bot: Bot,
+        method: TelegramMethod[TelegramType],
+    ) -> Response[TelegramType]:
+        name = type(method).__name__
+        started = time.perf_counter()
+        try:
+            with span(f"telegram.{name}"):
+                response = await make_request(bot, method)
+        except Exception as e:
+            metrics.telegram_errors.inc(name, type(e).__name__)
+            raise
+        finally:
+            metrics.telegram_duration.observe(time.perf_counter() - started, name)
+        metrics.mark_telegram_ok()
+        return response
@@ -0,0 +1,162 @@
+"""
+bot/models.py
+Компактные записи реестра (User / Device / Appeal) и подключаемый JSON-декодер.
+
+Записи хранят известные поля в __slots__ (без per-instance __dict__),
+строки статусов интернируются, прочие поля уходят в _extra. Для совместимости
+с хендлерами, которые работают со словарями, записи реализуют Mapping:
+record["id"], record.get("status"), dict(record) и сравнение с dict работают
+как раньше.
+
+Декодер выбирается через SIGILGATE_JSON_DECODER: auto (по умолчанию —
+orjson, затем msgspec, если установлены), orjson, msgspec или json.
+Ошибки разбора всегда приводятся к json.JSONDecodeError.
+"""
+
+import json
+import logging
+import sys
+from collections.abc import Iterator, Mapping
+from typing import Any, Callable
+
+logger = logging.getLogger(__name__)
+
+
+# ---------------------------------------------------------------------------
+# JSON-декодер
+# ---------------------------------------------------------------------------
+
+def _orjson_loads() -> Callable[[str | bytes], Any]:
+    import orjson  # orjson.JSONDecodeError — подкласс json.JSONDecodeError
+
+    return orjson.loads
+
+
+def _msgspec_loads() -> Callable[[str | bytes], Any]:
+    import msgspec
+
+    decoder = msgspec.json.Decoder()
+
+    def _loads(data: str | bytes) -> Any:
+        try:
+            return decoder.decode(data)
+        except msgspec.DecodeError as e:
+            text = data.decode(errors="replace") if isinstance(data, bytes) else data
+            raise json.JSONDecodeError(str(e), text, 0) from e
+
+    return _loads
+
+
+_DECODERS: dict[str, Callable[[], Callable[[str | bytes], Any]]] = {
+    "orjson": _orjson_loads,
+    "msgspec": _msgspec_loads,
+    "json": lambda: json.loads,
+}
+
+_decoder: Callable[[str | bytes], Any] = json.loads
+decoder_name = "json"
+
+
+def set_decoder(name: str = "auto") -> str:
+    """Выбрать JSON-декодер. Возвращает имя фактически выбранного."""
+    global _decoder, decoder_name
+
+    candidates = ["orjson", "msgspec", "json"] if name == "auto" else [name, "json"]
+    for candidate in candidates:
+        factory = _DECODERS.get(candidate)
+        if factory is None:
+            logger.warning("Unknown JSON decoder %r, ignoring", candidate)
+            continue
+        try:
+            _decoder = factory()
+        except ImportError:
+            if name != "auto":
+                logger.warning("JSON decoder %r is not installed, falling back", candidate)
+            continue
+        decoder_name = candidate
+        break
+    return decoder_name
+
+
+def loads(data: str | bytes) -> Any:
+    """json.loads через выбранный декодер."""
+    return _decoder(data)
+
+
+# ---------------------------------------------------------------------------
+# Записи
+# ---------------------------------------------------------------------------
+
+class Record(Mapping):
+    """Базовая запись: поля из _fields в слотах, остальное — в _extra."""
+
+    __slots__ = ("_extra",)
+
+    _fields: tuple[str, ...] = ()
+    _field_set: frozenset[str] = frozenset()
+    _interned: frozenset[str] = frozenset({"status"})
+
+    def __init__(self, data: Mapping[str, Any]) -> None:
+        extra = None
+        for key, value in data.items():
+            if key in self._field_set:
+                if key in self._interned and isinstance(value, str):
+                    value = sys.intern(value)
+                object.__setattr__(self, key, value)
+            else:
+                if extra is None:
+                    extra = {}
+                extra[key] = value
+        self._extra = extra
+
+    def __init_subclass__(cls, **kwargs: Any) -> None:
+        super().__init_subclass__(**kwargs)
+        cls._field_set = frozenset(cls._fields)
+
+    def __getitem__(self, key: str) -> Any:
+        if key in self._field_set:
+            try:
+                return object.__getattribute__(self, key)
+            except AttributeError:
+                raise KeyError(key) from None
+        if self._extra is not None and key in self._extra:
+            return self._extra[key]
+        raise KeyError(key)
+
+    def __iter__(self) -> Iterator[str]:
+        for key in self._fields:
+            if hasattr(self, key):
+                yield key
+        if self._extra is not None:
+            yield from self._extra
+
+    def __len__(self) -> int:
+        count = sum(1 for key in self._fields if hasattr(self, key))
+        return count + (len(self._extra) if self._extra is not None else 0)
+
+    def __repr__(self) -> str:
+        return f"{type(self).__name__}({dict(self)!r})"
+
+    def to_dict(self) -> dict[str, Any]:
+        return dict(self)
+
+
+class User(Record):
+    __slots__ = (
+        "id", "username", "status", "email", "telegram", "hash",
+        "hash_telegram_id", "encrypted_telegram_id", "core_nodes", "created",
+    )
+    _fields = __slots__
+
+
+class Device(Record):
+    __slots__ = ("uuid", "user_id", "device", "status", "created")
+    _fields = __slots__
+
+
+class Appeal(Record):
+    __slots__ = (
+        "id", "user_id", "username", "status", "subject", "created",
+        "device_uuid", "admin_encrypted_telegram_id", "messages",
+    )
+    _fields = __slots__
@@ -0,0 +1,182 @@
+"""
+bot/progress.py
+Ход долгой операции в одном сообщении администратора.
+
+Progress считает шаги (всего / выполнено / с ошибкой) и редактирует одно
+сообщение строкой вида
+
+  Приостановка пользователя 42
+  снятие с Entry-нод: 12 из 40, ошибок: 1 · осталось ≈ 35 с
+
+Правки объединяются: не чаще одной за SIGILGATE_PROGRESS_INTERVAL секунд
+(по умолчанию 3) — изменения счётчиков между правками попадают в следующую.
+Ответ 429 на правку откладывает следующую на retry_after, «message is not
+modified» и прочие ошибки правки только пишутся в лог: ход операции не
+должен её прерывать.
+
+    async with Progress(callback.message.edit_text, "Архивация") as progress:
+        await progress.start()             # сразу: убрать кнопки, «подготовка»
+        progress.add(len(devices))
+        ...
+        progress.advance(ok)
+    # выход из блока — отложенная правка отменяется, итог пишет вызывающий
+    # (или await progress.finish(text))
+"""
+
+import asyncio
+import logging
+import time
+from typing import Awaitable, Callable
+
+from aiogram.exceptions import TelegramBadRequest, TelegramRetryAfter
+
+from bot.tracing import detached_context
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_INTERVAL = 3.0  # секунд между правками сообщения
+
+EditFunc = Callable[[str], Awaitable[object]]
+
+_interval = DEFAULT_INTERVAL
+
+
+def configure(interval: float) -> None:
+    """interval <= 0 — без промежуточных правок: только start() и finish()."""
+    global _interval
+    _interval = interval
+
+
+def _fmt_eta(seconds: float) -> str:
+    seconds = int(seconds + 0.5)
+    if seconds < 60:
+        return f"{seconds} с"
+    if seconds < 3600:
+        return f"{seconds // 60} мин {seconds % 60:02d} с"
+    return f"{seconds // 3600} ч {seconds % 3600 // 60:02d} мин"
+
+
+class Progress:
+    def __init__(
+        self,
+        edit: EditFunc,
+        title: str,
+        total: int = 0,
+        done: int = 0,
+        errors: int = 0,
+        stage: str = "подготовка",
+        interval: float | None = None,
+    ) -> None:
+        self.edit = edit
+        self.title = title
+        self.stage = stage
+        self.total = total
+        self.done = done            # шаги с исходом, включая ошибки
+        self.errors = errors
+        self.interval = _interval if interval is None else interval
+        self._started = time.monotonic()
+        self._base = done           # выполнено до начала (продолжение задания) — не для ETA
+        self._next_edit = 0.0       # раньше этого момента правки не отправляются
+        self._retry_until = 0.0     # retry_after последнего ответа 429
+        self._last_text = ""
+        self._flush: asyncio.Task | None = None
+        self._editing = False
+        self._closed = False
+
+    # -- счётчики ----------------------------------------------------------------
+
+    def add(self, steps: int) -> None:
+        """Увеличить общее число шагов (когда объём работы становится известен)."""
+        self.total += steps
+        self._changed()
+
+    def advance(self, ok: bool = True, steps: int = 1) -> None:
+        self.done += steps
+        if not ok:
+            self.errors += steps
+        self._changed()
+
+    def set_stage(self, stage: str) -> None:
+        self.stage = stage
+        self._changed()
+
+    def eta(self) -> float | None:
+        """Секунд до конца по средней скорости с начала; None — оценить нельзя."""
+        processed = self.done - self._base
+        remaining = self.total - self.done
+        if processed <= 0 or remaining <= 0:
+            return None
+        return (time.monotonic() - self._started) / processed * remaining
+
+    def render(self) -> str:
+        line = f"{self.stage}: {self.done} из {self.total}" if self.total else f"{self.stage}..."
+        if self.errors:
+            line += f", ошибок: {self.errors}"
+        eta = self.eta()
+        if eta is not None:
+            line += f" · осталось ≈ {_fmt_eta(eta)}"
+        return f"{self.title}\n{line}"
+
+    # -- правки ------------------------------------------------------------------
+
+    async def start(self) -> None:
+        """Показать ход сразу, без ожидания интервала."""
+        await self._send(self.render())
+
+    async def finish(self, text: str | None = None) -> None:
+        """Отменить отложенную правку; text — итоговая правка сообщения."""
+        await self.close()
+        if text is not None:
+            delay = self._retry_until - time.monotonic()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            await self._send(text)
+
+    async def close(self) -> None:
+        self._closed = True
+        task, self._flush = self._flush, None
+        if task is None:
+            return
+        if not self._editing:
+            task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
+
+    async def __aenter__(self) -> "Progress":
+        return self
+
+    async def __aexit__(self, *exc) -> None:
+        await self.close()
+
+    def _changed(self) -> None:
+        if self._closed or self._flush is not None or self.interval <= 0:
+            return
+        delay = max(0.0, self._next_edit - time.monotonic())
+        self._flush = asyncio.create_task(self._flush_later(delay), context=detached_context())
+
+    async def _flush_later(self, delay: float) -> None:
+        await asyncio.sleep(delay)
+        self._editing = True
+        try:
+            await self._send(self.render())
+        finally:
+            self._editing = False
+            self._flush = None
+
+    async def _send(self, text: str) -> None:
+        if text == self._last_text:
+            return
+        self._next_edit = time.monotonic() + max(self.interval, 0.0)
+        try:
+            await self.edit(text)
+        except TelegramRetryAfter as e:
+            self._retry_until = time.monotonic() + e.retry_after
+            self._next_edit = max(self._next_edit, self._retry_until)
+            logger.info("Progress edit rate limited, next in %ss", e.retry_after)
+            return
+        except TelegramBadRequest as e:
+            if "not modified" not in e.message:
+                logger.warning("Progress edit rejected: %s", e.message)
+        except Exception as e:
+            logger.warning("Progress edit failed: %s", e)
+            return
+        self._last_text = text
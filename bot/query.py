@@ -0,0 +1,250 @@
+"""
+bot/query.py
+Чтение реестра для хендлеров: пользователи и устройства.
+
+Заменяет вызовы users/get.sh, users/list.sh, devices/get.sh, devices/list.sh
+и devices/config.sh чтением резидентных индексов (bot/registry.py,
+bot/vless.py) — без fork/exec и jq.
+Форма результата та же, что у скриптов (docs/scripts.md).
+
+Режим задаётся SIGILGATE_READ_PATH:
+  native  — только индексы (по умолчанию)
+  scripts — только скрипты (прежнее поведение)
+  parity  — оба пути; расхождения пишутся в лог, возвращается результат скрипта
+
+Без SIGIL_STORE_PATH нативный путь недоступен — чтение идёт через скрипты.
+Все функции возвращают None при ошибке чтения (как хендлеры при rc != 0).
+"""
+
+import asyncio
+import json
+import logging
+from typing import Any, Callable
+
+from bot.models import loads
+from bot.registry import get_device_index, get_user_index
+from bot.runner import ScriptFailed, SendFunc, run_script, script_name, stream_script
+from bot.tracing import span
+from bot.vless import IncompleteRoute, device_links
+
+logger = logging.getLogger(__name__)
+
+READ_MODES = ("native", "scripts", "parity")
+
+_mode = "native"
+
+
+def set_read_mode(mode: str) -> str:
+    global _mode
+    if mode not in READ_MODES:
+        logger.warning("Unknown read path %r, using native", mode)
+        mode = "native"
+    _mode = mode
+    return _mode
+
+
+def get_read_mode() -> str:
+    return _mode
+
+
+# ---------------------------------------------------------------------------
+# Нативные реализации (форма вывода — как у скриптов)
+# ---------------------------------------------------------------------------
+
+def _native_get_user(store_path: str, user_id: str) -> dict | None:
+    return get_user_index(store_path).get_by_id(user_id)
+
+
+def _native_list_users(store_path: str, status: str | None) -> list[dict]:
+    return [
+        {"id": u.get("id"), "username": u.get("username"), "status": u.get("status")}
+        for u in get_user_index(store_path).records()
+        if status is None or u.get("status") == status
+    ]
+
+
+def _native_get_device(store_path: str, uuid: str) -> dict | None:
+    return get_device_index(store_path).get_by_uuid(uuid)
+
+
+def _native_list_devices(store_path: str, user_id: str) -> list[dict]:
+    return [
+        {
+            "uuid": d.get("uuid"),
+            "device": d.get("device"),
+            "status": d.get("status"),
+            "created": d.get("created"),
+        }
+        for d in get_device_index(store_path).by_user(user_id)
+    ]
+
+
+# ---------------------------------------------------------------------------
+# Выбор пути
+# ---------------------------------------------------------------------------
+
+async def _via_script(
+    cmd: list[str], send: SendFunc | None, verbose: bool
+) -> Any | None:
+    script = script_name(cmd)
+    rc, stdout, stderr = await run_script(cmd, send=send, verbose=verbose)
+    if rc != 0:
+        logger.error("%s failed: %s", script, stderr)
+        return None
+    try:
+        return loads(stdout)
+    except json.JSONDecodeError:
+        logger.error("%s returned invalid JSON: %s", script, stdout)
+        return None
+
+
+async def _via_script_stream(
+    cmd: list[str], send: SendFunc | None, verbose: bool
+) -> list | None:
+    """
+    Как _via_script для скриптов-списков, но вывод разбирается по мере
+    поступления (stream_script): строка stdout целиком не собирается.
+    Результат — готовый список: вызывающий получает его только после
+    завершения скрипта. При verbose нужен сырой вывод — используется
+    обычный путь.
+    """
+    if verbose:
+        return await _via_script(cmd, send, verbose)
+    script = script_name(cmd)
+    try:
+        return [item async for item in stream_script(cmd)]
+    except ScriptFailed as e:
+        logger.error("%s failed: %s", script, e)
+        return None
+    except json.JSONDecodeError as e:
+        logger.error("%s returned invalid JSON: %s", script, e)
+        return None
+
+
+def _plain(value: Any) -> Any:
+    if isinstance(value, list):
+        return [_plain(v) for v in value]
+    if hasattr(value, "items"):
+        return {k: _plain(v) for k, v in value.items()}
+    return value
+
+
+async def _read(
+    store_path: str,
+    native: Callable[[], Any],
+    cmd: list[str],
+    send: SendFunc | None,
+    verbose: bool,
+    stream: bool = False,
+) -> Any | None:
+    via_script = _via_script_stream if stream else _via_script
+    # Без SIGIL_STORE_PATH индексы читали бы users/… относительно cwd
+    if _mode == "scripts" or not store_path:
+        return await via_script(cmd, send, verbose)
+
+    try:
+        with span("registry.read", op=script_name(cmd)):
+            native_result = await asyncio.to_thread(native)
+    except IncompleteRoute as e:
+        logger.info("Native read not applicable (%s), using %s", e, cmd[0])
+        return await via_script(cmd, send, verbose)
+    except Exception:
+        logger.exception("Native registry read failed, falling back to %s", cmd[0])
+        return await via_script(cmd, send, verbose)
+
+    if _mode == "parity":
+        script_result = await via_script(cmd, send, verbose)
+        if _plain(native_result) != _plain(script_result):
+            logger.warning(
+                "Read parity mismatch for %s: native=%r script=%r",
+                " ".join(cmd[1:]) or cmd[0], _plain(native_result), script_result,
+            )
+        return script_result
+
+    return native_result
+
+
+# ---------------------------------------------------------------------------
+# API для хендлеров
+# ---------------------------------------------------------------------------
+
+async def get_user(
+    user_id: str,
+    store_path: str,
+    scripts_path: str,
+    send: SendFunc | None = None,
+    verbose: bool = False,
+) -> dict | None:
+    """users/get.sh --id <user_id>"""
+    return await _read(
+        store_path,
+        lambda: _native_get_user(store_path, user_id),
+        [f"{scripts_path}/users/get.sh", "--id", user_id],
+        send, verbose,
+    )
+
+
+async def list_users(
+    status_filter: str,
+    store_path: str,
+    scripts_path: str,
+    send: SendFunc | None = None,
+    verbose: bool = False,
+) -> list[dict] | None:
+    """users/list.sh [--status active]; status_filter "all" — без фильтра."""
+    status = None if status_filter == "all" else status_filter
+    cmd = [f"{scripts_path}/users/list.sh"]
+    if status is not None:
+        cmd += ["--status", status]
+    return await _read(
+        store_path,
+        lambda: _native_list_users(store_path, status), cmd, send, verbose, stream=True
+    )
+
+
+async def get_device(
+    uuid: str,
+    store_path: str,
+    scripts_path: str,
+    send: SendFunc | None = None,
+    verbose: bool = False,
+) -> dict | None:
+    """devices/get.sh --uuid <uuid>"""
+    return await _read(
+        store_path,
+        lambda: _native_get_device(store_path, uuid),
+        [f"{scripts_path}/devices/get.sh", "--uuid", uuid],
+        send, verbose,
+    )
+
+
+async def get_device_config(
+    uuid: str,
+    store_path: str,
+    scripts_path: str,
+    send: SendFunc | None = None,
+    verbose: bool = False,
+) -> list[str] | None:
+    """devices/config.sh --uuid <uuid>"""
+    return await _read(
+        store_path,
+        lambda: device_links(store_path, uuid),
+        [f"{scripts_path}/devices/config.sh", "--uuid", uuid],
+        send, verbose,
+    )
+
+
+async def list_devices(
+    user_id: int | str,
+    store_path: str,
+    scripts_path: str,
+    send: SendFunc | None = None,
+    verbose: bool = False,
+) -> list[dict] | None:
+    """devices/list.sh --user <user_id>"""
+    return await _read(
+        store_path,
+        lambda: _native_list_devices(store_path, str(user_id)),
+        [f"{scripts_path}/devices/list.sh", "--user", str(user_id)],
+        send, verbose,
+    )
@@ -0,0 +1,325 @@
+"""
+bot/registry.py
+Резидентные индексы записей реестра (registry/users/ и др.).
+
+Индекс строится один раз при старте и дальше поддерживается в актуальном
+состоянии без полного перечитывания директории:
+  - изменения файлов приходят адресными инвалидациями от bot/watcher.py;
+  - появление/удаление файлов отслеживается по mtime директории users/;
+  - найденная запись перед возвратом сверяется со stat файла.
+Если индекс холодный или рассогласован с диском — выполняется полный скан.
+
+Read-only: запись в реестр — только через скрипты.
+"""
+
+import json
+import logging
+import os
+import threading
+from pathlib import Path
+from typing import Callable
+
+from bot.models import Device, User, loads
+
+logger = logging.getLogger(__name__)
+
+# (st_mtime_ns, st_size, st_ino) — признак неизменности файла
+StatSig = tuple[int, int, int]
+
+
+def stat_sig(st: os.stat_result) -> StatSig:
+    return (st.st_mtime_ns, st.st_size, st.st_ino)
+
+
+class DirectoryIndex:
+    """
+    Резидентная копия JSON-записей одной поддиректории реестра.
+
+    Подклассы поддерживают вторичные индексы через _index/_unindex,
+    которые вызываются под блокировкой при каждом добавлении/удалении записи.
+    """
+
+    subdir = ""
+    record_type: Callable[[dict], dict] | None = None  # обёртка записи (bot/models.py)
+
+    def __init__(self, store_path: str) -> None:
+        self.directory = Path(store_path) / self.subdir
+        self._lock = threading.RLock()
+        self._records: dict[str, tuple[StatSig, dict]] = {}  # имя файла → (stat, данные)
+        self._dirty: set[str] = set()                        # имена файлов к перечитыванию
+        self._dir_mtime_ns: int | None = None
+        self._ready = False
+
+    @property
+    def ready(self) -> bool:
+        return self._ready
+
+    def __len__(self) -> int:
+        return len(self._records)
+
+    # ------------------------------------------------------------------
+    # Вторичные индексы (переопределяются в подклассах)
+    # ------------------------------------------------------------------
+
+    def _index(self, name: str, data: dict) -> None:
+        pass
+
+    def _unindex(self, name: str, data: dict) -> None:
+        pass
+
+    def _clear_indexes(self) -> None:
+        pass
+
+    # ------------------------------------------------------------------
+    # Построение и синхронизация
+    # ------------------------------------------------------------------
+
+    def build(self) -> None:
+        """Полностью перестроить индекс с диска."""
+        with self._lock:
+            self._records.clear()
+            self._clear_indexes()
+            self._dirty.clear()
+            self._sync()
+            logger.info("%s index built: %d records", self.subdir, len(self._records))
+
+    def invalidate(self, name: str | None = None) -> None:
+        """
+        Пометить запись (по имени файла) или весь индекс как устаревшие.
+
+        Вызывается из event loop (watcher), поэтому только ставит отметку —
+        перечитывание происходит при следующем обращении.
+        """
+        if name is None:
+            self._ready = False
+        elif name.endswith(".json"):
+            self._dirty.add(name)
+
+    def refresh(self) -> None:
+        """Привести индекс в соответствие с диском (вызывать под self._lock)."""
+        if not self._ready or self._dir_changed():
+            self._dirty.clear()
+            self._sync()
+        else:
+            while self._dirty:
+                self._reload(self._dirty.pop())
+
+    def get(self, name: str) -> dict | None:
+        """Запись по имени файла (с проверкой stat)."""
+        if os.sep in name or name.startswith("."):
+            return None
+        with self._lock:
+            self.refresh()
+            return self._reload(name)
+
+    def records(self) -> list[dict]:
+        """Все записи в порядке имён файлов (как глоб *.json в bash)."""
+        with self._lock:
+            self.refresh()
+            return [self._records[name][1] for name in sorted(self._records)]
+
+    def _sync(self) -> None:
+        """Сверить индекс с директорией: перечитать изменённые файлы, убрать удалённые."""
+        try:
+            dir_mtime = os.stat(self.directory).st_mtime_ns
+            entries = list(os.scandir(self.directory))
+        except OSError:
+            self._records.clear()
+            self._clear_indexes()
+            self._dir_mtime_ns = None
+            self._ready = False
+            return
+
+        seen: set[str] = set()
+        for entry in entries:
+            if not entry.name.endswith(".json"):
+                continue
+            seen.add(entry.name)
+            try:
+                self._load(entry.name, entry.stat())
+            except OSError as e:
+                logger.warning("Failed to stat %s: %s", entry.path, e)
+
+        for name in set(self._records) - seen:
+            self._drop(name)
+
+        self._dir_mtime_ns = dir_mtime
+        self._ready = True
+
+    def _dir_changed(self) -> bool:
+        try:
+            return os.stat(self.directory).st_mtime_ns != self._dir_mtime_ns
+        except OSError:
+            return True
+
+    def _load(self, name: str, st: os.stat_result) -> dict | None:
+        """Вернуть запись, перечитав файл только если изменился его stat."""
+        sig = stat_sig(st)
+        cached = self._records.get(name)
+        if cached is not None and cached[0] == sig:
+            return cached[1]
+
+        path = self.directory / name
+        try:
+            data = loads(path.read_bytes())
+        except (json.JSONDecodeError, OSError) as e:
+            logger.warning("Failed to read %s: %s", path, e)
+            self._drop(name)
+            return None
+        if not isinstance(data, dict):
+            logger.warning("Failed to read %s: top level is %s, not an object", path, type(data).__name__)
+            self._drop(name)
+            return None
+        if self.record_type is not None:
+            data = self.record_type(data)
+
+        self._drop(name)
+        self._records[name] = (sig, data)
+        self._index(name, data)
+        return data
+
+    def _reload(self, name: str) -> dict | None:
+        try:
+            st = os.stat(self.directory / name)
+        except OSError:
+            self._drop(name)
+            return None
+        return self._load(name, st)
+
+    def _drop(self, name: str) -> None:
+        cached = self._records.pop(name, None)
+        if cached is not None:
+            self._unindex(name, cached[1])
+
+
+class UserIndex(DirectoryIndex):
+    """
+    Индексы пользователей: hash_telegram_id → запись и username → запись.
+
+    Никнеймы сравниваются без учёта регистра (casefold).
+    """
+
+    subdir = "users"
+    record_type = User
+
+    def __init__(self, store_path: str) -> None:
+        super().__init__(store_path)
+        self._by_hash: dict[str, str] = {}      # hash_telegram_id → имя файла
+        self._by_username: dict[str, str] = {}  # username.casefold() → имя файла
+
+    def _index(self, name: str, data: dict) -> None:
+        tg_hash = data.get("hash_telegram_id")
+        if tg_hash:
+            self._by_hash[tg_hash] = name
+        username = data.get("username")
+        if username:
+            self._by_username[username.casefold()] = name
+
+    def _unindex(self, name: str, data: dict) -> None:
+        tg_hash = data.get("hash_telegram_id")
+        if tg_hash and self._by_hash.get(tg_hash) == name:
+            del self._by_hash[tg_hash]
+        username = data.get("username")
+        if username and self._by_username.get(username.casefold()) == name:
+            del self._by_username[username.casefold()]
+
+    def _clear_indexes(self) -> None:
+        self._by_hash.clear()
+        self._by_username.clear()
+
+    # ------------------------------------------------------------------
+    # Уникальность никнейма
+    # ------------------------------------------------------------------
+
+    def _username_in_registry(self, key: str) -> bool:
+        name = self._by_username.get(key)
+        if name is None:
+            return False
+        data = self._reload(name)
+        if data is not None and (data.get("username") or "").casefold() == key:
+            return True
+        self._sync()
+        return key in self._by_username
+
+    def is_username_taken(self, username: str) -> bool:
+        """Занят ли никнейм записью реестра (без учёта регистра)."""
+        key = username.casefold()
+        with self._lock:
+            self.refresh()
+            return self._username_in_registry(key)
+
+    def find_by_hash(self, tg_hash: str) -> dict | None:
+        with self._lock:
+            self.refresh()
+
+            name = self._by_hash.get(tg_hash)
+            if name is None:
+                return None
+
+            data = self._reload(name)
+            if data is not None and data.get("hash_telegram_id") == tg_hash:
+                return data
+
+            # Запись изменилась под индексом — пересобираем и ищем ещё раз
+            logger.debug("User index inconsistent for %s, rescanning", name)
+            self._sync()
+            name = self._by_hash.get(tg_hash)
+            if name is None:
+                return None
+            return self._records[name][1]
+
+    def get_by_id(self, user_id: int | str) -> dict | None:
+        return self.get(f"{user_id}.json")
+
+
+class DeviceIndex(DirectoryIndex):
+    """Индекс устройств: uuid (имя файла) → запись, user_id → устройства."""
+
+    subdir = "devices"
+    record_type = Device
+
+    def __init__(self, store_path: str) -> None:
+        super().__init__(store_path)
+        self._by_user: dict[str, set[str]] = {}  # str(user_id) → имена файлов
+
+    def _index(self, name: str, data: dict) -> None:
+        self._by_user.setdefault(str(data.get("user_id", "")), set()).add(name)
+
+    def _unindex(self, name: str, data: dict) -> None:
+        names = self._by_user.get(str(data.get("user_id", "")))
+        if names is not None:
+            names.discard(name)
+
+    def _clear_indexes(self) -> None:
+        self._by_user.clear()
+
+    def get_by_uuid(self, uuid: str) -> dict | None:
+        return self.get(f"{uuid}.json")
+
+    def by_user(self, user_id: int | str) -> list[dict]:
+        """Устройства пользователя в порядке имён файлов."""
+        with self._lock:
+            self.refresh()
+            names = sorted(self._by_user.get(str(user_id), ()))
+            return [self._records[name][1] for name in names]
+
+
+_indexes: dict[tuple[type, str], DirectoryIndex] = {}
+_indexes_lock = threading.Lock()
+
+
+def get_index(cls: type[DirectoryIndex], store_path: str) -> DirectoryIndex:
+    """Общий индекс класса cls для данного SIGIL_STORE_PATH (создаётся лениво)."""
+    with _indexes_lock:
+        index = _indexes.get((cls, store_path))
+        if index is None:
+            index = _indexes[(cls, store_path)] = cls(store_path)
+        return index
+
+
+def get_user_index(store_path: str) -> UserIndex:
+    return get_index(UserIndex, store_path)
+
+
+def get_device_index(store_path: str) -> DeviceIndex:
+    return get_index(DeviceIndex, store_path)
@@ -4,6 +4,8 @@ from enum import Enum
 from pathlib import Path
 
 from bot.crypto import hash_telegram_id
+from bot.models import User, loads
+from bot.registry import get_user_index
 
 logger = logging.getLogger(__name__)
 
@@ -35,7 +37,12 @@ def resolve_guest_state(registry_user: dict | None) -> GuestState:
 
 
 def find_user_by_telegram_id(telegram_id: int, store_path: str) -> dict | None:
-    """Ищет пользователя по telegram_id, сравнивая по hash_telegram_id."""
+    """
+    Ищет пользователя по telegram_id, сравнивая по hash_telegram_id.
+
+    Основной путь — резидентный индекс (bot/registry.py); полный скан
+    users/*.json используется, только если индекс недоступен.
+    """
     if not store_path:
         return None
     users_dir = Path(store_path) / "users"
@@ -46,11 +53,22 @@ def find_user_by_telegram_id(telegram_id: int, store_path: str) -> dict | None:
     except RuntimeError as e:
         logger.error("Не удалось вычислить hash_telegram_id: %s", e)
         return None
+
+    index = get_user_index(store_path)
+    try:
+        return index.find_by_hash(tg_hash)
+    except Exception:
+        logger.exception("User index lookup failed, falling back to full scan")
+        index.invalidate()
+    return _scan_users_by_hash(users_dir, tg_hash)
+
+
+def _scan_users_by_hash(users_dir: Path, tg_hash: str) -> dict | None:
     for file in users_dir.glob("*.json"):
         try:
-            data = json.loads(file.read_text())
+            data = loads(file.read_bytes())
             if data.get("hash_telegram_id") == tg_hash:
-                return data
+                return User(data)
         except (json.JSONDecodeError, OSError) as e:
             logger.warning("Failed to read %s: %s", file, e)
     return None
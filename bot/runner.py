@@ -1,40 +1,245 @@
 import asyncio
 import logging
-import os
-from typing import Callable, Coroutine, Any
+import time
+from typing import AsyncIterator, Awaitable, Callable, Coroutine, Any
+
+from bot.jsonstream import JSONStreamParser
+
+from bot.scheduler import scheduler
+from bot.script_cache import script_cache
+from bot.telemetry import record_script
+from bot.tracing import annotate, span, start_span
+from bot.workers import WorkerCrashed, WorkerPool, WorkerUnavailable, terminate_group
 
 logger = logging.getLogger(__name__)
 
 # Тип функции отправки сообщения в чат (например, message.answer или bot.send_message)
 SendFunc = Callable[[str], Coroutine[Any, Any, Any]]
 
-async def run_script(
-    cmd: list[str],
-    send: SendFunc | None = None,
-    verbose: bool = False,
-) -> tuple[int, str, str]:
+# Скрипты только для чтения: их безопасно повторить, если воркер упал во время выполнения
+READ_ONLY_SCRIPTS = frozenset({
+    "users/get.sh",
+    "users/list.sh",
+    "devices/get.sh",
+    "devices/list.sh",
+    "devices/config.sh",
+    "nodes/list-core.sh",
+    "nodes/list-entry.sh",
+    "trial/find.sh",
+})
+
+# Атомарные пишущие скрипты: меняют реестр, но не коммитят. Остальные пишущие
+# (оркестраторы users/update.sh, devices/remove.sh, ...) сами делают git add -A
+# и коммит — перед ними вызывается commit barrier (set_commit_barrier)
+ATOMIC_WRITE_SCRIPTS = frozenset({
+    "users/create.sh",
+    "users/modify.sh",
+    "users/delete.sh",
+    "devices/create.sh",
+    "devices/modify.sh",
+    "devices/delete.sh",
+    "entry/add-client.sh",
+    "entry/remove-client.sh",
+    "store/commit.sh",
+})
+
+# Дедлайны по классам скриптов (секунды; None — без ограничения)
+DEFAULT_TIMEOUTS: dict[str, float | None] = {"read": 15.0, "write": 120.0, "entry": 60.0}
+DEFAULT_OUTPUT_LIMIT = 32 * 1024 * 1024  # байт на stdout и на stderr
+
+# Код возврата при превышении дедлайна (как у coreutils timeout)
+TIMEOUT_RC = 124
+TIMEOUT_TEXT = "Операция не завершилась вовремя. Попробуйте позже."
+
+_timeouts = dict(DEFAULT_TIMEOUTS)
+_output_limit = DEFAULT_OUTPUT_LIMIT
+
+_pool: WorkerPool | None = None
+
+# Вызывается перед коммитящим оркестратором (bot/transaction.py: отложенные коммиты)
+_commit_barrier: Callable[[], Awaitable[object]] | None = None
+
+# Single-flight: одновременные вызовы read-only скрипта с одинаковым argv
+# ждут один и тот же запуск
+_inflight: dict[tuple[str, ...], asyncio.Task] = {}
+coalesced_calls = 0
+
+
+class ScriptResult(tuple):
     """
-    Асинхронно запускает скрипт и возвращает (returncode, stdout, stderr).
+    (returncode, stdout, stderr) — распаковывается как прежний кортеж.
 
-    Если verbose=True и передана функция send — отправляет сырой вывод
-    скрипта в чат отдельным сообщением перед тем, как управление
-    вернётся в хендлер.
+    timed_out — скрипт остановлен по дедлайну (returncode == TIMEOUT_RC);
+    truncated — вывод обрезан до лимита.
     """
-    env = os.environ.copy()
 
-    logger.debug("Running: %s", " ".join(cmd))
+    def __new__(
+        cls,
+        returncode: int,
+        stdout: str,
+        stderr: str,
+        timed_out: bool = False,
+        truncated: bool = False,
+    ) -> "ScriptResult":
+        result = super().__new__(cls, (returncode, stdout, stderr))
+        result.timed_out = timed_out
+        result.truncated = truncated
+        return result
+
+    @property
+    def returncode(self) -> int:
+        return self[0]
+
+
+class ScriptFailed(Exception):
+    """Ошибка потокового запуска (stream_script): rc != 0, дедлайн или переполнение."""
+
+    def __init__(self, result: ScriptResult) -> None:
+        super().__init__(result[2] or f"exit code {result[0]}")
+        self.result = result
+
+
+def failure_text(returncode: int, default: str) -> str:
+    """Текст ошибки для пользователя: отдельный — для дедлайна."""
+    return TIMEOUT_TEXT if returncode == TIMEOUT_RC else default
+
+
+def script_name(cmd: list[str]) -> str:
+    """Имя скрипта относительно SIGIL_SCRIPTS_PATH: '/x/scripts/users/get.sh' → 'users/get.sh'."""
+    return "/".join(cmd[0].rsplit("/", 2)[-2:])
+
+
+def configure_pool(size: int, max_jobs: int = 100) -> None:
+    """Включить пул bash-воркеров (size=0 — выключить, запуск напрямую)."""
+    global _pool
+    _pool = WorkerPool(size, max_jobs) if size > 0 else None
+
+
+async def shutdown_pool() -> None:
+    global _pool
+    if _pool is not None:
+        await _pool.close()
+        _pool = None
+
+
+def set_commit_barrier(barrier: Callable[[], Awaitable[object]] | None) -> None:
+    """barrier() ожидается перед каждым пишущим скриптом не из ATOMIC_WRITE_SCRIPTS."""
+    global _commit_barrier
+    _commit_barrier = barrier
+
+
+def configure_limits(timeouts: dict[str, float | None], output_limit: int) -> None:
+    """Дедлайны по классам (read / write / entry; 0 или None — без дедлайна) и лимит вывода."""
+    global _output_limit
+    for cls, timeout in timeouts.items():
+        if cls not in _timeouts:
+            logger.warning("Unknown script timeout class %r, ignoring", cls)
+            continue
+        _timeouts[cls] = timeout or None
+    _output_limit = output_limit
+
+
+def timeout_for(script: str) -> float | None:
+    if script.startswith("entry/"):
+        return _timeouts["entry"]
+    if script in READ_ONLY_SCRIPTS:
+        return _timeouts["read"]
+    return _timeouts["write"]
+
+
+async def _read_capped(stream: asyncio.StreamReader, limit: int) -> tuple[bytes, bool]:
+    """Читать поток до EOF, сохраняя не больше limit байт (остальное — в никуда)."""
+    chunks = []
+    size = 0
+    truncated = False
+    while chunk := await stream.read(65536):
+        if size < limit:
+            kept = chunk[:limit - size]
+            chunks.append(kept)
+            size += len(kept)
+            truncated = truncated or len(kept) < len(chunk)
+        else:
+            truncated = True
+    return b"".join(chunks), truncated
+
+
+async def _exec(cmd: list[str], timeout: float | None) -> tuple[int, bytes, bytes, bool]:
+    """
+    Однократный запуск скрипта отдельным процессом (окружение наследуется).
 
+    Скрипт запускается в своей группе процессов: при дедлайне или отмене
+    SIGTERM/SIGKILL получают и его потомки (ssh и т.п.).
+    """
     proc = await asyncio.create_subprocess_exec(
         *cmd,
         stdout=asyncio.subprocess.PIPE,
         stderr=asyncio.subprocess.PIPE,
-        env=env,
+        start_new_session=True,
     )
-    stdout_bytes, stderr_bytes = await proc.communicate()
+    try:
+        (stdout_bytes, out_cut), (stderr_bytes, err_cut), returncode = await asyncio.wait_for(
+            asyncio.gather(
+                _read_capped(proc.stdout, _output_limit),
+                _read_capped(proc.stderr, _output_limit),
+                proc.wait(),
+            ),
+            timeout,
+        )
+    except BaseException:  # дедлайн или отмена вызывающего
+        await terminate_group(proc)
+        raise
+    return returncode, stdout_bytes, stderr_bytes, out_cut or err_cut
+
+
+async def _execute(cmd: list[str], timeout: float | None) -> tuple[int, bytes, bytes, bool]:
+    if _pool is None:
+        return await _exec(cmd, timeout)
+    try:
+        return await _pool.run(cmd, timeout, _output_limit)
+    except WorkerUnavailable as e:
+        logger.warning("Script worker unavailable (%s), running directly", e)
+        return await _exec(cmd, timeout)
+    except WorkerCrashed as e:
+        if script_name(cmd) in READ_ONLY_SCRIPTS:
+            logger.warning("Script worker crashed (%s), retrying %s directly", e, cmd[0])
+            return await _exec(cmd, timeout)
+        logger.error("Script worker crashed while running %s: %s", cmd[0], e)
+        return -1, b"", f"script worker crashed: {e}".encode(), False
+
+
+async def _run(
+    script: str, cmd: list[str], lane: str | None, timeout: float | None
+) -> ScriptResult:
+    logger.debug("Running: %s", " ".join(cmd))
+    cacheable = script_cache.cacheable(script)
+    generation = script_cache.begin() if cacheable else 0
 
-    stdout = stdout_bytes.decode().strip()
-    stderr = stderr_bytes.decode().strip()
-    returncode = proc.returncode
+    # До захвата слота: barrier сам запускает store/commit.sh
+    if (_commit_barrier is not None and script not in READ_ONLY_SCRIPTS
+            and script not in ATOMIC_WRITE_SCRIPTS):
+        await _commit_barrier()
+
+    slot = scheduler.pick(lane, script in READ_ONLY_SCRIPTS)
+    waited = await slot.acquire()
+    annotate(lane=slot.name, queue_wait_ms=round(waited * 1000, 1))
+    started = time.monotonic()
+    try:
+        returncode, stdout_bytes, stderr_bytes, truncated = await _execute(cmd, timeout)
+    except asyncio.TimeoutError:
+        logger.error("Script timed out after %ss: %s", timeout, " ".join(cmd))
+        record_script(script, time.monotonic() - started, waited, 0, TIMEOUT_RC, timed_out=True)
+        return ScriptResult(TIMEOUT_RC, "", f"{script}: timed out after {timeout}s", timed_out=True)
+    finally:
+        slot.completed += 1
+        slot.release()
+        if not cacheable:
+            script_cache.invalidate_for_write(script, cmd)
+
+    record_script(script, time.monotonic() - started, waited, len(stdout_bytes), returncode)
+    if truncated:
+        logger.warning("Output of %s truncated to %d bytes", script, _output_limit)
+    stdout = stdout_bytes.decode(errors="replace" if truncated else "strict").strip()
+    stderr = stderr_bytes.decode(errors="replace" if truncated else "strict").strip()
 
     logger.debug("Exit code: %d", returncode)
     if stdout:
@@ -42,9 +247,184 @@ async def run_script(
     if stderr:
         logger.debug("stderr: %s", stderr)
 
+    result = ScriptResult(returncode, stdout, stderr, truncated=truncated)
+    if cacheable and not truncated:
+        script_cache.put(script, cmd, result, generation)
+    return result
+
+
+def _forget(key: tuple[str, ...], task: asyncio.Task) -> None:
+    if _inflight.get(key) is task:
+        del _inflight[key]
+    if not task.cancelled():
+        task.exception()  # все ожидающие могли быть отменены — не терять исключение молча
+
+
+async def _run_shared(
+    script: str, cmd: list[str], lane: str | None, timeout: float | None
+) -> ScriptResult:
+    global coalesced_calls
+    if script not in READ_ONLY_SCRIPTS:
+        return await _run(script, cmd, lane, timeout)
+
+    key = tuple(cmd)
+    task = _inflight.get(key)
+    if task is None:
+        task = asyncio.ensure_future(_run(script, cmd, lane, timeout))
+        _inflight[key] = task
+        task.add_done_callback(lambda t: _forget(key, t))
+    else:
+        coalesced_calls += 1
+        annotate(coalesced=True)
+        logger.debug("Coalesced: %s", " ".join(cmd))
+    # shield: отмена одного ожидающего не отменяет общий запуск
+    return await asyncio.shield(task)
+
+
+def stats() -> dict:
+    return {
+        "coalesced_calls": coalesced_calls,
+        "inflight": len(_inflight),
+        "lanes": scheduler.stats(),
+        "pool": None if _pool is None else {
+            "size": _pool.size,
+            "spawned": _pool.spawned,
+            "recycled": _pool.recycled,
+            "crashed": _pool.crashed,
+            "timeouts": _pool.timeouts,
+        },
+    }
+
+
+async def run_script(
+    cmd: list[str],
+    send: SendFunc | None = None,
+    verbose: bool = False,
+    lane: str | None = None,
+    timeout: float | None = None,
+) -> ScriptResult:
+    """
+    Асинхронно запускает скрипт и возвращает (returncode, stdout, stderr).
+
+    Если verbose=True и передана функция send — отправляет сырой вывод
+    скрипта в чат отдельным сообщением перед тем, как управление
+    вернётся в хендлер.
+
+    Результаты read-only скриптов кэшируются по политике из
+    bot/script_cache.py; пишущие скрипты сбрасывают связанные записи.
+    Одновременные вызовы read-only скрипта с одинаковым argv выполняются
+    одним процессом.
+
+    lane — полоса планировщика (read / write / background / entry, bot/scheduler.py);
+    по умолчанию берётся из контекста (with background(): ...) или из
+    классификации скрипта.
+
+    timeout — дедлайн в секундах (по умолчанию — по классу скрипта, см.
+    timeout_for). При превышении группа процессов скрипта получает SIGTERM,
+    затем SIGKILL, а результат — returncode TIMEOUT_RC и timed_out=True.
+    stdout/stderr ограничены SIGILGATE_SCRIPT_OUTPUT_LIMIT байт.
+    """
+    script = script_name(cmd)
+    with span("script", script=script) as current:
+        cached = script_cache.get(script, cmd) if script_cache.cacheable(script) else None
+        if cached is not None:
+            logger.debug("Cache hit: %s", " ".join(cmd))
+            result = cached
+        else:
+            if timeout is None:
+                timeout = timeout_for(script)
+            result = await _run_shared(script, cmd, lane, timeout)
+        if current is not None:
+            current.set(returncode=result.returncode, cached=cached is not None, timed_out=result.timed_out)
+    _, stdout, stderr = result
+
     if verbose and send is not None:
         combined = "\n".join(filter(None, [stdout, stderr]))
         if combined:
             await send(f"<pre>{combined}</pre>")
 
-    return returncode, stdout, stderr
+    return result
+
+
+async def stream_script(
+    cmd: list[str],
+    lane: str | None = None,
+    timeout: float | None = None,
+) -> AsyncIterator[Any]:
+    """
+    Запустить read-only скрипт и отдавать элементы его JSON-вывода по мере
+    поступления (JSON-массив или NDJSON, bot/jsonstream.py) — без
+    буферизации всего stdout.
+
+        async for user in stream_script([f"{scripts_path}/users/list.sh"]):
+            ...
+
+    Дедлайн, полосы планировщика и остановка группы процессов — как у
+    run_script; кэш и single-flight не используются. Ошибка скрипта,
+    дедлайн или элемент больше SIGILGATE_SCRIPT_OUTPUT_LIMIT — ScriptFailed,
+    некорректный JSON — json.JSONDecodeError. Если потребитель прекращает
+    итерацию раньше, скрипт останавливается.
+    """
+    script = script_name(cmd)
+    if timeout is None:
+        timeout = timeout_for(script)
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + timeout if timeout else None
+
+    def remaining() -> float | None:
+        return None if deadline is None else max(0.0, deadline - loop.time())
+
+    trace_span = start_span("script.stream", script=script)
+    slot = scheduler.pick(lane, script in READ_ONLY_SCRIPTS)
+    waited = await slot.acquire()
+    started = time.monotonic()
+    received = 0
+    returncode: int | None = None  # None — итерация прервана потребителем
+    timed_out = False
+    proc = None
+    stderr_task = None
+    try:
+        logger.debug("Streaming: %s", " ".join(cmd))
+        proc = await asyncio.create_subprocess_exec(
+            *cmd,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.PIPE,
+            start_new_session=True,
+        )
+        stderr_task = asyncio.ensure_future(_read_capped(proc.stderr, _output_limit))
+        parser = JSONStreamParser()
+        try:
+            while chunk := await asyncio.wait_for(proc.stdout.read(65536), remaining()):
+                received += len(chunk)
+                for item in parser.feed(chunk):
+                    yield item
+                if parser.pending > _output_limit:
+                    raise ScriptFailed(ScriptResult(
+                        -1, "", f"{script}: JSON value exceeds {_output_limit} bytes", truncated=True,
+                    ))
+            returncode = await asyncio.wait_for(proc.wait(), remaining())
+            stderr_bytes, _ = await asyncio.wait_for(stderr_task, remaining())
+        except asyncio.TimeoutError:
+            logger.error("Script timed out after %ss: %s", timeout, " ".join(cmd))
+            returncode, timed_out = TIMEOUT_RC, True
+            raise ScriptFailed(ScriptResult(
+                TIMEOUT_RC, "", f"{script}: timed out after {timeout}s", timed_out=True,
+            )) from None
+
+        stderr = stderr_bytes.decode(errors="replace").strip()
+        if returncode != 0:
+            raise ScriptFailed(ScriptResult(returncode, "", stderr))
+        for item in parser.close():
+            yield item
+    finally:
+        if stderr_task is not None:
+            stderr_task.cancel()
+        if proc is not None and proc.returncode is None:
+            await terminate_group(proc)
+        slot.completed += 1
+        slot.release()
+        if returncode is not None:
+            record_script(script, time.monotonic() - started, waited, received, returncode, timed_out)
+        if trace_span is not None:
+            trace_span.set(returncode=returncode, bytes=received, queue_wait_ms=round(waited * 1000, 1))
+            trace_span.finish()
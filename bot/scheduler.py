@@ -0,0 +1,156 @@
+"""
+bot/scheduler.py
+Планировщик запуска скриптов: полосы (lanes) с ограничением параллелизма.
+
+  read        — интерактивное чтение (read-only скрипты)
+  write       — интерактивная запись (кнопки админа и пользователя)
+  background  — каскады, очистка триалов, фоновые задачи
+  entry       — entry/* (SSH на Entry-ноды) из каскадов: ноды обрабатываются
+                параллельно, поэтому им нужен свой лимит, а не 2 слота
+                background
+
+У каждой полосы свой лимит одновременно запущенных скриптов и своя
+FIFO-очередь, поэтому каскад на 40 устройств занимает только слоты
+background и не задерживает открытие /devices.
+
+Полоса выбирается явно (run_script(..., lane=...)), через контекст
+(with background(): ...) или по умолчанию — по классификации скрипта.
+"""
+
+import asyncio
+import contextvars
+import logging
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Iterator
+
+logger = logging.getLogger(__name__)
+
+LANES = ("read", "write", "background", "entry")
+DEFAULT_LIMITS = {"read": 8, "write": 4, "background": 2, "entry": 8}
+WAIT_SAMPLES = 512
+
+_current_lane: contextvars.ContextVar[str | None] = contextvars.ContextVar("script_lane", default=None)
+
+
+@contextmanager
+def lane(name: str) -> Iterator[None]:
+    """Все run_script внутри блока (и в созданных из него задачах) идут в полосу name."""
+    token = _current_lane.set(name)
+    try:
+        yield
+    finally:
+        _current_lane.reset(token)
+
+
+def background():
+    return lane("background")
+
+
+def current_lane() -> str | None:
+    return _current_lane.get()
+
+
+class Lane:
+    def __init__(self, name: str, limit: int) -> None:
+        self.name = name
+        self.limit = limit
+        self.running = 0
+        self.started = 0
+        self.completed = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+        self._waiters: deque[asyncio.Future] = deque()
+        self._waits: deque[float] = deque(maxlen=WAIT_SAMPLES)
+
+    @property
+    def queued(self) -> int:
+        return sum(1 for f in self._waiters if not f.done())
+
+    async def acquire(self) -> float:
+        """Занять слот. Возвращает время ожидания в очереди (секунды)."""
+        start = time.monotonic()
+        if self.running < self.limit and not self._waiters:
+            self.running += 1
+        else:
+            fut = asyncio.get_running_loop().create_future()
+            self._waiters.append(fut)
+            try:
+                await fut
+            except asyncio.CancelledError:
+                if fut.done() and not fut.cancelled():
+                    self.release()  # слот уже передан нам — отдать следующему
+                else:
+                    self._waiters.remove(fut)
+                raise
+        waited = time.monotonic() - start
+        self.started += 1
+        self.wait_total += waited
+        self.wait_max = max(self.wait_max, waited)
+        self._waits.append(waited)
+        return waited
+
+    def release(self) -> None:
+        """Передать слот первому ожидающему или освободить его."""
+        while self._waiters and self.running <= self.limit:
+            fut = self._waiters.popleft()
+            if not fut.done():
+                fut.set_result(None)
+                return
+        self.running -= 1
+
+    def _wake(self) -> None:
+        """После увеличения лимита запустить ожидающих."""
+        while self._waiters and self.running < self.limit:
+            fut = self._waiters.popleft()
+            if not fut.done():
+                self.running += 1
+                fut.set_result(None)
+
+    def _percentile(self, p: float) -> float:
+        if not self._waits:
+            return 0.0
+        ordered = sorted(self._waits)
+        return ordered[min(len(ordered) - 1, int(len(ordered) * p))]
+
+    def stats(self) -> dict:
+        return {
+            "limit": self.limit,
+            "running": self.running,
+            "queued": self.queued,
+            "completed": self.completed,
+            "wait_avg": self.wait_total / self.started if self.started else 0.0,
+            "wait_p50": self._percentile(0.50),
+            "wait_p99": self._percentile(0.99),
+            "wait_max": self.wait_max,
+        }
+
+
+class Scheduler:
+    def __init__(self, limits: dict[str, int] | None = None) -> None:
+        self.lanes = {name: Lane(name, DEFAULT_LIMITS[name]) for name in LANES}
+        if limits:
+            self.configure(limits)
+
+    def configure(self, limits: dict[str, int]) -> None:
+        for name, limit in limits.items():
+            if name not in self.lanes:
+                logger.warning("Unknown scheduler lane %r, ignoring", name)
+                continue
+            self.lanes[name].limit = max(1, limit)
+            self.lanes[name]._wake()
+
+    def pick(self, explicit: str | None, read_only: bool) -> Lane:
+        name = explicit or _current_lane.get() or ("read" if read_only else "write")
+        found = self.lanes.get(name)
+        if found is None:
+            logger.warning("Unknown scheduler lane %r, using write", name)
+            found = self.lanes["write"]
+        return found
+
+    def stats(self) -> dict:
+        return {name: lane_.stats() for name, lane_ in self.lanes.items()}
+
+
+scheduler = Scheduler()
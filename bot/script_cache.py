@@ -0,0 +1,244 @@
+"""
+bot/script_cache.py
+Кэш результатов read-only скриптов с TTL и инвалидацией по тегам.
+
+Политика объявляется для каждого скрипта:
+
+  чтение — TTL и теги результата:
+      users/get.sh --id 5        → ttl 30s, теги user:5, users
+  запись — теги, которые она сбрасывает:
+      users/update.sh --id 5     → user:5, users, links, trial
+
+Шаблоны тегов подставляют значения опций argv ("user:{id}" ← --id 5).
+Тег "device:*" сбрасывает все записи device:<uuid> — для скриптов,
+удаляющих устройства, UUID которых в argv нет (trial/prune.sh).
+Кэшируется только успешный результат (rc == 0). Скрипт без политики
+не кэшируется; неизвестный пишущий скрипт сбрасывает весь кэш.
+
+Изменения реестра в обход бота (CLI на сервере) приходят через
+RegistryWatcher — см. watcher_invalidator().
+"""
+
+import logging
+import threading
+import time
+from typing import NamedTuple
+
+logger = logging.getLogger(__name__)
+
+
+class ReadPolicy(NamedTuple):
+    ttl: float
+    tags: tuple[str, ...]
+
+
+# Теги:
+#   user:<id> / device:<uuid> — одна запись
+#   users / devices           — списки пользователей / устройств
+#   links                     — VLESS-ссылки (devices/config.sh)
+#   nodes                     — списки нод
+#   routes                    — маршруты core → entry (routes/)
+#   trial                     — поиск триальных устройств
+#   device:*                  — (только запись) все device:<uuid>
+READ_POLICIES: dict[str, ReadPolicy] = {
+    "users/get.sh": ReadPolicy(30, ("user:{id}",)),
+    "users/list.sh": ReadPolicy(30, ("users",)),
+    "devices/get.sh": ReadPolicy(30, ("device:{uuid}",)),
+    "devices/list.sh": ReadPolicy(30, ("devices",)),
+    "devices/config.sh": ReadPolicy(30, ("device:{uuid}", "links")),
+    "nodes/list-core.sh": ReadPolicy(60, ("nodes",)),
+    # --user <id>: ноды из core_nodes пользователя через routes/ — сбрасывается
+    # вместе с user:<id> (users/modify.sh --add-core-node) и routes/;
+    # без --user не кэшируется (тега user:{user} не подставить)
+    "nodes/list-entry.sh": ReadPolicy(60, ("nodes", "routes", "user:{user}")),
+    "trial/find.sh": ReadPolicy(30, ("trial",)),
+}
+
+WRITE_INVALIDATES: dict[str, tuple[str, ...]] = {
+    "users/create.sh": ("users", "trial"),
+    "users/add.sh": ("users", "trial"),
+    "users/update.sh": ("user:{id}", "users", "links", "trial"),
+    "users/delete.sh": ("user:{id}", "users", "devices", "links", "trial"),
+    "users/remove.sh": ("user:{id}", "users", "devices", "links", "trial"),
+    "users/modify.sh": ("user:{id}", "users", "links", "trial"),
+    "devices/create.sh": ("devices", "trial"),
+    "devices/add.sh": ("devices", "trial"),
+    "devices/modify.sh": ("device:{uuid}", "devices", "links", "trial"),
+    "devices/update.sh": ("device:{uuid}", "devices", "links", "trial"),
+    "devices/deactivate.sh": ("device:{uuid}", "devices", "links", "trial"),
+    "devices/delete.sh": ("device:{uuid}", "devices", "links", "trial"),
+    "devices/remove.sh": ("device:{uuid}", "devices", "links", "trial"),
+    # trial/expire.sh --uuid — deactivate + update; prune / cleanup удаляют
+    # и архивируют устройства, UUID которых в argv нет
+    "trial/expire.sh": ("device:{uuid}", "devices", "links", "trial"),
+    "trial/prune.sh": ("device:*", "devices", "links", "trial"),
+    "trial/cleanup.sh": ("device:*", "devices", "links", "trial"),
+    "nodes/add.sh": ("nodes", "links"),
+    "nodes/update.sh": ("nodes", "links"),
+    "nodes/remove.sh": ("nodes", "links"),
+    # Конфиг Xray на Entry-нодах и коммит не меняют содержимое реестра
+    "entry/add-client.sh": (),
+    "entry/remove-client.sh": (),
+    "store/commit.sh": (),
+    # Обращения не кэшируются скриптами — запись ничего не сбрасывает
+    "appeals/add.sh": (),
+    "appeals/reply.sh": (),
+    "appeals/update.sh": (),
+}
+
+# Изменения в поддиректориях реестра (RegistryWatcher) → сбрасываемые теги
+_SUBDIR_TAGS: dict[str, tuple[str, ...]] = {
+    "users": ("users", "links", "trial"),
+    "devices": ("devices", "links", "trial"),
+    "nodes": ("nodes", "links"),
+    "routes": ("links", "routes"),
+}
+_SUBDIR_RECORD_TAG = {"users": "user:{}", "devices": "device:{}"}
+
+
+def _options(args: list[str]) -> dict[str, str]:
+    """['--id', '5', '--status', 'active'] → {'id': '5', 'status': 'active'}"""
+    opts = {}
+    for i, arg in enumerate(args):
+        if arg.startswith("--") and i + 1 < len(args):
+            opts.setdefault(arg[2:].replace("-", "_"), args[i + 1])
+    return opts
+
+
+def _expand(templates: tuple[str, ...], args: list[str]) -> set[str] | None:
+    """Подставить опции в шаблоны тегов. None — опции не хватило (сбросить всё)."""
+    opts = _options(args)
+    tags = set()
+    for template in templates:
+        try:
+            tags.add(template.format(**opts))
+        except KeyError:
+            return None
+    return tags
+
+
+class ScriptCache:
+    def __init__(self, enabled: bool = True) -> None:
+        self.enabled = enabled
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        self._lock = threading.Lock()
+        # argv → (expires, tags, (rc, stdout, stderr))
+        self._entries: dict[tuple[str, ...], tuple[float, frozenset[str], tuple[int, str, str]]] = {}
+        self._by_tag: dict[str, set[tuple[str, ...]]] = {}
+        self._generation = 0  # растёт при инвалидации: не сохраняем результат, начатый до неё
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def cacheable(self, script: str) -> bool:
+        return self.enabled and script in READ_POLICIES
+
+    def begin(self) -> int:
+        """Поколение на момент старта чтения — передаётся в put()."""
+        return self._generation
+
+    def get(self, script: str, cmd: list[str]) -> tuple[int, str, str] | None:
+        key = tuple(cmd)
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] > now:
+                self.hits += 1
+                return entry[2]
+            if entry is not None:
+                self._drop(key)
+            self.misses += 1
+        return None
+
+    def put(self, script: str, cmd: list[str], result: tuple[int, str, str], generation: int) -> None:
+        if result[0] != 0:
+            return
+        policy = READ_POLICIES[script]
+        tags = _expand(policy.tags, cmd[1:])
+        if tags is None:
+            return
+        key = tuple(cmd)
+        with self._lock:
+            if generation != self._generation:
+                return
+            self._drop(key)
+            self._entries[key] = (time.monotonic() + policy.ttl, frozenset(tags), result)
+            for tag in tags:
+                self._by_tag.setdefault(tag, set()).add(key)
+
+    def invalidate_tags(self, tags: set[str] | None) -> None:
+        """Сбросить записи с любым из тегов; None — весь кэш."""
+        with self._lock:
+            self._generation += 1
+            self.invalidations += 1
+            if tags is None:
+                self._entries.clear()
+                self._by_tag.clear()
+                return
+            for tag in tags:
+                if tag.endswith(":*"):
+                    matched = [t for t in self._by_tag if t.startswith(tag[:-1])]
+                else:
+                    matched = [tag]
+                for each in matched:
+                    for key in list(self._by_tag.get(each, ())):
+                        self._drop(key)
+
+    def invalidate_for_write(self, script: str, cmd: list[str]) -> None:
+        """Инвалидация после запуска пишущего скрипта (независимо от rc)."""
+        if not self.enabled or script in READ_POLICIES:
+            return
+        templates = WRITE_INVALIDATES.get(script)
+        if templates is None:
+            logger.debug("No cache policy for %s, dropping script cache", script)
+            self.invalidate_tags(None)
+            return
+        if not templates:
+            return
+        self.invalidate_tags(_expand(templates, cmd[1:]))
+
+    def _drop(self, key: tuple[str, ...]) -> None:
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return
+        for tag in entry[1]:
+            keys = self._by_tag.get(tag)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._by_tag[tag]
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "enabled": self.enabled,
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+            "invalidations": self.invalidations,
+        }
+
+
+script_cache = ScriptCache()
+
+
+def watcher_invalidator(subdir: str):
+    """Колбэк для RegistryWatcher.subscribe: сбрасывает теги, зависящие от <subdir>/."""
+    base_tags = _SUBDIR_TAGS[subdir]
+    record_tag = _SUBDIR_RECORD_TAG.get(subdir)
+
+    def _invalidate(name: str | None) -> None:
+        if not script_cache.enabled:
+            return
+        tags = set(base_tags)
+        if record_tag is not None:
+            if name is None:
+                script_cache.invalidate_tags(None)
+                return
+            tags.add(record_tag.format(name.removesuffix(".json")))
+        script_cache.invalidate_tags(tags)
+
+    return _invalidate
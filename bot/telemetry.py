@@ -0,0 +1,183 @@
+"""
+bot/telemetry.py
+Метрики запуска скриптов: гистограммы по скрипту и счётчики кодов возврата.
+
+Каждый запуск run_script / stream_script записывается в:
+  время выполнения (wall time, без ожидания в очереди)
+  ожидание слота в полосе планировщика
+  объём stdout в байтах
+  счётчик по коду возврата (таймаут — отдельный счётчик)
+
+Гистограммы с фиксированными бакетами (как в Prometheus): память не
+растёт с числом запусков, квантили оцениваются интерполяцией внутри
+бакета. Сводка — summary() (команда /perf), текст в формате Prometheus —
+render().
+"""
+
+import bisect
+import math
+from collections import defaultdict
+
+SECONDS_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+BYTES_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304, 16777216)
+
+
+class Histogram:
+    __slots__ = ("bounds", "counts", "count", "sum", "max")
+
+    def __init__(self, bounds: tuple[float, ...]) -> None:
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)  # последний — +Inf
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect.bisect_left(self.bounds, value)] += 1
+        self.count += 1
+        self.sum += value
+        if value > self.max:
+            self.max = value
+
+    def quantile(self, q: float) -> float:
+        """Оценка квантиля: линейная интерполяция внутри бакета."""
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for i, n in enumerate(self.counts):
+            if seen + n >= rank and n:
+                lower = self.bounds[i - 1] if i > 0 else 0.0
+                upper = self.bounds[i] if i < len(self.bounds) else self.max
+                upper = min(upper, self.max)
+                return lower + (upper - lower) * (rank - seen) / n
+            seen += n
+        return self.max
+
+    def cumulative(self) -> list[tuple[str, int]]:
+        """Бакеты в формате Prometheus: (le, накопленное число)."""
+        result = []
+        total = 0
+        for bound, n in zip(self.bounds, self.counts):
+            total += n
+            result.append((fmt_value(bound), total))
+        result.append(("+Inf", self.count))
+        return result
+
+
+class ScriptStats:
+    __slots__ = ("duration", "queue_wait", "output_bytes", "exit_codes", "timeouts")
+
+    def __init__(self) -> None:
+        self.duration = Histogram(SECONDS_BUCKETS)
+        self.queue_wait = Histogram(SECONDS_BUCKETS)
+        self.output_bytes = Histogram(BYTES_BUCKETS)
+        self.exit_codes: dict[int, int] = defaultdict(int)
+        self.timeouts = 0
+
+    @property
+    def failures(self) -> int:
+        return sum(n for code, n in self.exit_codes.items() if code != 0)
+
+
+_scripts: dict[str, ScriptStats] = defaultdict(ScriptStats)
+
+
+def record_script(
+    script: str,
+    duration: float,
+    queue_wait: float,
+    output_bytes: int,
+    returncode: int,
+    timed_out: bool = False,
+) -> None:
+    stats = _scripts[script]
+    stats.duration.observe(duration)
+    stats.queue_wait.observe(queue_wait)
+    stats.output_bytes.observe(output_bytes)
+    stats.exit_codes[returncode] += 1
+    if timed_out:
+        stats.timeouts += 1
+
+
+def script_stats() -> dict[str, ScriptStats]:
+    return dict(_scripts)
+
+
+def reset() -> None:
+    _scripts.clear()
+
+
+def summary(limit: int | None = None) -> list[dict]:
+    """Скрипты по убыванию суммарного времени: count, p50, p95, max, ошибки."""
+    rows = [
+        {
+            "script": script,
+            "count": s.duration.count,
+            "total": s.duration.sum,
+            "p50": s.duration.quantile(0.50),
+            "p95": s.duration.quantile(0.95),
+            "max": s.duration.max,
+            "wait_p95": s.queue_wait.quantile(0.95),
+            "failures": s.failures,
+            "timeouts": s.timeouts,
+        }
+        for script, s in _scripts.items()
+    ]
+    rows.sort(key=lambda r: r["total"], reverse=True)
+    return rows[:limit] if limit is not None else rows
+
+
+# ---------------------------------------------------------------------------
+# Формат Prometheus
+# ---------------------------------------------------------------------------
+
+def fmt_value(value: float) -> str:
+    if isinstance(value, float) and math.isinf(value):
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+def escape_label(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def render_histogram(name: str, help_text: str, series: list[tuple[str, Histogram]]) -> list[str]:
+    """Строки одной гистограммы; series — (строка меток без скобок, гистограмма)."""
+    lines = [f"# HELP {name} {help_text}", f"# TYPE {name} histogram"]
+    for labels, hist in series:
+        sep = "," if labels else ""
+        for le, n in hist.cumulative():
+            lines.append(f'{name}_bucket{{{labels}{sep}le="{le}"}} {n}')
+        suffix = f"{{{labels}}}" if labels else ""
+        lines.append(f"{name}_sum{suffix} {fmt_value(hist.sum)}")
+        lines.append(f"{name}_count{suffix} {hist.count}")
+    return lines
+
+
+def render() -> str:
+    """Метрики скриптов в текстовом формате Prometheus."""
+    items = sorted(_scripts.items())
+    lines: list[str] = []
+    for attr, name, help_text in (
+        ("duration", "sigilgate_script_duration_seconds", "Script wall time, excluding queue wait"),
+        ("queue_wait", "sigilgate_script_queue_wait_seconds", "Time waiting for a scheduler lane slot"),
+        ("output_bytes", "sigilgate_script_output_bytes", "Script stdout size"),
+    ):
+        lines += render_histogram(
+            name, help_text, [(f'script="{escape_label(s)}"', getattr(st, attr)) for s, st in items]
+        )
+
+    lines += ["# HELP sigilgate_script_exit_total Script runs by exit code",
+              "# TYPE sigilgate_script_exit_total counter"]
+    for script, stats in items:
+        for code, n in sorted(stats.exit_codes.items()):
+            lines.append(f'sigilgate_script_exit_total{{script="{escape_label(script)}",code="{code}"}} {n}')
+
+    lines += ["# HELP sigilgate_script_timeouts_total Script runs stopped by deadline",
+              "# TYPE sigilgate_script_timeouts_total counter"]
+    for script, stats in items:
+        lines.append(f'sigilgate_script_timeouts_total{{script="{escape_label(script)}"}} {stats.timeouts}')
+    return "\n".join(lines) + "\n"
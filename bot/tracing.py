@@ -0,0 +1,238 @@
+"""
+bot/tracing.py
+Трассировка обработки апдейта: дерево спанов через contextvars.
+
+AuthMiddleware открывает корневой спан на каждый апдейт (start_trace),
+вложенные участки — span():
+
+    with span("registry.read", op="users/get.sh") as s:
+        ...
+        annotate(rows=10)       # атрибут текущего спана
+
+Контекст копируется в задачи asyncio и в asyncio.to_thread, поэтому
+спаны из gather / потоков попадают в тот же трейс. Вне апдейта (watcher,
+отложенный коммит) span() ничего не делает. Задачи, которые живут дольше
+апдейта (задания рассылки, отложенные правки Progress, таймер группового
+коммита), запускаются с detached_context() — иначе они дописывали бы спаны
+в давно завершённый трейс.
+
+Трейс дольше SIGILGATE_TRACE_SLOW_MS пишется в лог одной JSON-строкой
+(WARNING, logger bot.tracing). Если задан SIGILGATE_TRACE_EXPORT, он же
+дописывается в файл в формате OTLP JSON (по объекту
+ExportTraceServiceRequest на строку — формат file exporter
+OpenTelemetry Collector).
+"""
+
+import json
+import logging
+import os
+import time
+from contextlib import contextmanager
+from contextvars import Context, ContextVar, copy_context
+from typing import Any, Iterator
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_SLOW_MS = 3000.0
+MAX_SPANS = 512  # на трейс; длинные каскады не раздувают память
+
+SERVICE_NAME = "sigilgate-bot"
+
+_slow_ms = DEFAULT_SLOW_MS
+_export_path: str | None = None
+
+_current: ContextVar["Span | None"] = ContextVar("sigilgate_span", default=None)
+
+
+class Trace:
+    __slots__ = ("trace_id", "spans", "dropped")
+
+    def __init__(self) -> None:
+        self.trace_id = os.urandom(16).hex()
+        self.spans: list[Span] = []
+        self.dropped = 0
+
+
+class Span:
+    __slots__ = ("trace", "name", "span_id", "parent_id", "start_ns", "end_ns", "attributes", "error")
+
+    def __init__(self, trace: Trace, name: str, parent_id: str | None, attributes: dict) -> None:
+        self.trace = trace
+        self.name = name
+        self.span_id = os.urandom(8).hex()
+        self.parent_id = parent_id
+        self.start_ns = time.time_ns()
+        self.end_ns: int | None = None
+        self.attributes = attributes
+        self.error: str | None = None
+
+    @property
+    def duration_ms(self) -> float:
+        end = self.end_ns if self.end_ns is not None else time.time_ns()
+        return (end - self.start_ns) / 1e6
+
+    def set(self, **attributes: Any) -> None:
+        self.attributes.update(attributes)
+
+    def finish(self, error: BaseException | None = None) -> None:
+        if self.end_ns is None:
+            self.end_ns = time.time_ns()
+        if error is not None and self.error is None:
+            self.error = type(error).__name__
+
+
+def configure(slow_ms: float, export_path: str | None = None) -> None:
+    """Порог медленного трейса (мс; 0 — все трейсы) и файл OTLP JSON."""
+    global _slow_ms, _export_path
+    _slow_ms = slow_ms
+    _export_path = export_path or None
+
+
+def current_span() -> Span | None:
+    return _current.get()
+
+
+def detached_context() -> Context:
+    """Копия текущего контекста без трейса — для create_task(..., context=...)."""
+    context = copy_context()
+    context.run(_current.set, None)
+    return context
+
+
+def annotate(**attributes: Any) -> None:
+    """Добавить атрибуты текущему спану (вне трейса — ничего)."""
+    current = _current.get()
+    if current is not None:
+        current.set(**attributes)
+
+
+def start_span(name: str, **attributes: Any) -> Span | None:
+    """
+    Дочерний спан текущего без смены контекста — для async-генераторов,
+    где контекст на входе и выходе может отличаться. Закрывается finish().
+    """
+    parent = _current.get()
+    if parent is None:
+        return None
+    trace = parent.trace
+    if len(trace.spans) >= MAX_SPANS:
+        trace.dropped += 1
+        return None
+    child = Span(trace, name, parent.span_id, attributes)
+    trace.spans.append(child)
+    return child
+
+
+@contextmanager
+def span(name: str, **attributes: Any) -> Iterator[Span | None]:
+    child = start_span(name, **attributes)
+    if child is None:
+        yield None
+        return
+    token = _current.set(child)
+    try:
+        yield child
+    except BaseException as e:
+        child.finish(e)
+        raise
+    finally:
+        child.finish()
+        _current.reset(token)
+
+
+@contextmanager
+def start_trace(name: str, **attributes: Any) -> Iterator[Span]:
+    """Корневой спан апдейта; по выходу медленный трейс пишется в лог/файл."""
+    trace = Trace()
+    root = Span(trace, name, None, attributes)
+    trace.spans.append(root)
+    token = _current.set(root)
+    try:
+        yield root
+    except BaseException as e:
+        root.finish(e)
+        raise
+    finally:
+        root.finish()
+        _current.reset(token)
+        if root.duration_ms >= _slow_ms:
+            _report(trace)
+
+
+# ---------------------------------------------------------------------------
+# Вывод
+# ---------------------------------------------------------------------------
+
+def to_dict(trace: Trace) -> dict:
+    """Компактное представление для лога: смещения и длительности в мс."""
+    root = trace.spans[0]
+    return {
+        "trace_id": trace.trace_id,
+        "name": root.name,
+        "duration_ms": round(root.duration_ms, 1),
+        "attributes": root.attributes,
+        "error": root.error,
+        "dropped_spans": trace.dropped,
+        "spans": [
+            {
+                "name": s.name,
+                "span_id": s.span_id,
+                "parent_id": s.parent_id,
+                "offset_ms": round((s.start_ns - root.start_ns) / 1e6, 1),
+                "duration_ms": round(s.duration_ms, 1),
+                "attributes": s.attributes,
+                "error": s.error,
+            }
+            for s in trace.spans[1:]
+        ],
+    }
+
+
+def _otlp_value(value: Any) -> dict:
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": str(value)}
+
+
+def _otlp_attributes(attributes: dict) -> list[dict]:
+    return [{"key": k, "value": _otlp_value(v)} for k, v in attributes.items() if v is not None]
+
+
+def to_otlp(trace: Trace) -> dict:
+    """ExportTraceServiceRequest в JSON-кодировке OTLP."""
+    spans = []
+    for s in trace.spans:
+        item = {
+            "traceId": trace.trace_id,
+            "spanId": s.span_id,
+            "name": s.name,
+            "kind": 2 if s.parent_id is None else 1,  # SERVER — корень, INTERNAL — остальные
+            "startTimeUnixNano": str(s.start_ns),
+            "endTimeUnixNano": str(s.end_ns if s.end_ns is not None else s.start_ns),
+            "attributes": _otlp_attributes(s.attributes),
+            "status": {"code": 2, "message": s.error} if s.error else {"code": 1},
+        }
+        if s.parent_id is not None:
+            item["parentSpanId"] = s.parent_id
+        spans.append(item)
+    return {
+        "resourceSpans": [{
+            "resource": {"attributes": _otlp_attributes({"service.name": SERVICE_NAME})},
+            "scopeSpans": [{"scope": {"name": __name__}, "spans": spans}],
+        }],
+    }
+
+
+def _report(trace: Trace) -> None:
+    logger.warning("Slow trace: %s", json.dumps(to_dict(trace), ensure_ascii=False, default=str))
+    if _export_path is None:
+        return
+    try:
+        with open(_export_path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(to_otlp(trace), ensure_ascii=False, default=str) + "\n")
+    except OSError as e:
+        logger.error("Failed to export trace to %s: %s", _export_path, e)
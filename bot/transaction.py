@@ -0,0 +1,194 @@
+"""
+bot/transaction.py
+Групповой коммит записей в реестр.
+
+Оркестраторы (users/update.sh, devices/update.sh, ...) коммитят каждый
+вызов отдельно: каскад на N устройств + смена статуса пользователя —
+N+1 коммитов. Транзакция вызывает атомарные скрипты (*/modify.sh,
+*/delete.sh), а в конце — один store/commit.sh с общим сообщением:
+
+    async with transaction(scripts_path, f"Suspend user {user_id}") as tx:
+        await tx.run([f"{scripts_path}/devices/modify.sh", "--uuid", uuid, "--status", "inactive"])
+        await tx.run([f"{scripts_path}/users/modify.sh", "--id", user_id, "--status", "inactive"])
+
+Коммит выполняется и при ошибке внутри блока — изменения уже записаны
+в файлы реестра. Если задан SIGILGATE_GROUP_COMMIT_DELAY > 0, коммиты
+транзакций откладываются и объединяются (GroupCommitter): серия
+несвязанных записей за delay секунд даёт один коммит. Перед запуском
+оркестратора, который коммитит сам (git add -A), отложенные коммиты
+выполняются сразу — иначе он забрал бы чужие изменения под своим сообщением.
+"""
+
+import asyncio
+import logging
+from contextlib import asynccontextmanager
+from typing import AsyncIterator
+
+from bot.runner import SendFunc, run_script, script_name, set_commit_barrier
+from bot.tracing import detached_context
+
+logger = logging.getLogger(__name__)
+
+_commit_lock = asyncio.Lock()  # store/commit.sh — по одному за раз (git index.lock)
+
+
+async def commit(
+    scripts_path: str,
+    message: str,
+    send: SendFunc | None = None,
+    verbose: bool = False,
+) -> bool:
+    """Один store/commit.sh. Идемпотентен: нет изменений — rc 0."""
+    async with _commit_lock:
+        rc, _, stderr = await run_script(
+            [f"{scripts_path}/store/commit.sh", "--message", message],
+            send=send, verbose=verbose,
+        )
+    if rc != 0:
+        logger.error("store/commit.sh failed: %s", stderr)
+    return rc == 0
+
+
+class WriteTransaction:
+    def __init__(
+        self,
+        scripts_path: str,
+        message: str,
+        send: SendFunc | None = None,
+        verbose: bool = False,
+    ) -> None:
+        self.scripts_path = scripts_path
+        self.message = message
+        self.send = send
+        self.verbose = verbose
+        self.operations: list[str] = []
+        self.committed: bool | None = None  # None — коммита не было
+
+    async def run(self, cmd: list[str]) -> tuple[int, str, str]:
+        """run_script атомарного скрипта; операция попадает в сообщение коммита."""
+        result = await run_script(cmd, send=self.send, verbose=self.verbose)
+        if result[0] == 0:
+            self.operations.append(" ".join([script_name(cmd), *cmd[1:]]))
+        return result
+
+    def commit_message(self) -> str:
+        if not self.operations:
+            return self.message
+        return self.message + "\n\n" + "\n".join(f"- {op}" for op in self.operations)
+
+    async def commit(self) -> bool:
+        if not self.operations:
+            return True
+        if group_committer is not None:
+            group_committer.request(self.commit_message())
+            self.committed = True
+        else:
+            self.committed = await commit(
+                self.scripts_path, self.commit_message(), self.send, self.verbose
+            )
+        self.operations.clear()
+        return self.committed
+
+
+@asynccontextmanager
+async def transaction(
+    scripts_path: str,
+    message: str,
+    send: SendFunc | None = None,
+    verbose: bool = False,
+) -> AsyncIterator[WriteTransaction]:
+    tx = WriteTransaction(scripts_path, message, send, verbose)
+    try:
+        yield tx
+    finally:
+        await tx.commit()
+
+
+# ---------------------------------------------------------------------------
+# Отложенный групповой коммит
+# ---------------------------------------------------------------------------
+
+class GroupCommitter:
+    """
+    Объединяет запросы на коммит: коммит выполняется через delay секунд
+    после последнего запроса, но не позже max_delay после первого.
+    """
+
+    def __init__(self, scripts_path: str, delay: float, max_delay: float | None = None) -> None:
+        self.scripts_path = scripts_path
+        self.delay = delay
+        self.max_delay = max_delay if max_delay is not None else delay * 5
+        self.requests = 0
+        self.commits = 0
+        self._pending: list[str] = []
+        self._first_at = 0.0
+        self._timer: asyncio.TimerHandle | None = None
+        self._flushing: asyncio.Task | None = None
+
+    def request(self, message: str) -> None:
+        loop = asyncio.get_running_loop()
+        self.requests += 1
+        if not self._pending:
+            self._first_at = loop.time()
+        self._pending.append(message)
+        if self._timer is not None:
+            self._timer.cancel()
+        deadline = min(loop.time() + self.delay, self._first_at + self.max_delay)
+        # call_at копирует контекст: без detached_context коммит попал бы в трейс апдейта
+        self._timer = loop.call_at(deadline, self._fire, context=detached_context())
+
+    def _fire(self) -> None:
+        self._timer = None
+        self._flushing = asyncio.ensure_future(self.flush())
+
+    async def flush(self) -> bool:
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        if not self._pending:
+            return True
+        pending, self._pending = self._pending, []
+        if len(pending) == 1:
+            message = pending[0]
+        else:
+            subjects = [m.split("\n", 1)[0] for m in pending]
+            message = f"Group commit: {len(pending)} changes\n\n" + "\n\n".join(pending)
+            logger.debug("Group commit of: %s", "; ".join(subjects))
+        self.commits += 1
+        return await commit(self.scripts_path, message)
+
+    async def barrier(self) -> None:
+        """Закоммитить отложенное и дождаться коммита, начатого по таймеру."""
+        await self.flush()
+        async with _commit_lock:
+            pass
+
+    async def close(self) -> None:
+        if self._flushing is not None:
+            await self._flushing
+        await self.flush()
+
+    def stats(self) -> dict:
+        return {
+            "requests": self.requests,
+            "commits": self.commits,
+            "pending": len(self._pending),
+        }
+
+
+group_committer: GroupCommitter | None = None
+
+
+def configure_group_commit(scripts_path: str, delay: float) -> None:
+    """delay > 0 — откладывать коммиты транзакций и объединять их."""
+    global group_committer
+    group_committer = GroupCommitter(scripts_path, delay) if delay > 0 else None
+    set_commit_barrier(group_committer.barrier if group_committer is not None else None)
+
+
+async def shutdown_group_commit() -> None:
+    global group_committer
+    if group_committer is not None:
+        set_commit_barrier(None)
+        await group_committer.close()
+        group_committer = None
@@ -0,0 +1,110 @@
+"""
+bot/vless.py
+Построение VLESS-ссылок устройства в процессе (замена devices/config.sh).
+
+Ссылка — детерминированная функция UUID устройства, core_nodes его
+пользователя и активных маршрутов (routes/*.json):
+
+  User.core_nodes[] → Routes (core_ip совпадает, status=active)
+  → vless://<uuid>@<domain>:443?type=grpc&security=tls&serviceName=<service_name>&fp=chrome&alpn=h2#<device>
+
+Имя устройства во фрагменте percent-кодируется (как @uri в скрипте).
+Маршрут без domain — IncompleteRoute: подстановок нет, query читает
+ссылки скриптом, чтобы результат совпадал с devices/config.sh байт в байт.
+
+Результат запоминается по устройству и сбрасывается watcher'ом при
+изменении устройства, пользователей, маршрутов или нод.
+"""
+
+import logging
+import threading
+from urllib.parse import quote
+
+from bot.registry import DirectoryIndex, get_device_index, get_index, get_user_index
+
+logger = logging.getLogger(__name__)
+
+_PORT = 443
+_PARAMS = "type=grpc&security=tls&serviceName={service_name}&fp=chrome&alpn=h2"
+
+
+class RouteIndex(DirectoryIndex):
+    """Маршруты Core → Entry (routes/*.json)."""
+
+    subdir = "routes"
+
+
+class IncompleteRoute(LookupError):
+    """В маршруте нет поля, нужного для ссылки: нативный путь не применим."""
+
+
+def build_link(uuid: str, device_name: str, route: dict) -> str:
+    domain = route.get("domain")
+    if not domain:
+        raise IncompleteRoute(f"route {route.get('id')} has no domain")
+    params = _PARAMS.format(service_name=route["service_name"])
+    return f"vless://{uuid}@{domain}:{_PORT}?{params}#{quote(device_name, safe='')}"
+
+
+def _compute_links(store_path: str, uuid: str) -> list[str]:
+    device = get_device_index(store_path).get_by_uuid(uuid)
+    if device is None or device.get("status") != "active":
+        return []
+
+    user = get_user_index(store_path).get_by_id(device.get("user_id"))
+    if user is None:
+        return []
+    core_nodes = set(user.get("core_nodes") or [])
+    if not core_nodes:
+        return []
+
+    links = []
+    for route in get_index(RouteIndex, store_path).records():
+        if route.get("status") != "active" or route.get("core_ip") not in core_nodes:
+            continue
+        if not route.get("service_name"):
+            continue
+        links.append(build_link(uuid, device.get("device", ""), route))
+    return links
+
+
+_memo: dict[tuple[str, str], list[str]] = {}
+_memo_lock = threading.Lock()
+_generation = 0  # растёт при каждой инвалидации: не сохраняем результат, посчитанный до неё
+
+
+def device_links(store_path: str, uuid: str) -> list[str]:
+    """VLESS-ссылки устройства (как JSON-массив devices/config.sh)."""
+    key = (store_path, uuid)
+    with _memo_lock:
+        cached = _memo.get(key)
+        generation = _generation
+    if cached is not None:
+        return list(cached)
+
+    links = _compute_links(store_path, uuid)
+    with _memo_lock:
+        if generation == _generation:
+            _memo[key] = links
+    return list(links)
+
+
+def invalidate_device(name: str | None) -> None:
+    """Колбэк watcher для devices/: сбросить ссылки одного устройства."""
+    global _generation
+    with _memo_lock:
+        _generation += 1
+        if name is None:
+            _memo.clear()
+            return
+        uuid = name.removesuffix(".json")
+        for key in [k for k in _memo if k[1] == uuid]:
+            del _memo[key]
+
+
+def invalidate_all(name: str | None = None) -> None:
+    """Колбэк watcher для users/, routes/, nodes/: сбросить всё."""
+    global _generation
+    with _memo_lock:
+        _generation += 1
+        _memo.clear()
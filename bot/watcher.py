@@ -0,0 +1,246 @@
+"""
+bot/watcher.py
+Наблюдение за изменениями реестра (SIGIL_STORE_PATH).
+
+Скрипты (users/update.sh, appeals/reply.sh и т.д.) пишут в реестр в обход
+бота, поэтому внутрипроцессные кэши узнают об изменениях отсюда:
+события create/modify/move/delete в поддиректориях реестра превращаются
+в адресные инвалидации подписчиков.
+
+Основной механизм — inotify (Linux, через libc), события читаются в
+event loop через add_reader. Если inotify недоступен — периодический опрос
+stat файлов с интервалом poll_interval.
+"""
+
+import asyncio
+import ctypes
+import ctypes.util
+import errno
+import logging
+import os
+import struct
+from pathlib import Path
+from typing import Callable
+
+from bot.registry import StatSig, stat_sig
+
+logger = logging.getLogger(__name__)
+
+# Колбэк инвалидации: имя файла в поддиректории или None — «сбросить всё»
+InvalidateFunc = Callable[[str | None], None]
+
+# Флаги inotify (linux/inotify.h)
+_IN_MODIFY      = 0x00000002
+_IN_CLOSE_WRITE = 0x00000008
+_IN_MOVED_FROM  = 0x00000040
+_IN_MOVED_TO    = 0x00000080
+_IN_CREATE      = 0x00000100
+_IN_DELETE      = 0x00000200
+_IN_DELETE_SELF = 0x00000400
+_IN_MOVE_SELF   = 0x00000800
+_IN_Q_OVERFLOW  = 0x00004000
+_IN_IGNORED     = 0x00008000
+_IN_ONLYDIR     = 0x01000000
+_IN_ISDIR       = 0x40000000
+_IN_NONBLOCK    = 0o4000
+_IN_CLOEXEC     = 0o2000000
+
+_FILE_MASK = (
+    _IN_MODIFY | _IN_CLOSE_WRITE | _IN_MOVED_FROM | _IN_MOVED_TO
+    | _IN_CREATE | _IN_DELETE | _IN_DELETE_SELF | _IN_MOVE_SELF | _IN_ONLYDIR
+)
+_ROOT_MASK = _IN_CREATE | _IN_MOVED_TO | _IN_DELETE | _IN_MOVED_FROM | _IN_ONLYDIR
+
+_EVENT = struct.Struct("iIII")  # wd, mask, cookie, len
+
+
+class _Inotify:
+    """Минимальная обёртка над inotify(7) через ctypes."""
+
+    def __init__(self) -> None:
+        libc_name = ctypes.util.find_library("c") or "libc.so.6"
+        self._libc = ctypes.CDLL(libc_name, use_errno=True)
+        fd = self._libc.inotify_init1(_IN_NONBLOCK | _IN_CLOEXEC)
+        if fd < 0:
+            err = ctypes.get_errno()
+            raise OSError(err, os.strerror(err))
+        self.fd = fd
+
+    def add_watch(self, path: Path, mask: int) -> int:
+        wd = self._libc.inotify_add_watch(self.fd, os.fsencode(path), mask)
+        if wd < 0:
+            err = ctypes.get_errno()
+            raise OSError(err, os.strerror(err), str(path))
+        return wd
+
+    def read_events(self) -> list[tuple[int, int, str]]:
+        try:
+            buf = os.read(self.fd, 64 * 1024)
+        except BlockingIOError:
+            return []
+        events = []
+        offset = 0
+        while offset + _EVENT.size <= len(buf):
+            wd, mask, _cookie, length = _EVENT.unpack_from(buf, offset)
+            offset += _EVENT.size
+            name = buf[offset:offset + length].split(b"\0", 1)[0]
+            offset += length
+            events.append((wd, mask, os.fsdecode(name)))
+        return events
+
+    def close(self) -> None:
+        os.close(self.fd)
+
+
+class RegistryWatcher:
+    """Превращает изменения файлов реестра в инвалидации кэшей."""
+
+    def __init__(self, store_path: str, poll_interval: float = 5.0) -> None:
+        self.root = Path(store_path)
+        self.poll_interval = poll_interval
+        self._subscribers: dict[str, list[InvalidateFunc]] = {}
+        self._inotify: _Inotify | None = None
+        self._wd_to_subdir: dict[int, str] = {}
+        self._root_wd: int | None = None
+        self._task: asyncio.Task | None = None
+        self._snapshots: dict[str, dict[str, StatSig]] = {}
+
+    @property
+    def mode(self) -> str:
+        if self._task is None:
+            return "stopped"
+        return "inotify" if self._inotify is not None else "poll"
+
+    def subscribe(self, subdir: str, callback: InvalidateFunc) -> None:
+        """Подписать колбэк на изменения файлов в <store>/<subdir>/."""
+        self._subscribers.setdefault(subdir, []).append(callback)
+
+    # ------------------------------------------------------------------
+    # Запуск / остановка
+    # ------------------------------------------------------------------
+
+    def start(self) -> None:
+        if self._task is not None:
+            return
+        loop = asyncio.get_running_loop()
+        try:
+            self._start_inotify(loop)
+            self._task = loop.create_task(self._idle())
+            logger.info("Registry watcher started (inotify): %s", self.root)
+        except (OSError, AttributeError) as e:
+            logger.warning("inotify unavailable (%s), polling every %.1fs", e, self.poll_interval)
+            self._close_inotify(loop)
+            self._task = loop.create_task(self._poll())
+
+    async def stop(self) -> None:
+        if self._task is None:
+            return
+        self._close_inotify(asyncio.get_running_loop())
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+    # ------------------------------------------------------------------
+    # inotify
+    # ------------------------------------------------------------------
+
+    def _start_inotify(self, loop: asyncio.AbstractEventLoop) -> None:
+        self._inotify = _Inotify()
+        self._root_wd = self._inotify.add_watch(self.root, _ROOT_MASK)
+        for subdir in self._subscribers:
+            self._watch_subdir(subdir)
+        loop.add_reader(self._inotify.fd, self._on_readable)
+
+    def _watch_subdir(self, subdir: str) -> None:
+        assert self._inotify is not None
+        try:
+            wd = self._inotify.add_watch(self.root / subdir, _FILE_MASK)
+        except OSError as e:
+            # Директория появится позже — её создание поймает watch на корне
+            if e.errno not in (errno.ENOENT, errno.ENOTDIR):
+                raise
+            return
+        self._wd_to_subdir[wd] = subdir
+
+    def _close_inotify(self, loop: asyncio.AbstractEventLoop) -> None:
+        if self._inotify is None:
+            return
+        try:
+            loop.remove_reader(self._inotify.fd)
+        except (ValueError, RuntimeError):
+            pass
+        self._inotify.close()
+        self._inotify = None
+        self._wd_to_subdir.clear()
+
+    def _on_readable(self) -> None:
+        assert self._inotify is not None
+        for wd, mask, name in self._inotify.read_events():
+            if mask & _IN_Q_OVERFLOW:
+                logger.warning("inotify queue overflow, invalidating everything")
+                for subdir in self._subscribers:
+                    self._emit(subdir, None)
+                continue
+
+            if wd == self._root_wd:
+                if mask & _IN_ISDIR and name in self._subscribers:
+                    if mask & (_IN_CREATE | _IN_MOVED_TO):
+                        self._watch_subdir(name)
+                    self._emit(name, None)
+                continue
+
+            subdir = self._wd_to_subdir.get(wd)
+            if subdir is None:
+                continue
+            if mask & (_IN_DELETE_SELF | _IN_MOVE_SELF | _IN_IGNORED):
+                self._wd_to_subdir.pop(wd, None)
+                self._emit(subdir, None)
+                continue
+            if name and not mask & _IN_ISDIR:
+                self._emit(subdir, name)
+
+    async def _idle(self) -> None:
+        # inotify работает через add_reader; задача держит жизненный цикл
+        await asyncio.Event().wait()
+
+    # ------------------------------------------------------------------
+    # Fallback: опрос stat
+    # ------------------------------------------------------------------
+
+    async def _poll(self) -> None:
+        for subdir in self._subscribers:
+            self._snapshots[subdir] = await asyncio.to_thread(self._snapshot, subdir)
+        while True:
+            await asyncio.sleep(self.poll_interval)
+            for subdir in self._subscribers:
+                current = await asyncio.to_thread(self._snapshot, subdir)
+                previous = self._snapshots.get(subdir, {})
+                for name in previous.keys() | current.keys():
+                    if previous.get(name) != current.get(name):
+                        self._emit(subdir, name)
+                self._snapshots[subdir] = current
+
+    def _snapshot(self, subdir: str) -> dict[str, StatSig]:
+        result: dict[str, StatSig] = {}
+        try:
+            with os.scandir(self.root / subdir) as it:
+                for entry in it:
+                    try:
+                        result[entry.name] = stat_sig(entry.stat())
+                    except OSError:
+                        pass
+        except OSError:
+            pass
+        return result
+
+    # ------------------------------------------------------------------
+
+    def _emit(self, subdir: str, name: str | None) -> None:
+        for callback in self._subscribers.get(subdir, ()):
+            try:
+                callback(name)
+            except Exception:
+                logger.exception("Registry invalidation callback failed for %s/%s", subdir, name)
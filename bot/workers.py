@@ -0,0 +1,223 @@
+"""
+bot/workers.py
+Пул долгоживущих bash-воркеров для запуска скриптов.
+
+Вместо create_subprocess_exec на каждый вызов run_script команда
+отправляется уже запущенному bash-процессу. Протокол по stdin/stdout
+воркера:
+
+  запрос:  "<argc>\\n" + argv[0] + "\\0" + ... + argv[argc-1] + "\\0"
+  ответ:   "<returncode>\\n"
+
+stdout и stderr скрипта воркер пишет в свои временные файлы, откуда их
+читает пул (не больше limit байт). Воркер перезапускается после max_jobs
+заданий; упавший воркер обнаруживается по EOF/ошибке канала и заменяется
+новым. При превышении таймаута группа процессов воркера (вместе со
+скриптом) получает SIGTERM, затем SIGKILL.
+"""
+
+import asyncio
+import logging
+import os
+import shutil
+import signal
+import tempfile
+from pathlib import Path
+
+logger = logging.getLogger(__name__)
+
+KILL_GRACE = 3.0  # секунд между SIGTERM и SIGKILL
+
+_WORKER_SCRIPT = r"""
+out=$1
+err=$2
+while IFS= read -r argc; do
+    args=()
+    for ((i = 0; i < argc; i++)); do
+        IFS= read -r -d '' arg
+        args+=("$arg")
+    done
+    "${args[@]}" >"$out" 2>"$err" </dev/null
+    printf '%d\n' "$?"
+done
+"""
+
+
+async def terminate_group(proc: asyncio.subprocess.Process, grace: float = KILL_GRACE) -> None:
+    """
+    Остановить процесс и всех его потомков (процесс запущен с
+    start_new_session=True — pid равен pgid): SIGTERM, через grace — SIGKILL.
+    Оставшиеся в группе потомки (игнорирующие SIGTERM, пережившие лидера)
+    добиваются SIGKILL в любом случае.
+    """
+    if proc.returncode is None:
+        try:
+            os.killpg(proc.pid, signal.SIGTERM)
+        except ProcessLookupError:
+            pass
+        try:
+            await asyncio.wait_for(proc.wait(), timeout=grace)
+        except asyncio.TimeoutError:
+            pass
+    try:
+        os.killpg(proc.pid, signal.SIGKILL)
+    except ProcessLookupError:
+        pass
+    await proc.wait()
+
+
+def read_capped(path: Path, limit: int) -> tuple[bytes, bool]:
+    """Прочитать не больше limit байт. Возвращает (данные, обрезано ли)."""
+    with open(path, "rb") as f:
+        data = f.read(limit + 1)
+    if len(data) > limit:
+        return data[:limit], True
+    return data, False
+
+
+class WorkerUnavailable(Exception):
+    """Задание не было передано воркеру — можно безопасно выполнить напрямую."""
+
+
+class WorkerCrashed(Exception):
+    """Воркер упал во время выполнения задания — результат неизвестен."""
+
+
+class _Worker:
+    def __init__(self, proc: asyncio.subprocess.Process, tmpdir: str) -> None:
+        self.proc = proc
+        self.tmpdir = tmpdir
+        self.out_path = Path(tmpdir) / "stdout"
+        self.err_path = Path(tmpdir) / "stderr"
+        self.jobs = 0
+
+    @classmethod
+    async def spawn(cls) -> "_Worker":
+        tmpdir = tempfile.mkdtemp(prefix="sigil-worker-")
+        try:
+            proc = await asyncio.create_subprocess_exec(
+                "bash", "-c", _WORKER_SCRIPT, "sigil-worker",
+                str(Path(tmpdir) / "stdout"), str(Path(tmpdir) / "stderr"),
+                stdin=asyncio.subprocess.PIPE,
+                stdout=asyncio.subprocess.PIPE,
+                stderr=asyncio.subprocess.DEVNULL,
+                start_new_session=True,
+            )
+        except OSError:
+            shutil.rmtree(tmpdir, ignore_errors=True)
+            raise
+        return cls(proc, tmpdir)
+
+    @property
+    def alive(self) -> bool:
+        return self.proc.returncode is None
+
+    async def run(self, cmd: list[str], limit: int) -> tuple[int, bytes, bytes, bool]:
+        frame = f"{len(cmd)}\n".encode() + b"".join(os.fsencode(a) + b"\0" for a in cmd)
+        try:
+            self.proc.stdin.write(frame)
+            await self.proc.stdin.drain()
+        except (BrokenPipeError, ConnectionResetError) as e:
+            raise WorkerUnavailable(str(e)) from e
+
+        self.jobs += 1
+        line = await self.proc.stdout.readline()
+        if not line:
+            raise WorkerCrashed("worker exited unexpectedly")
+        try:
+            returncode = int(line)
+        except ValueError as e:
+            raise WorkerCrashed(f"bad worker reply: {line!r}") from e
+
+        # До limit байт на файл — не читать на event loop, чтобы не стояли остальные полосы
+        (stdout, out_cut), (stderr, err_cut) = await asyncio.to_thread(self._read_output, limit)
+        return returncode, stdout, stderr, out_cut or err_cut
+
+    def _read_output(self, limit: int) -> tuple[tuple[bytes, bool], tuple[bytes, bool]]:
+        return read_capped(self.out_path, limit), read_capped(self.err_path, limit)
+
+    async def terminate(self) -> None:
+        """Остановить воркер вместе с его дочерними процессами (группа процессов)."""
+        await terminate_group(self.proc)
+
+    async def close(self) -> None:
+        if self.alive:
+            self.proc.stdin.close()
+            try:
+                await asyncio.wait_for(self.proc.wait(), timeout=5)
+            except asyncio.TimeoutError:
+                await self.terminate()
+        shutil.rmtree(self.tmpdir, ignore_errors=True)
+
+
+class WorkerPool:
+    def __init__(self, size: int, max_jobs: int = 100) -> None:
+        self.size = size
+        self.max_jobs = max_jobs
+        self._idle: asyncio.Queue[_Worker | None] = asyncio.Queue()
+        for _ in range(size):
+            self._idle.put_nowait(None)  # слот; воркер запускается лениво
+        self.spawned = 0
+        self.recycled = 0
+        self.crashed = 0
+        self.timeouts = 0  # воркер остановлен по дедлайну задания — не падение
+
+    async def _acquire(self) -> _Worker:
+        worker = await self._idle.get()
+        if worker is not None and worker.alive:
+            return worker
+        if worker is not None:
+            self.crashed += 1
+            await worker.close()
+        try:
+            worker = await _Worker.spawn()
+        except OSError as e:
+            self._idle.put_nowait(None)
+            raise WorkerUnavailable(f"failed to spawn worker: {e}") from e
+        self.spawned += 1
+        return worker
+
+    async def _release(self, worker: _Worker, healthy: bool, timed_out: bool = False) -> None:
+        if not healthy:
+            if timed_out:
+                self.timeouts += 1
+            else:
+                self.crashed += 1
+            await worker.terminate()
+            await worker.close()
+            self._idle.put_nowait(None)
+        elif worker.jobs >= self.max_jobs:
+            self.recycled += 1
+            await worker.close()
+            self._idle.put_nowait(None)
+        else:
+            self._idle.put_nowait(worker)
+
+    async def run(
+        self, cmd: list[str], timeout: float | None, limit: int
+    ) -> tuple[int, bytes, bytes, bool]:
+        """
+        Выполнить команду в воркере.
+        Возвращает (returncode, stdout, stderr, обрезан ли вывод).
+
+        WorkerUnavailable — задание не дошло до воркера;
+        WorkerCrashed — воркер упал во время задания;
+        asyncio.TimeoutError — задание не уложилось в timeout (воркер остановлен).
+        """
+        worker = await self._acquire()
+        healthy = timed_out = False
+        try:
+            result = await asyncio.wait_for(worker.run(cmd, limit), timeout)
+            healthy = True
+            return result
+        except asyncio.TimeoutError:
+            timed_out = True
+            raise
+        finally:
+            await self._release(worker, healthy, timed_out)
+
+    async def close(self) -> None:
+        while not self._idle.empty():
+            worker = self._idle.get_nowait()
+            if worker is not None:
+                await worker.close()